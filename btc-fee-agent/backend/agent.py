@@ -1,3 +1,7 @@
+from dataclasses import dataclass
+
+import numpy as np
+
 from .models import FeeRecommendation
 
 # Congestion thresholds for mapping mempool count to low/medium/high
@@ -13,6 +17,49 @@ PRESETS = {
 }
 
 
+def freeze_presets(presets: dict) -> tuple[tuple[str, int, int, str], ...]:
+    """`{priority: {blocks_min, blocks_max, risk}}` as hashable `(priority, min, max, risk)` rows."""
+    return tuple(
+        (priority, int(preset["blocks_min"]), int(preset["blocks_max"]), str(preset["risk"]))
+        for priority, preset in presets.items()
+    )
+
+
+@dataclass(frozen=True, slots=True)
+class AgentParams:
+    """Tunable agent constants; `backend/backtest.py` searches over these.
+
+    Hashable and immutable all the way down: presets are stored as rows
+    (a mapping passed in is frozen), so no instance shares state with PRESETS.
+    """
+
+    congestion_thresholds: tuple[int, int] = CONGESTION_THRESHOLDS
+    max_congestion_bonus: float = MAX_CONGESTION_BONUS
+    presets: tuple[tuple[str, int, int, str], ...] = freeze_presets(PRESETS)
+    # _scale_eta: congestion ratio breakpoints and the ETA factor for each band.
+    eta_breakpoints: tuple[float, float] = (0.33, 0.66)
+    eta_factors: tuple[float, float, float] = (1.0, 1.5, 2.0)
+
+    def __post_init__(self):
+        if isinstance(self.presets, dict):
+            object.__setattr__(self, "presets", freeze_presets(self.presets))
+
+    def preset_map(self) -> dict[str, dict]:
+        """Presets as a fresh `{priority: {blocks_min, blocks_max, risk}}` dict."""
+        return {
+            priority: {"blocks_min": blocks_min, "blocks_max": blocks_max, "risk": risk}
+            for priority, blocks_min, blocks_max, risk in self.presets
+        }
+
+    def preset(self, priority: str) -> dict:
+        """Preset for `priority`, or the medium one for unknown priorities."""
+        presets = self.preset_map()
+        return presets.get(priority, presets["medium"])
+
+
+DEFAULT_PARAMS = AgentParams()
+
+
 def _pick_base_fee(priority: str, fee_data: dict) -> int:
     if priority == "fast":
         return float(fee_data.get("fastestFee") or fee_data.get("halfHourFee") or fee_data.get("minimumFee", 1))
@@ -22,9 +69,121 @@ def _pick_base_fee(priority: str, fee_data: dict) -> int:
     return float(fee_data.get("economyFee") or fee_data.get("minimumFee", 1))
 
 
-def observe(priority: str, fee_data: dict, mempool: dict, cache_used: bool):
+@dataclass(slots=True)
+class Observation:
+    """What the agent saw. Supports `obs["field"]` reads like the old dicts."""
+
+    mode: str
+    priority: str
+    base_fee: float
+    blocks_min: int
+    blocks_max: int
+    risk_level: str
+    mempool_tx_count: int
+    congestion_ratio: float
+    congestion_level: str
+    cache_used: bool
+    degraded: bool
+    fee_data: dict
+    input_fee: float | None = None
+    classification_rule: str | None = None
+    reference_fees: tuple[float, float, float] | None = None  # fast, medium, slow
+
+    def __getitem__(self, key: str):
+        return getattr(self, key)
+
+    def get(self, key: str, default=None):
+        return getattr(self, key, default)
+
+    @property
+    def signals(self) -> dict:
+        if self.mode == "recommend":
+            return {
+                "mempool_tx_count": self.mempool_tx_count,
+                "congestion_level": self.congestion_level,
+                "recommended_fees": {
+                    "fastest": self.fee_data.get("fastestFee"),
+                    "halfHour": self.fee_data.get("halfHourFee"),
+                    "hour": self.fee_data.get("hourFee"),
+                    "economy": self.fee_data.get("economyFee"),
+                    "minimum": self.fee_data.get("minimumFee"),
+                },
+            }
+        fast, medium, slow = self.reference_fees
+        return {
+            "mempool_tx_count": self.mempool_tx_count,
+            "congestion_level": self.congestion_level,
+            "input_fee_sat_vb": self.input_fee,
+            "reference_fee_fast": fast,
+            "reference_fee_medium": medium,
+            "reference_fee_slow": slow,
+        }
+
+
+@dataclass(slots=True)
+class Decision:
+    recommended_fee: float
+    rules_fired: tuple[str, ...]
+    confidence: str
+    congestion_multiplier: float
+    risk_level: str
+    eta_blocks_min: int
+    eta_blocks_max: int
+
+    def __getitem__(self, key: str):
+        return getattr(self, key)
+
+    @property
+    def eta_minutes_min(self) -> int:
+        return self.eta_blocks_min * 10
+
+    @property
+    def eta_minutes_max(self) -> int:
+        return self.eta_blocks_max * 10
+
+
+@dataclass(slots=True)
+class AgentResult:
+    """Observation + decision. Explanation lines and the Pydantic model are
+    only built on demand, so batch/backtest loops can stay on this type."""
+
+    obs: Observation
+    decision: Decision
+
+    @property
+    def explanation(self) -> list[str]:
+        return explain(self.obs, self.decision)
+
+    def to_model(self) -> FeeRecommendation:
+        obs, decision = self.obs, self.decision
+        return FeeRecommendation(
+            mode=obs.mode,
+            priority=obs.priority,
+            base_fee_sat_vb=obs.base_fee,
+            recommended_fee_sat_vb=decision.recommended_fee,
+            input_fee_sat_vb=obs.input_fee,
+            eta_blocks_min=decision.eta_blocks_min,
+            eta_blocks_max=decision.eta_blocks_max,
+            eta_minutes_min=float(decision.eta_minutes_min),
+            eta_minutes_max=float(decision.eta_minutes_max),
+            risk_level=decision.risk_level,
+            mempool_tx_count=obs.mempool_tx_count,
+            explanation=self.explanation,
+            agent_summary="",
+            what_if_hint=None,
+            signals_used=obs.signals,
+            rules_fired=list(decision.rules_fired),
+            confidence=decision.confidence,
+            cache_used=obs.cache_used,
+            source="mempool.space",
+        )
+
+
+def observe(
+    priority: str, fee_data: dict, mempool: dict, cache_used: bool, params: AgentParams = DEFAULT_PARAMS
+) -> Observation:
     degraded = False
-    preset = PRESETS.get(priority, PRESETS["medium"])
+    preset = params.preset(priority)
     try:
         base_fee = _pick_base_fee(priority, fee_data)
     except Exception:
@@ -37,38 +196,25 @@ def observe(priority: str, fee_data: dict, mempool: dict, cache_used: bool):
         mempool_tx_count = 0
         degraded = True
 
-    congestion_level = _congestion_level(mempool_tx_count)
-    ratio = _congestion_ratio(mempool_tx_count)
-
-    signals = {
-        "mempool_tx_count": mempool_tx_count,
-        "congestion_level": congestion_level,
-        "recommended_fees": {
-            "fastest": fee_data.get("fastestFee"),
-            "halfHour": fee_data.get("halfHourFee"),
-            "hour": fee_data.get("hourFee"),
-            "economy": fee_data.get("economyFee"),
-            "minimum": fee_data.get("minimumFee"),
-        },
-    }
-
-    return {
-        "mode": "recommend",
-        "priority": priority,
-        "base_fee": float(base_fee),
-        "blocks_min": preset["blocks_min"],
-        "blocks_max": preset["blocks_max"],
-        "risk_level": preset["risk"],
-        "mempool_tx_count": mempool_tx_count,
-        "congestion_ratio": ratio,
-        "congestion_level": congestion_level,
-        "cache_used": cache_used,
-        "signals": signals,
-        "degraded": degraded or cache_used,
-    }
+    return Observation(
+        mode="recommend",
+        priority=priority,
+        base_fee=float(base_fee),
+        blocks_min=preset["blocks_min"],
+        blocks_max=preset["blocks_max"],
+        risk_level=preset["risk"],
+        mempool_tx_count=mempool_tx_count,
+        congestion_ratio=_congestion_ratio(mempool_tx_count, params),
+        congestion_level=_congestion_level(mempool_tx_count, params),
+        cache_used=cache_used,
+        degraded=degraded or cache_used,
+        fee_data=fee_data,
+    )
 
 
-def observe_estimate(fee: float, mempool: dict, cache_used: bool, fee_data: dict):
+def observe_estimate(
+    fee: float, mempool: dict, cache_used: bool, fee_data: dict, params: AgentParams = DEFAULT_PARAMS
+) -> Observation:
     degraded = False
     try:
         mempool_tx_count = int(mempool.get("count", 0) or 0)
@@ -76,119 +222,174 @@ def observe_estimate(fee: float, mempool: dict, cache_used: bool, fee_data: dict
         mempool_tx_count = 0
         degraded = True
 
-    congestion_level = _congestion_level(mempool_tx_count)
-    ratio = _congestion_ratio(mempool_tx_count)
-
     fast_base = _pick_base_fee("fast", fee_data)
     medium_base = _pick_base_fee("medium", fee_data)
     slow_base = _pick_base_fee("slow", fee_data)
 
     # classify user fee
+    classes = _estimate_classes(params) if params is not DEFAULT_PARAMS else ESTIMATE_CLASSES
     if fee >= fast_base:
-        preset = PRESETS["fast"]
-        priority = "fast"
-        rule = "R_ESTIMATE_FAST"
+        cls = classes[0]
     elif fee >= medium_base:
-        preset = PRESETS["medium"]
-        priority = "medium"
-        rule = "R_ESTIMATE_MEDIUM"
+        cls = classes[1]
     elif fee >= slow_base:
-        preset = PRESETS["slow"]
-        priority = "slow"
-        rule = "R_ESTIMATE_SLOW"
+        cls = classes[2]
     else:
-        preset = {"blocks_min": PRESETS["slow"]["blocks_min"] + 2, "blocks_max": PRESETS["slow"]["blocks_max"] + 4, "risk": "high"}
-        priority = "slow"
-        rule = "R_ESTIMATE_BELOW_SLOW"
+        cls = classes[3]
 
-    signals = {
-        "mempool_tx_count": mempool_tx_count,
-        "congestion_level": congestion_level,
-        "input_fee_sat_vb": fee,
-        "reference_fee_fast": fast_base,
-        "reference_fee_medium": medium_base,
-        "reference_fee_slow": slow_base,
-    }
-
-    return {
-        "mode": "estimate",
-        "priority": priority,
-        "input_fee": float(fee),
-        "blocks_min": preset["blocks_min"],
-        "blocks_max": preset["blocks_max"],
-        "risk_level": preset["risk"],
-        "mempool_tx_count": mempool_tx_count,
-        "congestion_ratio": ratio,
-        "congestion_level": congestion_level,
-        "cache_used": cache_used,
-        "signals": signals,
-        "degraded": degraded or cache_used,
-        "classification_rule": rule,
-        "base_fee_ref": medium_base,
-    }
+    return Observation(
+        mode="estimate",
+        priority=cls["priority"],
+        base_fee=medium_base,
+        input_fee=float(fee),
+        blocks_min=cls["blocks_min"],
+        blocks_max=cls["blocks_max"],
+        risk_level=cls["risk"],
+        mempool_tx_count=mempool_tx_count,
+        congestion_ratio=_congestion_ratio(mempool_tx_count, params),
+        congestion_level=_congestion_level(mempool_tx_count, params),
+        cache_used=cache_used,
+        degraded=degraded or cache_used,
+        fee_data=fee_data,
+        classification_rule=cls["rule"],
+        reference_fees=(fast_base, medium_base, slow_base),
+    )
 
 
-def decide(obs: dict):
-    ratio = obs["congestion_ratio"]
-    congestion_multiplier = 1 + (MAX_CONGESTION_BONUS * ratio)
+def decide(obs: Observation, params: AgentParams = DEFAULT_PARAMS) -> Decision:
+    ratio = obs.congestion_ratio
+    congestion_multiplier = 1 + (params.max_congestion_bonus * ratio)
 
-    if obs["mode"] == "recommend":
-        recommended_fee = max(1.0, round(obs["base_fee"] * congestion_multiplier, 3))
-        rules_fired = [
-            _priority_rule(obs["priority"]),
-            _congestion_rule(obs["congestion_level"]),
-        ]
-        blocks_min, blocks_max = _scale_eta(obs["blocks_min"], obs["blocks_max"], ratio)
-        risk_level = obs["risk_level"]
+    if obs.mode == "recommend":
+        recommended_fee = max(1.0, round(obs.base_fee * congestion_multiplier, 3))
+        rules_fired = [_priority_rule(obs.priority), _congestion_rule(obs.congestion_level)]
     else:
         # Apply congestion to user input, keep decimals
-        recommended_fee = max(0.1, round(obs["input_fee"] * congestion_multiplier, 3))
-        rules_fired = [
-            obs.get("classification_rule", "R_ESTIMATE_UNKNOWN"),
-            _congestion_rule(obs["congestion_level"]),
-        ]
-        blocks_min, blocks_max = _scale_eta(obs["blocks_min"], obs["blocks_max"], ratio)
-        risk_level = obs["risk_level"]
-
-    if obs["cache_used"]:
+        recommended_fee = max(0.1, round(obs.input_fee * congestion_multiplier, 3))
+        rules_fired = [obs.classification_rule or "R_ESTIMATE_UNKNOWN", _congestion_rule(obs.congestion_level)]
+    blocks_min, blocks_max = _scale_eta(obs.blocks_min, obs.blocks_max, ratio, params)
+
+    if obs.cache_used:
         rules_fired.append("R_CACHE_USED")
-    if obs["degraded"]:
+    if obs.degraded:
         rules_fired.append("R_DEGRADED_INPUT")
 
     confidence = _confidence_from_ratio(ratio)
-    if obs["degraded"]:
+    if obs.degraded:
         confidence = _downgrade_confidence(confidence)
 
-    minutes_min = blocks_min * 10
-    minutes_max = blocks_max * 10
-
-    return {
-        "recommended_fee": recommended_fee,
-        "rules_fired": rules_fired,
-        "confidence": confidence,
-        "congestion_multiplier": congestion_multiplier,
-        "risk_level": risk_level,
-        "eta_blocks_min": blocks_min,
-        "eta_blocks_max": blocks_max,
-        "eta_minutes_min": minutes_min,
-        "eta_minutes_max": minutes_max,
-    }
+    return Decision(
+        recommended_fee=recommended_fee,
+        rules_fired=tuple(rules_fired),
+        confidence=confidence,
+        congestion_multiplier=congestion_multiplier,
+        risk_level=obs.risk_level,
+        eta_blocks_min=blocks_min,
+        eta_blocks_max=blocks_max,
+    )
 
 
-def explain(obs: dict, decision: dict):
+def explain(obs: Observation, decision: Decision) -> list[str]:
     base_line = (
-        f"Base fee for {obs['priority']} priority: {obs.get('base_fee', obs.get('input_fee'))} sat/vB."
-        if obs["mode"] == "recommend"
-        else f"User fee: {obs['input_fee']} sat/vB classified as {obs['priority']}."
+        f"Base fee for {obs.priority} priority: {obs.base_fee} sat/vB."
+        if obs.mode == "recommend"
+        else f"User fee: {obs.input_fee} sat/vB classified as {obs.priority}."
     )
     return [
         base_line,
-        f"Mempool tx count {obs['mempool_tx_count']} gives congestion multiplier {decision['congestion_multiplier']:.2f}.",
-        f"ETA range: {decision['eta_blocks_min']}-{decision['eta_blocks_max']} blocks (~{decision['eta_minutes_min']}-{decision['eta_minutes_max']} minutes).",
-        f"Cache used: {obs['cache_used']}. Degraded inputs: {obs['degraded']}.",
+        f"Mempool tx count {obs.mempool_tx_count} gives congestion multiplier {decision.congestion_multiplier:.2f}.",
+        f"ETA range: {decision.eta_blocks_min}-{decision.eta_blocks_max} blocks (~{decision.eta_minutes_min}-{decision.eta_minutes_max} minutes).",
+        f"Cache used: {obs.cache_used}. Degraded inputs: {obs.degraded}.",
+    ]
+
+
+def _estimate_classes(params: AgentParams) -> list[dict]:
+    """Estimate classes (fast, medium, slow, below slow), indexed by class code."""
+    presets = params.preset_map()
+    return [
+        {"priority": "fast", "rule": "R_ESTIMATE_FAST", **presets["fast"]},
+        {"priority": "medium", "rule": "R_ESTIMATE_MEDIUM", **presets["medium"]},
+        {"priority": "slow", "rule": "R_ESTIMATE_SLOW", **presets["slow"]},
+        {
+            "priority": "slow",
+            "rule": "R_ESTIMATE_BELOW_SLOW",
+            "blocks_min": presets["slow"]["blocks_min"] + 2,
+            "blocks_max": presets["slow"]["blocks_max"] + 4,
+            "risk": "high",
+        },
     ]
 
 
+ESTIMATE_CLASSES = _estimate_classes(DEFAULT_PARAMS)
+
+
+def estimate_batch(
+    fees, fee_data: dict, mempool: dict, cache_used: bool = False, params: AgentParams = DEFAULT_PARAMS
+) -> dict:
+    """Vectorized `observe_estimate` + `decide` for many candidate fees.
+
+    Returns columnar numpy arrays (one entry per fee) plus the scalars that
+    are shared by every fee in the batch.
+    """
+    fees = np.asarray(fees, dtype=np.float64)
+    degraded = cache_used
+    try:
+        mempool_tx_count = int(mempool.get("count", 0) or 0)
+    except Exception:
+        mempool_tx_count = 0
+        degraded = True
+    ratio = _congestion_ratio(mempool_tx_count, params)
+    congestion_level = _congestion_level(mempool_tx_count, params)
+    congestion_multiplier = 1 + (params.max_congestion_bonus * ratio)
+
+    fast_base = _pick_base_fee("fast", fee_data)
+    medium_base = _pick_base_fee("medium", fee_data)
+    slow_base = _pick_base_fee("slow", fee_data)
+    # Same thresholds, checked in the same order, as observe_estimate.
+    class_code = np.select(
+        [fees >= fast_base, fees >= medium_base, fees >= slow_base], [0, 1, 2], default=3
+    ).astype(np.uint8)
+
+    # _scale_eta, applied to each class once and then gathered per fee.
+    factor = _eta_factor(ratio, params)
+    classes = _estimate_classes(params) if params is not DEFAULT_PARAMS else ESTIMATE_CLASSES
+    class_min = np.array([c["blocks_min"] for c in classes], dtype=np.float64)
+    class_max = np.array([c["blocks_max"] for c in classes], dtype=np.float64)
+    scaled_min = np.maximum(1, np.round(class_min * factor)).astype(np.int64)
+    scaled_max = np.maximum(scaled_min, np.round(class_max * factor)).astype(np.int64)
+    eta_blocks_min = scaled_min[class_code]
+    eta_blocks_max = scaled_max[class_code]
+
+    confidence = _confidence_from_ratio(ratio)
+    if degraded:
+        confidence = _downgrade_confidence(confidence)
+    rules = [_congestion_rule(congestion_level)]  # after each fee's class rule
+    if cache_used:
+        rules.append("R_CACHE_USED")
+    if degraded:
+        rules.append("R_DEGRADED_INPUT")
+    # Python's round, as in decide: np.round scales by 10**3 first and can
+    # land on the other side of a half (7.475 * m -> 7.923 vs 7.924).
+    recommended = np.array([round(fee, 3) for fee in (fees * congestion_multiplier).tolist()], dtype=np.float64)
+
+    return {
+        "fee_sat_vb": fees,
+        "recommended_fee_sat_vb": np.maximum(0.1, recommended),
+        "class_code": class_code,
+        "eta_blocks_min": eta_blocks_min,
+        "eta_blocks_max": eta_blocks_max,
+        "eta_minutes_min": eta_blocks_min * 10,
+        "eta_minutes_max": eta_blocks_max * 10,
+        "congestion_multiplier": congestion_multiplier,
+        "congestion_level": congestion_level,
+        "confidence": confidence,
+        "mempool_tx_count": mempool_tx_count,
+        "reference_fees": {"fast": fast_base, "medium": medium_base, "slow": slow_base},
+        "shared_rules": rules,
+        "cache_used": cache_used,
+    }
+
+
 def _priority_rule(priority: str) -> str:
     mapping = {
         "fast": "R_PRIORITY_FAST",
@@ -203,20 +404,24 @@ def _congestion_rule(level: str) -> str:
     return mapping.get(level, "R_CONGESTION_MEDIUM")
 
 
-def _scale_eta(blocks_min: int, blocks_max: int, ratio: float) -> tuple[int, int]:
-    if ratio <= 0.33:
-        factor = 1.0
-    elif ratio <= 0.66:
-        factor = 1.5
-    else:
-        factor = 2.0
+def _eta_factor(ratio: float, params: AgentParams = DEFAULT_PARAMS) -> float:
+    low, high = params.eta_breakpoints
+    if ratio <= low:
+        return params.eta_factors[0]
+    if ratio <= high:
+        return params.eta_factors[1]
+    return params.eta_factors[2]
+
+
+def _scale_eta(blocks_min: int, blocks_max: int, ratio: float, params: AgentParams = DEFAULT_PARAMS) -> tuple[int, int]:
+    factor = _eta_factor(ratio, params)
     bmin = max(1, round(blocks_min * factor))
     bmax = max(bmin, round(blocks_max * factor))
     return bmin, bmax
 
 
-def _congestion_ratio(mempool_count: int) -> float:
-    low, high = CONGESTION_THRESHOLDS
+def _congestion_ratio(mempool_count: int, params: AgentParams = DEFAULT_PARAMS) -> float:
+    low, high = params.congestion_thresholds
     if mempool_count <= low:
         return 0.0
     if mempool_count >= high:
@@ -224,8 +429,8 @@ def _congestion_ratio(mempool_count: int) -> float:
     return (mempool_count - low) / (high - low)
 
 
-def _congestion_level(mempool_count: int) -> str:
-    low, high = CONGESTION_THRESHOLDS
+def _congestion_level(mempool_count: int, params: AgentParams = DEFAULT_PARAMS) -> str:
+    low, high = params.congestion_thresholds
     if mempool_count <= low:
         return "low"
     if mempool_count <= high:
@@ -249,60 +454,31 @@ def _downgrade_confidence(level: str) -> str:
     return CONFIDENCE_ORDER[max(0, idx - 1)]
 
 
+def recommend(
+    priority: str, fee_data: dict, mempool: dict, cache_used: bool = False, params: AgentParams = DEFAULT_PARAMS
+) -> AgentResult:
+    obs = observe(priority, fee_data, mempool, cache_used, params)
+    return AgentResult(obs, decide(obs, params))
+
+
+def estimate(
+    user_fee_sat_vb: float,
+    fee_data: dict,
+    mempool: dict,
+    cache_used: bool = False,
+    params: AgentParams = DEFAULT_PARAMS,
+) -> AgentResult:
+    obs = observe_estimate(user_fee_sat_vb, mempool, cache_used, fee_data, params)
+    return AgentResult(obs, decide(obs, params))
+
+
 def recommend_fee(
     priority: str, fee_data: dict, mempool: dict, cache_used: bool = False
 ) -> FeeRecommendation:
-    obs = observe(priority, fee_data, mempool, cache_used)
-    decision = decide(obs)
-    explanation = explain(obs, decision)
-
-    return FeeRecommendation(
-        mode="recommend",
-        priority=priority,
-        base_fee_sat_vb=obs["base_fee"],
-        recommended_fee_sat_vb=decision["recommended_fee"],
-        eta_blocks_min=decision["eta_blocks_min"],
-        eta_blocks_max=decision["eta_blocks_max"],
-        eta_minutes_min=decision["eta_minutes_min"],
-        eta_minutes_max=decision["eta_minutes_max"],
-        risk_level=decision["risk_level"],
-        mempool_tx_count=obs["mempool_tx_count"],
-        explanation=explanation,
-        agent_summary="",
-        what_if_hint=None,
-        signals_used=obs["signals"],
-        rules_fired=decision["rules_fired"],
-        confidence=decision["confidence"],
-        cache_used=obs["cache_used"],
-        source="mempool.space",
-    )
+    return recommend(priority, fee_data, mempool, cache_used).to_model()
 
 
 def estimate_fee(
-    user_fee_sat_vb: int, fee_data: dict, mempool: dict, cache_used: bool = False
+    user_fee_sat_vb: float, fee_data: dict, mempool: dict, cache_used: bool = False
 ) -> FeeRecommendation:
-    obs = observe_estimate(user_fee_sat_vb, mempool, cache_used, fee_data)
-    decision = decide(obs)
-    explanation = explain(obs, decision)
-
-    return FeeRecommendation(
-        mode="estimate",
-        priority=obs["priority"],
-        base_fee_sat_vb=obs.get("base_fee_ref", obs["input_fee"]),
-        recommended_fee_sat_vb=decision["recommended_fee"],
-        input_fee_sat_vb=user_fee_sat_vb,
-        eta_blocks_min=decision["eta_blocks_min"],
-        eta_blocks_max=decision["eta_blocks_max"],
-        eta_minutes_min=decision["eta_minutes_min"],
-        eta_minutes_max=decision["eta_minutes_max"],
-        risk_level=decision["risk_level"],
-        mempool_tx_count=obs["mempool_tx_count"],
-        explanation=explanation,
-        agent_summary="",
-        what_if_hint=None,
-        signals_used=obs["signals"],
-        rules_fired=decision["rules_fired"],
-        confidence=decision["confidence"],
-        cache_used=obs["cache_used"],
-        source="mempool.space",
-    )
+    return estimate(user_fee_sat_vb, fee_data, mempool, cache_used).to_model()
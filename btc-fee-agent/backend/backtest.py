@@ -0,0 +1,318 @@
+"""Backtest agent parameters against recorded network snapshots.
+
+Replays traces recorded with `python -m backend.replay record`, or a time
+range of the network tape (`backend/tape.py`), through
+`agent.observe`/`agent.decide` for every parameter set in a grid, in a
+process pool, and scores each set:
+
+    python -m backend.backtest --trace data/trace.jsonl.gz --step 60 \\
+        --workers 8 --out data/backtest.json [--grid grid.json]
+    python -m backend.backtest --tape --since 2026-10-01T00:00:00Z --until 2026-10-08T00:00:00Z
+
+Ground truth comes from the blocks mined after each sample. A block's
+minimum included fee is taken from `/blocks` (`extras.feeRange`) when the
+trace has it. Otherwise it is the projected next block's minimum fee just
+before the tip moved. A recommended fee "confirms" in the first later block
+whose minimum it clears.
+
+Per priority and overall, each set is scored on:
+- overpay_pct: how far the fee is above the cheapest fee that would have
+  confirmed within the promised `eta_blocks_max`;
+- late_rate: share of recommendations that did not confirm by `eta_blocks_max`;
+- in_range_rate: share that confirmed inside `[eta_blocks_min, eta_blocks_max]`.
+
+score = overpay_pct + late_weight * late_rate * 100 (lower is better).
+"""
+
+import argparse
+import bisect
+import itertools
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import asdict
+from pathlib import Path
+from typing import Iterable, Iterator
+
+from . import tape
+from .agent import DEFAULT_PARAMS, AgentParams, decide, observe
+from .replay import load_trace
+
+PRIORITIES = ("fast", "medium", "slow")
+DEFAULT_STEP_SECONDS = 60.0
+DEFAULT_HORIZON_BLOCKS = 48
+DEFAULT_LATE_WEIGHT = 1.0
+
+DEFAULT_GRID = {
+    "congestion_thresholds": [(20_000, 100_000), (50_000, 200_000), (100_000, 300_000)],
+    "max_congestion_bonus": [0.0, 0.15, 0.30, 0.45],
+    "eta_breakpoints": [(0.33, 0.66)],
+    "eta_factors": [(1.0, 1.25, 1.5), (1.0, 1.5, 2.0), (1.0, 2.0, 3.0)],
+}
+
+# One sample: (epoch, fee_data, mempool tx count, negated running minimum of
+# the next blocks' minimum fees). Negated so bisect finds the first block a
+# fee clears in O(log n).
+Sample = tuple[float, dict, int, tuple[float, ...]]
+
+
+def _block_min_fee(block: dict) -> float | None:
+    fee_range = (block.get("extras") or {}).get("feeRange") or block.get("feeRange")
+    return min(fee_range) if fee_range else None
+
+
+def trace_events(paths: Iterable[Path]) -> Iterator[tuple[float, str, object]]:
+    """(epoch, path, parsed body) for every 200 response, in time order."""
+    events = []
+    for path in paths:
+        header, by_path = load_trace(path)
+        started = header.get("started_at", 0.0)
+        parsed: dict[int, object] = {}  # identical bodies share one string
+        for api_path, entries in by_path.items():
+            for entry in entries:
+                if entry["s"] != 200:
+                    continue
+                body = entry["body"]
+                if id(body) not in parsed:
+                    try:
+                        parsed[id(body)] = json.loads(body)
+                    except ValueError:
+                        continue
+                events.append((started + entry["t"], api_path, parsed[id(body)]))
+    events.sort(key=lambda event: event[0])
+    return iter(events)
+
+
+# Tape parts as the upstream paths build_samples understands.
+TAPE_PATHS = {
+    "fee_data": "/v1/fees/recommended",
+    "mempool_data": "/mempool",
+    "mempool_blocks": "/v1/fees/mempool-blocks",
+}
+
+
+def tape_events(since: float | None = None, until: float | None = None) -> Iterator[tuple[float, str, object]]:
+    """`trace_events` for a time range of the network tape (streamed)."""
+    previous: dict[str, object] = {}
+    for snapshot in tape.iter_snapshots(since, until):
+        epoch = snapshot["epoch"]
+        if snapshot["tip_height"] is not None and snapshot["tip_height"] != previous.get("tip"):
+            previous["tip"] = snapshot["tip_height"]
+            yield epoch, "/blocks/tip/height", snapshot["tip_height"]
+        for part, path in TAPE_PATHS.items():
+            # Unchanged parts are the same object from one snapshot to the next.
+            if snapshot[part] is not None and snapshot[part] is not previous.get(part):
+                previous[part] = snapshot[part]
+                yield epoch, path, snapshot[part]
+
+
+def build_samples(
+    events: Iterable[tuple[float, str, object]],
+    step: float = DEFAULT_STEP_SECONDS,
+    horizon: int = DEFAULT_HORIZON_BLOCKS,
+) -> list[Sample]:
+    """Sample the replayed state every `step` seconds and attach block outcomes."""
+    state: dict[str, object] = {}
+    block_fees: dict[int, float] = {}
+    raw: list[tuple[float, dict, int, int]] = []
+    next_sample = 0.0
+    for epoch, path, data in events:
+        if path == "/blocks/tip/height" and isinstance(data, int):
+            previous = state.get("tip")
+            if isinstance(previous, int) and data > previous:
+                # Proxy until /blocks reports the real fee range: what was
+                # projected next just before the tip moved.
+                projected = state.get("mempool_blocks") or []
+                for i, height in enumerate(range(previous + 1, data + 1)):
+                    if height not in block_fees and i < len(projected):
+                        fee = _block_min_fee(projected[i])
+                        if fee is not None:
+                            block_fees[height] = fee
+            state["tip"] = data
+        elif path == "/blocks" and isinstance(data, list):
+            for block in data:
+                fee = _block_min_fee(block)
+                if fee is not None and block.get("height") is not None:
+                    block_fees[block["height"]] = fee
+        elif path == "/v1/fees/recommended":
+            state["fee_data"] = data
+        elif path == "/mempool":
+            state["mempool"] = data
+        elif path == "/v1/fees/mempool-blocks":
+            state["mempool_blocks"] = data
+        if epoch >= next_sample and {"fee_data", "mempool", "tip"} <= state.keys():
+            count = int((state["mempool"] or {}).get("count", 0) or 0)
+            raw.append((epoch, state["fee_data"], count, state["tip"]))
+            next_sample = epoch + step
+
+    samples: list[Sample] = []
+    for epoch, fee_data, count, tip in raw:
+        ahead: list[float] = []
+        lowest = float("inf")
+        for height in range(tip + 1, tip + 1 + horizon):
+            fee = block_fees.get(height)
+            if fee is None:
+                break
+            lowest = min(lowest, fee)
+            ahead.append(-lowest)
+        if ahead:
+            samples.append((epoch, fee_data, count, tuple(ahead)))
+    return samples
+
+
+def _score(fees: list[float], overpay: list[float], late: int, in_range: int, counted: int, late_weight: float) -> dict:
+    n = len(fees)
+    overpay_pct = sum(overpay) / n if n else 0.0
+    late_rate = late / counted if counted else 0.0
+    return {
+        "n": n,
+        "mean_fee": round(sum(fees) / n, 4) if n else None,
+        "overpay_pct": round(overpay_pct, 3),
+        "late_rate": round(late_rate, 4),
+        "in_range_rate": round(in_range / counted, 4) if counted else 0.0,
+        "score": round(overpay_pct + late_weight * late_rate * 100, 3),
+    }
+
+
+def evaluate(params: AgentParams, samples: list[Sample], late_weight: float = DEFAULT_LATE_WEIGHT) -> dict:
+    """Score one parameter set over `samples`."""
+    per_priority = {}
+    totals = {"fees": [], "overpay": [], "late": 0, "in_range": 0, "counted": 0}
+    for priority in PRIORITIES:
+        fees: list[float] = []
+        overpay: list[float] = []
+        late = in_range = counted = 0
+        for _, fee_data, count, ahead in samples:
+            obs = observe(priority, fee_data, {"count": count}, False, params)
+            decision = decide(obs, params)
+            fee = decision.recommended_fee
+            fees.append(fee)
+            # Cheapest fee that would have confirmed within the promised blocks.
+            cheapest = -ahead[min(decision.eta_blocks_max, len(ahead)) - 1]
+            overpay.append(max(0.0, fee - cheapest) / cheapest * 100 if cheapest > 0 else 0.0)
+            confirmed_in = bisect.bisect_left(ahead, -fee) + 1
+            if confirmed_in > len(ahead):
+                if len(ahead) < decision.eta_blocks_max:
+                    continue  # outcome beyond the recorded blocks
+                late += 1
+            elif confirmed_in > decision.eta_blocks_max:
+                late += 1
+            elif confirmed_in >= decision.eta_blocks_min:
+                in_range += 1
+            counted += 1
+        per_priority[priority] = _score(fees, overpay, late, in_range, counted, late_weight)
+        totals["fees"] += fees
+        totals["overpay"] += overpay
+        totals["late"] += late
+        totals["in_range"] += in_range
+        totals["counted"] += counted
+    overall = _score(
+        totals["fees"], totals["overpay"], totals["late"], totals["in_range"], totals["counted"], late_weight
+    )
+    report_params = {**asdict(params), "presets": params.preset_map()}
+    return {"params": report_params, "overall": overall, "priorities": per_priority}
+
+
+def grid(spec: dict | None = None) -> list[AgentParams]:
+    """Cartesian product of the parameter lists in `spec` (defaults fill gaps)."""
+    spec = {**DEFAULT_GRID, **(spec or {})}
+    keys = [key for key in spec if key != "presets"]
+    presets = spec.get("presets") or [DEFAULT_PARAMS.presets]
+    combos = []
+    for values in itertools.product(*(spec[key] for key in keys), presets):
+        fields = {key: tuple(v) if isinstance(v, list) else v for key, v in zip(keys, values)}
+        combos.append(AgentParams(**fields, presets=values[-1]))
+    return combos
+
+
+_worker_samples: list[Sample] = []
+_worker_late_weight = DEFAULT_LATE_WEIGHT
+
+
+def _init_worker(samples: list[Sample], late_weight: float) -> None:
+    # Samples are shipped to each worker once, not once per parameter set.
+    global _worker_samples, _worker_late_weight
+    _worker_samples = samples
+    _worker_late_weight = late_weight
+
+
+def _evaluate_in_worker(params: AgentParams) -> dict:
+    return evaluate(params, _worker_samples, _worker_late_weight)
+
+
+def run(
+    samples: list[Sample],
+    params_list: list[AgentParams],
+    workers: int | None = None,
+    late_weight: float = DEFAULT_LATE_WEIGHT,
+) -> dict:
+    """Evaluate every parameter set in parallel; return the report."""
+    started = time.perf_counter()
+    workers = workers or os.cpu_count() or 1
+    if workers == 1:
+        results = [evaluate(params, samples, late_weight) for params in params_list]
+    else:
+        with ProcessPoolExecutor(workers, initializer=_init_worker, initargs=(samples, late_weight)) as pool:
+            chunksize = max(1, len(params_list) // (workers * 4))
+            results = list(pool.map(_evaluate_in_worker, params_list, chunksize=chunksize))
+    results.sort(key=lambda result: result["overall"]["score"])
+    baseline = evaluate(DEFAULT_PARAMS, samples, late_weight)
+    return {
+        "samples": len(samples),
+        "span_seconds": round(samples[-1][0] - samples[0][0], 1) if samples else 0.0,
+        "parameter_sets": len(params_list),
+        "late_weight": late_weight,
+        "elapsed_seconds": round(time.perf_counter() - started, 2),
+        "baseline": baseline,
+        "best": results[0] if results else None,
+        "results": results,
+    }
+
+
+def _print_summary(report: dict, top: int) -> None:
+    print(
+        f"{report['samples']} samples over {report['span_seconds'] / 3600:.1f} h, "
+        f"{report['parameter_sets']} parameter sets in {report['elapsed_seconds']} s"
+    )
+    rows = [("baseline", report["baseline"])] + [(f"#{i + 1}", r) for i, r in enumerate(report["results"][:top])]
+    for label, result in rows:
+        o, p = result["overall"], result["params"]
+        print(
+            f"{label:>9} score={o['score']:8.3f} overpay={o['overpay_pct']:7.2f}% late={o['late_rate']:.3f} "
+            f"in_range={o['in_range_rate']:.3f} thresholds={tuple(p['congestion_thresholds'])} "
+            f"bonus={p['max_congestion_bonus']} eta_factors={tuple(p['eta_factors'])}"
+        )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(prog="python -m backend.backtest")
+    parser.add_argument("--trace", type=Path, action="append", help="replay trace (repeatable)")
+    parser.add_argument("--tape", action="store_true", help="read the network tape instead of traces")
+    parser.add_argument("--since", type=tape.parse_time, help="tape range start (ISO time or epoch)")
+    parser.add_argument("--until", type=tape.parse_time, help="tape range end (ISO time or epoch)")
+    parser.add_argument("--grid", type=Path, help="JSON object of parameter name -> list of values")
+    parser.add_argument("--step", type=float, default=DEFAULT_STEP_SECONDS, help="seconds between samples")
+    parser.add_argument("--horizon", type=int, default=DEFAULT_HORIZON_BLOCKS, help="blocks of outcome per sample")
+    parser.add_argument("--late-weight", type=float, default=DEFAULT_LATE_WEIGHT)
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--top", type=int, default=5)
+    parser.add_argument("--out", type=Path, help="write the full JSON report here")
+    args = parser.parse_args()
+
+    if bool(args.trace) == args.tape:
+        parser.error("give either --trace or --tape")
+    events = tape_events(args.since, args.until) if args.tape else trace_events(args.trace)
+    samples = build_samples(events, args.step, args.horizon)
+    if not samples:
+        parser.error("no samples with block outcomes in the given input")
+    spec = json.loads(args.grid.read_text()) if args.grid else None
+    report = run(samples, grid(spec), args.workers, args.late_weight)
+    _print_summary(report, args.top)
+    if args.out:
+        args.out.write_text(json.dumps(report, indent=2))
+        print(f"Report written to {args.out}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,88 @@
+"""Fan-out of live snapshots to SSE and WebSocket subscribers.
+
+Each published version is encoded once (JSON for WebSocket clients plus a
+ready-made SSE frame) and the same bytes are handed to every subscriber.
+Subscriber queues hold only the newest payload, so a slow client skips
+versions instead of buffering them.
+"""
+
+import asyncio
+import os
+import threading
+
+from . import metrics, precompute, refresh, scheduler
+from .models import LiveStatus
+from .refresh import on_publish
+
+# SSE comment sent while idle so proxies keep the connection open.
+HEARTBEAT_SECONDS = float(os.getenv("LIVE_STREAM_HEARTBEAT_SECONDS", "15"))
+
+
+class Payload:
+    __slots__ = ("version", "json", "sse")
+
+    def __init__(self, version: int, body: str):
+        self.version = version
+        self.json = body
+        self.sse = f"id: {version}\nevent: snapshot\ndata: {body}\n\n".encode("utf-8")
+
+
+def encode(state: dict) -> Payload:
+    """LiveStatus + compare snapshot for `state`, serialized once."""
+    status = LiveStatus(**state, **scheduler.status()).model_dump_json()
+    # Published from the listener thread; the live state may be newer.
+    snapshot = precompute.current(state)
+    compare = snapshot.compare_json.decode("utf-8")
+    body = f'{{"version":{state["version"]},"status":{status},"compare":{compare}}}'
+    return Payload(state["version"], body)
+
+
+class Broadcaster:
+    def __init__(self):
+        self._subscribers: set[asyncio.Queue] = set()
+        self._loop: asyncio.AbstractEventLoop | None = None
+        self._latest: Payload | None = None
+        self._lock = threading.Lock()
+
+    def attach(self, loop: asyncio.AbstractEventLoop) -> None:
+        """Deliver on `loop`; publishes may come from any thread."""
+        self._loop = loop
+
+    def latest(self) -> Payload | None:
+        payload = self._latest
+        state = refresh.LATEST_STATE
+        if (payload is None or payload.version != state["version"]) and state["version"]:
+            payload = self.publish(state)
+        return payload
+
+    def publish(self, state: dict) -> Payload:
+        payload = encode(state)
+        with self._lock:
+            if self._latest is not None and self._latest.version >= payload.version:
+                return self._latest
+            self._latest = payload
+        metrics.incr("broadcast.versions")
+        if self._loop is not None and not self._loop.is_closed():
+            self._loop.call_soon_threadsafe(self._fanout, payload)
+        return payload
+
+    def _fanout(self, payload: Payload) -> None:
+        for queue in self._subscribers:
+            if queue.full():
+                queue.get_nowait()
+                metrics.incr("broadcast.skipped")
+            queue.put_nowait(payload)
+
+    def subscribe(self) -> asyncio.Queue:
+        queue: asyncio.Queue = asyncio.Queue(maxsize=1)
+        self._subscribers.add(queue)
+        metrics.set_gauge("broadcast.subscribers", len(self._subscribers))
+        return queue
+
+    def unsubscribe(self, queue: asyncio.Queue) -> None:
+        self._subscribers.discard(queue)
+        metrics.set_gauge("broadcast.subscribers", len(self._subscribers))
+
+
+broadcaster = Broadcaster()
+on_publish(broadcaster.publish)
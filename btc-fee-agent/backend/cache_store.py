@@ -0,0 +1,121 @@
+"""In-memory upstream cache with debounced, atomic snapshots to disk.
+
+The dict in this module is the source of truth; `data/cache.json` is only a
+snapshot used to survive restarts. Writers never touch the file directly:
+`put` marks the store dirty and a timer flushes it after `FLUSH_DELAY`.
+"""
+
+import atexit
+import json
+import logging
+import os
+import tempfile
+import threading
+import time
+from pathlib import Path
+from typing import Any
+
+CACHE_PATH = Path(__file__).resolve().parent.parent / "data" / "cache.json"
+FLUSH_DELAY = float(os.getenv("CACHE_FLUSH_DELAY_SECONDS", "2"))
+SCHEMA_VERSION = 1
+
+logger = logging.getLogger(__name__)
+
+_lock = threading.Lock()
+_write_lock = threading.Lock()  # keeps snapshot writes in serialization order
+_entries: dict[str, dict] | None = None
+_flush_timer: threading.Timer | None = None
+_dirty = False
+
+
+def _read_snapshot() -> dict[str, dict]:
+    if not CACHE_PATH.exists():
+        return {}
+    try:
+        with CACHE_PATH.open("r", encoding="utf-8") as f:
+            raw = json.load(f)
+    except (OSError, json.JSONDecodeError):
+        return {}
+    if raw.get("schema") == SCHEMA_VERSION:
+        return raw.get("entries") or {}
+    # Legacy layout: top-level keys plus an optional "last_updated" map.
+    stamps = raw.pop("last_updated", None) or {}
+    return {key: {"value": value, "updated_at": stamps.get(key)} for key, value in raw.items()}
+
+
+def _loaded() -> dict[str, dict]:
+    # Caller must hold _lock.
+    global _entries
+    if _entries is None:
+        _entries = _read_snapshot()
+    return _entries
+
+
+def get(key: str, default: Any = None) -> Any:
+    """Return the cached value for `key`."""
+    with _lock:
+        entry = _loaded().get(key)
+    return default if entry is None else entry["value"]
+
+
+def get_entry(key: str) -> dict | None:
+    """Return `{"value", "updated_at"}` for `key`, or None."""
+    with _lock:
+        return _loaded().get(key)
+
+
+def put(key: str, value: Any) -> None:
+    """Store `value` in memory and schedule a snapshot write."""
+    global _dirty
+    with _lock:
+        _loaded()[key] = {"value": value, "updated_at": int(time.time())}
+        _dirty = True
+        _schedule()
+
+
+def _schedule() -> None:
+    # Caller must hold _lock.
+    global _flush_timer
+    if _flush_timer is None:
+        _flush_timer = threading.Timer(FLUSH_DELAY, flush)
+        _flush_timer.daemon = True
+        _flush_timer.start()
+
+
+def flush() -> None:
+    """Write the current snapshot atomically (temp file + rename)."""
+    global _flush_timer, _dirty
+    with _write_lock:
+        with _lock:
+            if _flush_timer is not None:
+                _flush_timer.cancel()
+                _flush_timer = None
+            if not _dirty:
+                return
+            _dirty = False
+            payload = json.dumps(
+                {"schema": SCHEMA_VERSION, "entries": _entries}, separators=(",", ":")
+            )
+
+        tmp_path = None
+        try:
+            CACHE_PATH.parent.mkdir(parents=True, exist_ok=True)
+            fd, tmp_path = tempfile.mkstemp(dir=CACHE_PATH.parent, prefix=".cache-", suffix=".tmp")
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                f.write(payload)
+            os.chmod(tmp_path, 0o644)  # mkstemp creates 0600 files
+            os.replace(tmp_path, CACHE_PATH)
+        except OSError:
+            logger.exception("Writing the cache snapshot failed; retrying later")
+            if tmp_path is not None:
+                try:
+                    os.unlink(tmp_path)
+                except OSError:
+                    pass
+            # The snapshot on disk is still the old one: stay dirty and retry.
+            with _lock:
+                _dirty = True
+                _schedule()
+
+
+atexit.register(flush)
@@ -1,73 +1,134 @@
+import asyncio
+import hashlib
 import json
 import os
-import time
-from pathlib import Path
 from typing import Any, Tuple
 
-import requests
+import httpx
+
+from . import cache_store, http_client, metrics
+from .ratelimit import RateLimiter
+from .singleflight import flights
+from .upstream import Upstream, UpstreamUnavailable, parse_sources
 
 BASE_URL = os.getenv("MEMPOOL_BASE_URL", "https://mempool.space/api")
+# Comma-separated `[name:]kind=url` list (kind: mempool | esplora), in preference order.
+SOURCES = os.getenv("MEMPOOL_SOURCES", "")
 REQUEST_TIMEOUT = float(os.getenv("MEMPOOL_TIMEOUT", "10"))
 RETRY_COUNT = int(os.getenv("MEMPOOL_RETRY_COUNT", "2"))
 RETRY_DELAY = float(os.getenv("MEMPOOL_RETRY_DELAY", "0.5"))
+# Host-wide spacing between requests; the burst lets a refresh fan out at once.
 RATE_LIMIT_SECONDS = float(os.getenv("MEMPOOL_RATE_LIMIT_SECONDS", "0.2"))
-CACHE_PATH = Path(__file__).resolve().parent.parent / "data" / "cache.json"
-
-_last_request_ts = 0.0
-
-
-def _respect_rate_limit() -> None:
-    """Ensure we do not exceed a simple rate limit between requests."""
-    global _last_request_ts
-    elapsed = time.monotonic() - _last_request_ts
-    if elapsed < RATE_LIMIT_SECONDS:
-        time.sleep(RATE_LIMIT_SECONDS - elapsed)
-    _last_request_ts = time.monotonic()
-
-
-def _load_cache() -> dict:
-    if not CACHE_PATH.exists():
-        return {}
-    try:
-        with CACHE_PATH.open("r", encoding="utf-8") as cache_file:
-            return json.load(cache_file)
-    except (OSError, json.JSONDecodeError):
-        return {}
-
-
-def _save_cache(cache_key: str, payload: Any) -> None:
-    cache = _load_cache()
-    cache[cache_key] = payload
-    cache.setdefault("last_updated", {})[cache_key] = int(time.time())
-    CACHE_PATH.parent.mkdir(parents=True, exist_ok=True)
-    with CACHE_PATH.open("w", encoding="utf-8") as cache_file:
-        json.dump(cache, cache_file, indent=2)
-
-
-def _get_cached(cache_key: str) -> Any:
-    cache = _load_cache()
-    return cache.get(cache_key)
-
-
-def _fetch(endpoint: str, cache_key: str) -> Tuple[Any, bool]:
-    """Fetch JSON with retry, rate limit, and cache fallback."""
+RATE_LIMIT_BURST = float(os.getenv("MEMPOOL_RATE_LIMIT_BURST", "4"))
+ENDPOINT_RATE_LIMIT_SECONDS = float(os.getenv("MEMPOOL_ENDPOINT_RATE_LIMIT_SECONDS", "1"))
+ENDPOINT_RATE_LIMIT_BURST = float(os.getenv("MEMPOOL_ENDPOINT_RATE_LIMIT_BURST", "3"))
+REFRESH_CONCURRENCY = int(os.getenv("MEMPOOL_REFRESH_CONCURRENCY", "4"))
+REFRESH_DEADLINE = float(os.getenv("MEMPOOL_REFRESH_DEADLINE", "8"))
+
+_rate_limiter = RateLimiter(
+    RATE_LIMIT_SECONDS, RATE_LIMIT_BURST, ENDPOINT_RATE_LIMIT_SECONDS, ENDPOINT_RATE_LIMIT_BURST
+)
+upstream = Upstream(parse_sources(SOURCES, BASE_URL), _rate_limiter)
+# Conditional request headers per (source, cache key), the source whose body
+# is cached under each key (only it may answer 304 for that entry), the raw
+# digest of the last body (to skip parsing it again) and the digest of the
+# cached value.
+_validators: dict[tuple[str, str], dict[str, str]] = {}
+_entry_source: dict[str, str] = {}
+_body_digests: dict[str, str] = {}
+_content_digests: dict[str, str] = {}
+_last_source: dict[str, str] = {}
+
+
+def _remember_validators(key: tuple[str, str], response: httpx.Response) -> None:
+    headers = {}
+    if "etag" in response.headers:
+        headers["If-None-Match"] = response.headers["etag"]
+    if "last-modified" in response.headers:
+        headers["If-Modified-Since"] = response.headers["last-modified"]
+    if headers:
+        _validators[key] = headers
+    else:
+        _validators.pop(key, None)
+
+
+def value_digest(value: Any) -> str:
+    """Digest of a decoded value; polled and streamed data compare equal by it."""
+    raw = json.dumps(value, sort_keys=True, separators=(",", ":")).encode("utf-8")
+    return hashlib.blake2b(raw, digest_size=16).hexdigest()
+
+
+def content_digest(cache_key: str) -> str | None:
+    """Digest of the value last stored under `cache_key`."""
+    return _content_digests.get(cache_key)
+
+
+def store_external(cache_key: str, value: Any) -> str:
+    """Cache a value that did not come from polling (the stream feed); returns its digest.
+
+    No source produced this entry, so no conditional request is sent for it
+    and the next poll fetches and compares in full.
+    """
+    cache_store.put(cache_key, value)
+    _entry_source.pop(cache_key, None)
+    _body_digests.pop(cache_key, None)
+    digest = _content_digests[cache_key] = value_digest(value)
+    return digest
+
+
+def last_source(cache_key: str) -> str | None:
+    """Name of the source that last answered for `cache_key`."""
+    return _last_source.get(cache_key)
+
+
+async def _fetch(endpoint: str, cache_key: str) -> Tuple[Any, bool]:
+    """Fetch JSON; concurrent callers for the same endpoint share one request."""
+    return await flights.do(cache_key, lambda: _fetch_once(endpoint, cache_key))
+
+
+async def _fetch_once(endpoint: str, cache_key: str) -> Tuple[Any, bool]:
+    """Fetch JSON with hedging, retry, rate limit, and cache fallback."""
     last_exception: Exception | None = None
     for attempt in range(RETRY_COUNT + 1):
         try:
-            _respect_rate_limit()
-            response = requests.get(
-                f"{BASE_URL}{endpoint}", timeout=REQUEST_TIMEOUT
+            cached_entry = cache_store.get_entry(cache_key)
+            response, source = await upstream.get(
+                endpoint,
+                timeout=REQUEST_TIMEOUT,
+                headers_for=lambda src: (
+                    _validators.get((src.name, cache_key))
+                    if cached_entry and _entry_source.get(cache_key) == src.name
+                    else None
+                ),
             )
+            _last_source[cache_key] = source.name
+            if response.status_code == 304 and cached_entry:
+                metrics.incr("upstream.not_modified")
+                return cached_entry["value"], False
             response.raise_for_status()
-            data = response.json()
-            _save_cache(cache_key, data)
+            _remember_validators((source.name, cache_key), response)
+            body_digest = hashlib.blake2b(response.content, digest_size=16).hexdigest()
+            if cached_entry and body_digest == _body_digests.get(cache_key):
+                # Same bytes as last time: skip parsing and the cache write.
+                _entry_source[cache_key] = source.name
+                metrics.incr("upstream.unchanged")
+                return cached_entry["value"], False
+            data = source.decode(endpoint, response)
+            cache_store.put(cache_key, data)
+            _entry_source[cache_key] = source.name
+            _body_digests[cache_key] = body_digest
+            _content_digests[cache_key] = value_digest(data)
             return data, False
-        except (requests.RequestException, ValueError) as exc:
+        except UpstreamUnavailable as exc:
+            # Every breaker is open: go straight to the cache.
+            last_exception = exc
+            break
+        except (httpx.HTTPError, ValueError) as exc:
             last_exception = exc
             if attempt < RETRY_COUNT:
-                time.sleep(RETRY_DELAY)
+                await asyncio.sleep(RETRY_DELAY)
 
-    cached = _get_cached(cache_key)
+    cached = cache_store.get(cache_key)
     if cached is not None:
         return cached, True
 
@@ -76,23 +137,102 @@ def _fetch(endpoint: str, cache_key: str) -> Tuple[Any, bool]:
     raise RuntimeError(f"Failed to fetch {endpoint} with no cached data")
 
 
+async def fetch_fee_recommendations() -> Tuple[dict, bool]:
+    return await _fetch("/v1/fees/recommended", "fees")
+
+
+async def fetch_mempool_stats() -> Tuple[dict, bool]:
+    return await _fetch("/mempool", "mempool")
+
+
+async def fetch_blocks() -> Tuple[list, bool]:
+    return await _fetch("/blocks", "blocks")
+
+
+async def fetch_tip_height() -> Tuple[int, bool]:
+    return await _fetch("/blocks/tip/height", "blocks_tip_height")
+
+
+async def fetch_mining_targets() -> Tuple[list, bool]:
+    """Fetch projected mempool blocks with cache fallback."""
+    return await _fetch("/v1/fees/mempool-blocks", "mempool_blocks")
+
+
+# Snapshot part name -> (fetcher, cache key)
+SNAPSHOT_PARTS = {
+    "fee_data": (fetch_fee_recommendations, "fees"),
+    "mempool_data": (fetch_mempool_stats, "mempool"),
+    "mempool_blocks": (fetch_mining_targets, "mempool_blocks"),
+    "tip_height": (fetch_tip_height, "blocks_tip_height"),
+}
+
+
+async def fetch_snapshot(deadline: float = REFRESH_DEADLINE) -> dict:
+    """Fetch every snapshot part concurrently and wait for all or the deadline.
+
+    Parts that fail, miss the deadline, or were served from cache are listed
+    in `stale`; their value is the last cached copy (or None). `digests` maps
+    each part to the digest of its upstream body, for change detection.
+    """
+    budget = asyncio.Semaphore(REFRESH_CONCURRENCY)
+
+    async def _bounded(fetcher):
+        async with budget:
+            return await fetcher()
+
+    tasks = {
+        name: asyncio.create_task(_bounded(fetcher))
+        for name, (fetcher, _) in SNAPSHOT_PARTS.items()
+    }
+    _, pending = await asyncio.wait(tasks.values(), timeout=deadline)
+    for task in pending:
+        task.cancel()
+
+    parts: dict = {}
+    stale: list[str] = []
+    errors: dict[str, str] = {}
+    for name, task in tasks.items():
+        if task in pending:
+            errors[name] = f"timed out after {deadline}s"
+        elif task.exception() is not None:
+            errors[name] = str(task.exception())
+        else:
+            value, cache_used = task.result()
+            parts[name] = value
+            if cache_used:
+                stale.append(name)
+            continue
+        parts[name] = cache_store.get(SNAPSHOT_PARTS[name][1])
+        stale.append(name)
+    digests = {name: content_digest(key) for name, (_, key) in SNAPSHOT_PARTS.items()}
+    return {
+        "parts": parts,
+        "stale": stale,
+        "errors": errors,
+        "digests": digests,
+        "source": last_source("fees") or upstream.sources[0].name,
+    }
+
+
+# Sync wrappers for callers outside an event loop; they share the same pool.
+
+
 def get_fee_recommendations() -> Tuple[dict, bool]:
-    return _fetch("/v1/fees/recommended", "fees")
+    return http_client.run_sync(fetch_fee_recommendations())
 
 
 def get_mempool_stats() -> Tuple[dict, bool]:
-    return _fetch("/mempool", "mempool")
+    return http_client.run_sync(fetch_mempool_stats())
 
 
 def get_blocks() -> Tuple[list, bool]:
-    return _fetch("/blocks", "blocks")
+    return http_client.run_sync(fetch_blocks())
 
 
 def get_tip_height() -> Tuple[int, bool]:
-    height, cache_used = _fetch("/blocks/tip/height", "blocks_tip_height")
-    return height, cache_used
+    return http_client.run_sync(fetch_tip_height())
 
 
 def get_mining_targets() -> Tuple[list, bool]:
     """Fetch projected mempool blocks with cache fallback."""
-    return _fetch("/v1/fees/mempool-blocks", "mempool_blocks")
+    return http_client.run_sync(fetch_mining_targets())
@@ -1,34 +1,269 @@
-import csv
+"""Recommendation history, written by a group-commit writer.
+
+Request handlers never touch the disk: `append_history` stamps the rows and
+puts them on a bounded queue. One background thread drains the queue and
+appends everything that arrived within `HISTORY_FLUSH_SECONDS` to the binary
+store (`backend/history_store.py`) in one write (and one fsync, if asked for).
+
+Recent rows are also kept in an in-memory ring (`HISTORY_RECENT_ROWS`), which
+`read_recent` serves from. The ring mirrors the tail of the store: before
+each read it appends whatever any worker committed since the last one (only
+a header read when nothing changed), so every worker serves the same
+committed rows, at O(limit) however large the history grows. Reads flush
+this worker's queue first, so a row shows up as soon as it was appended.
+
+- HISTORY_DURABILITY: `buffered` (handed to the OS per batch, default),
+  `fsync` (also fsync per batch) or `sync` (write and fsync before the
+  request returns, no queue).
+- HISTORY_QUEUE_POLICY: what happens when the queue is full; `drop` the rows
+  (default, counted in `history.dropped`) or `block` the caller for up to
+  HISTORY_BLOCK_TIMEOUT_SECONDS.
+"""
+
+import asyncio
+import atexit
+import itertools
+import logging
+import os
+import queue
+import threading
+import time
+from collections import deque
 from datetime import datetime, timezone
-from pathlib import Path
-from typing import Iterable, List
+from typing import Iterable
 
-HISTORY_PATH = Path(__file__).resolve().parent.parent / "data" / "history.csv"
+from . import history_rollup, history_store, metrics
 
+DURABILITY = os.getenv("HISTORY_DURABILITY", "buffered")
+QUEUE_POLICY = os.getenv("HISTORY_QUEUE_POLICY", "drop")
+QUEUE_SIZE = int(os.getenv("HISTORY_QUEUE_SIZE", "10000"))
+FLUSH_SECONDS = float(os.getenv("HISTORY_FLUSH_SECONDS", "1"))
+BLOCK_TIMEOUT = float(os.getenv("HISTORY_BLOCK_TIMEOUT_SECONDS", "1"))
+RECENT_ROWS = int(os.getenv("HISTORY_RECENT_ROWS", "1000"))
+MAX_BATCH_ROWS = 5000
 
-def _ensure_file(headers: List[str]) -> None:
-    HISTORY_PATH.parent.mkdir(parents=True, exist_ok=True)
-    if not HISTORY_PATH.exists():
-        with HISTORY_PATH.open("w", newline="", encoding="utf-8") as f:
-            writer = csv.DictWriter(f, fieldnames=headers)
-            writer.writeheader()
+logger = logging.getLogger(__name__)
 
+_queue: queue.Queue = queue.Queue(maxsize=QUEUE_SIZE)
+_STOP = object()
+_thread: threading.Thread | None = None
+_thread_lock = threading.Lock()
+_recent: deque[dict] = deque(maxlen=RECENT_ROWS)
+_recent_lock = threading.Lock()
+_recent_end = 0  # store position one past the newest row in the ring
+_retry: list[dict] = []  # rows whose write failed; the writer tries them again first
 
-def append_history(rows: Iterable[dict]) -> None:
-    """Append iterable of rows to history CSV with a timestamp column."""
-    headers = ["timestamp", "priority", "base_fee_sat_vb", "mempool_tx_count", "recommended_fee_sat_vb"]
-    _ensure_file(headers)
+
+def _commit(rows: list[dict]) -> bool:
+    """Write `rows`; False if an I/O error left them unwritten (worth a retry)."""
+    if not rows:
+        return True
+    try:
+        history_store.store().append(history_store.encode(rows), fsync=DURABILITY in ("fsync", "sync"))
+    except OSError:
+        logger.exception("Writing %d history rows failed; keeping them for a retry", len(rows))
+        metrics.incr("history.write_errors")
+        return False
+    except ValueError:
+        logger.exception("Writing %d history rows failed", len(rows))
+        metrics.incr("history.write_errors")
+        metrics.incr("history.dropped", len(rows))
+        return True
+    metrics.incr("history.batches")
+    metrics.incr("history.rows_written", len(rows))
+    try:
+        history_rollup.update()
+    except (OSError, ValueError):
+        logger.exception("Updating history rollups failed")
+    return True
+
+
+def _run() -> None:
+    global _retry
+    while True:
+        batch, _retry = _retry, []
+        waiters: list[threading.Event] = []
+        stop = False
+        try:
+            # With rows waiting for a retry, wake up after one interval anyway.
+            item = _queue.get(timeout=FLUSH_SECONDS if batch else None)
+        except queue.Empty:
+            item = None
+        deadline = time.monotonic() + FLUSH_SECONDS
+        # Group commit: collect until the interval ends, a flush is requested
+        # or the batch is full, then write everything at once.
+        while item is not None:
+            if item is _STOP:
+                stop = True
+            elif isinstance(item, threading.Event):
+                waiters.append(item)
+            else:
+                batch.append(item)
+            if stop or waiters or len(batch) >= MAX_BATCH_ROWS:
+                break
+            try:
+                item = _queue.get(timeout=max(0.0, deadline - time.monotonic()))
+            except queue.Empty:
+                break
+        if stop or waiters:
+            batch += _drain()
+        if not _commit(batch):
+            if stop:
+                logger.error("%d history rows could not be written before shutdown", len(batch))
+            # Oldest rows go first if the failure outlasts a queue's worth.
+            _retry = batch[-QUEUE_SIZE:]
+            metrics.incr("history.dropped", len(batch) - len(_retry))
+        metrics.set_gauge("history.queue_depth", _queue.qsize())
+        for event in waiters:
+            event.set()
+        if stop:
+            return
+
+
+def _drain() -> list[dict]:
+    rows = []
+    while True:
+        try:
+            item = _queue.get_nowait()
+        except queue.Empty:
+            return rows
+        if isinstance(item, dict):
+            rows.append(item)
+        elif isinstance(item, threading.Event):
+            item.set()
+
+
+def _ensure_writer() -> None:
+    global _thread
+    if _thread is None or not _thread.is_alive():
+        with _thread_lock:
+            if _thread is None or not _thread.is_alive():
+                _thread = threading.Thread(target=_run, name="history-writer", daemon=True)
+                _thread.start()
+
+
+def _stamp(rows: Iterable[dict]) -> list[dict]:
     timestamp = datetime.now(timezone.utc).isoformat()
-    with HISTORY_PATH.open("a", newline="", encoding="utf-8") as f:
-        writer = csv.DictWriter(f, fieldnames=headers)
-        for row in rows:
-            writer.writerow({"timestamp": timestamp, **row})
+    return [{"timestamp": timestamp, **row} for row in rows]
+
+
+def _put(rows: list[dict], block: bool) -> int:
+    """Queue `rows` in order; return how many did not fit."""
+    _ensure_writer()
+    for i, row in enumerate(rows):
+        try:
+            if block:
+                _queue.put(row, timeout=BLOCK_TIMEOUT)
+            else:
+                _queue.put_nowait(row)
+        except queue.Full:
+            return len(rows) - i
+    return 0
+
+
+def _queued(rows: list[dict], left: int) -> None:
+    metrics.incr("history.enqueued", len(rows) - left)
+    if left:
+        metrics.incr("history.dropped", left)
+
+
+def append_history(rows: Iterable[dict]) -> None:
+    """Stamp `rows` and queue them for the writer's next group commit into the store.
+
+    With HISTORY_DURABILITY=sync the rows are written before returning
+    instead. A full queue drops or blocks per HISTORY_QUEUE_POLICY.
+    """
+    rows = _stamp(rows)
+    if DURABILITY == "sync":
+        if not _commit(rows):
+            _queued(rows, _put(rows, block=False))  # the writer retries them
+        return
+    _queued(rows, _put(rows, block=QUEUE_POLICY == "block"))
+
+
+async def append_history_async(rows: Iterable[dict]) -> None:
+    """`append_history` for the event loop; a blocked caller waits off the loop."""
+    rows = _stamp(rows)
+    if DURABILITY == "sync":
+        if not await asyncio.to_thread(_commit, rows):
+            _queued(rows, _put(rows, block=False))  # the writer retries them
+        return
+    left = _put(rows, block=False)
+    if left and QUEUE_POLICY == "block":
+        metrics.incr("history.blocked")
+        left = await asyncio.to_thread(_put, rows[len(rows) - left :], True)
+    _queued(rows, left)
+
+
+def flush(timeout: float = 5.0) -> bool:
+    """Wait until everything queued so far is written; False on timeout."""
+    if _thread is None or not _thread.is_alive():
+        return True
+    done = threading.Event()
+    try:
+        _queue.put(done, timeout=timeout)
+    except queue.Full:
+        return False
+    return done.wait(timeout)
+
+
+def close(timeout: float = 5.0) -> None:
+    """Write what is queued and stop the writer (shutdown)."""
+    global _thread
+    thread = _thread
+    if thread is not None and thread.is_alive():
+        try:
+            _queue.put(_STOP, timeout=timeout)
+        except queue.Full:
+            logger.warning("History queue still full at shutdown; %d rows lost", _queue.qsize())
+        thread.join(timeout)
+    _thread = None
+    history_rollup.save()
+
+
+def seed_recent() -> None:
+    """Bring the ring up to date with the store (the first call fills it from the tail)."""
+    global _recent_end
+    with _recent_lock:
+        try:
+            store = history_store.store()
+            end = store.count()
+            if end < _recent_end:
+                _recent.clear()  # the store was replaced
+                _recent_end = 0
+            if end > _recent_end:
+                rows = history_store.to_items(store.read(max(_recent_end, end - RECENT_ROWS), end))
+                _recent.extend(rows)
+                _recent_end = end
+        except (OSError, ValueError):
+            logger.exception("Reading the history tail failed")
 
 
 def read_recent(limit: int = 10) -> list[dict]:
-    """Read the last `limit` records from history."""
-    if not HISTORY_PATH.exists():
-        return []
-    with HISTORY_PATH.open("r", newline="", encoding="utf-8") as f:
-        reader = list(csv.DictReader(f))
-    return reader[-limit:]
+    """Read the last `limit` records from history (blocking; call off the event loop).
+
+    Rows still queued by this worker are written first, whatever `limit` is.
+    """
+    flush()
+    if limit > RECENT_ROWS:
+        return history_store.to_items(history_store.store().tail(limit))
+    seed_recent()
+    with _recent_lock:
+        rows = list(itertools.islice(reversed(_recent), limit))
+    rows.reverse()
+    return rows
+
+
+def query(
+    since: float | None = None,
+    until: float | None = None,
+    priority: str | None = None,
+    limit: int = 100,
+    cursor: int | None = None,
+) -> tuple[list[dict], int | None]:
+    """A page of stored history (oldest first) and the cursor for the older page."""
+    records, next_cursor = history_store.store().query(since, until, priority, limit, cursor)
+    return history_store.to_items(records), next_cursor
+
+
+atexit.register(close)
@@ -0,0 +1,270 @@
+"""Per-minute, per-hour and per-day rollups of the recommendation history.
+
+For every resolution and priority, a bucket keeps the count, min, max, sum
+and last recommended fee, plus the summed mempool count. Charts and insights
+then cost O(buckets) instead of O(rows).
+
+The rollups are maintained incrementally. `update()` folds in the store
+records past the watermark (the number of records already rolled up), so
+rows written by any worker are counted exactly once. It runs on the history
+writer after each commit and on the `run()` timer (for other workers' rows),
+never in a request: `buckets()` and `summary()` only read. The state is
+saved next to the raw history in `data/history/rollup.json` (temp file +
+rename) and reloaded at start; with shared state on, only the leader writes
+the file. Minute and hour buckets older than their retention (relative to
+the newest record) are dropped.
+"""
+
+import asyncio
+import json
+import logging
+import os
+import tempfile
+import threading
+import time
+from datetime import datetime, timezone
+
+import numpy as np
+
+from . import history_store, shared_state
+
+RESOLUTIONS = {"minute": 60, "hour": 3600, "day": 86400}
+RETENTION_SECONDS = {
+    "minute": float(os.getenv("HISTORY_ROLLUP_MINUTE_DAYS", "2")) * 86400,
+    "hour": float(os.getenv("HISTORY_ROLLUP_HOUR_DAYS", "90")) * 86400,
+    "day": None,
+}
+ROLLUP_PATH = history_store.HISTORY_DIR / "rollup.json"
+SAVE_SECONDS = float(os.getenv("HISTORY_ROLLUP_SAVE_SECONDS", "30"))
+REFRESH_SECONDS = float(os.getenv("HISTORY_ROLLUP_REFRESH_SECONDS", "5"))
+FOLD_CHUNK = 100_000
+SCHEMA_VERSION = 1
+
+# Bucket values: [count, min, max, sum, last_epoch, last, mempool_sum]
+COUNT, MIN, MAX, SUM, LAST_EPOCH, LAST, MEMPOOL_SUM = range(7)
+
+logger = logging.getLogger(__name__)
+
+_lock = threading.Lock()  # guards the buckets; held per chunk, not per update
+_update_lock = threading.Lock()  # one fold at a time
+_buckets: dict[str, dict[tuple[int, float], list]] = {name: {} for name in RESOLUTIONS}
+_watermark = 0
+_newest = 0.0
+_loaded = False
+_last_save = 0.0
+
+
+def _load() -> None:
+    # Caller must hold _lock.
+    global _watermark, _newest, _loaded
+    if _loaded:
+        return
+    _loaded = True
+    try:
+        with ROLLUP_PATH.open("r", encoding="utf-8") as f:
+            raw = json.load(f)
+    except (OSError, ValueError):
+        return
+    if raw.get("schema") != SCHEMA_VERSION or raw.get("watermark", 0) > history_store.store().count():
+        return  # the store was replaced; rebuild from scratch
+    for name in RESOLUTIONS:
+        _buckets[name] = {(row[0], row[1]): row[2:] for row in raw["buckets"].get(name, [])}
+    _watermark = raw["watermark"]
+    _newest = raw.get("newest", 0.0)
+
+
+def _payload() -> str:
+    # Caller must hold _lock.
+    return json.dumps(
+        {
+            "schema": SCHEMA_VERSION,
+            "watermark": _watermark,
+            "newest": _newest,
+            "buckets": {
+                name: [[code, start, *values] for (code, start), values in buckets.items()]
+                for name, buckets in _buckets.items()
+            },
+        },
+        separators=(",", ":"),
+    )
+
+
+def _owns_file() -> bool:
+    # Followers fold the same rows in memory; one writer is enough.
+    return shared_state.role() != "follower"
+
+
+def _write(payload: str) -> None:
+    ROLLUP_PATH.parent.mkdir(parents=True, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=ROLLUP_PATH.parent, prefix=".rollup-", suffix=".tmp")
+    try:
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            f.write(payload)
+        os.chmod(tmp_path, 0o644)
+        os.replace(tmp_path, ROLLUP_PATH)
+    except OSError:
+        logger.exception("Saving history rollups failed")
+        try:
+            os.unlink(tmp_path)
+        except OSError:
+            pass
+
+
+def _fold(records: np.ndarray) -> None:
+    """Merge `records` into every resolution's buckets (vectorized per chunk)."""
+    global _newest
+    records = records[~np.isnan(records["recommended_fee"])]
+    if not len(records):
+        return
+    epochs = records["epoch"]
+    fees = records["recommended_fee"]
+    codes = records["priority"].astype(np.int64)
+    mempool = records["mempool_tx_count"].astype(np.float64)
+    _newest = max(_newest, float(epochs.max()))
+    for name, width in RESOLUTIONS.items():
+        starts = np.floor(epochs / width) * width
+        # By bucket, priority, then time: buckets get inserted in time order.
+        order = np.lexsort((epochs, codes, starts))
+        c, s, e, f, m = codes[order], starts[order], epochs[order], fees[order], mempool[order]
+        first = np.flatnonzero(np.r_[True, (np.diff(c) != 0) | (np.diff(s) != 0)])
+        last = np.r_[first[1:], len(c)] - 1
+        groups = zip(
+            c[first].tolist(),
+            s[first].tolist(),
+            (last - first + 1).tolist(),
+            np.minimum.reduceat(f, first).tolist(),
+            np.maximum.reduceat(f, first).tolist(),
+            np.add.reduceat(f, first).tolist(),
+            e[last].tolist(),
+            f[last].tolist(),
+            np.add.reduceat(m, first).tolist(),
+        )
+        buckets = _buckets[name]
+        for code, start, count, low, high, total, last_epoch, last_fee, mempool_total in groups:
+            bucket = buckets.get((code, start))
+            if bucket is None:
+                buckets[(code, start)] = [count, low, high, total, last_epoch, last_fee, mempool_total]
+                continue
+            bucket[COUNT] += count
+            bucket[MIN] = min(bucket[MIN], low)
+            bucket[MAX] = max(bucket[MAX], high)
+            bucket[SUM] += total
+            if last_epoch >= bucket[LAST_EPOCH]:
+                bucket[LAST_EPOCH], bucket[LAST] = last_epoch, last_fee
+            bucket[MEMPOOL_SUM] += mempool_total
+
+
+def _prune() -> None:
+    for name, retention in RETENTION_SECONDS.items():
+        if retention is None:
+            continue
+        cutoff = _newest - retention
+        buckets = _buckets[name]
+        for key in [key for key in buckets if key[1] < cutoff]:
+            del buckets[key]
+
+
+def update() -> int:
+    """Fold in records appended since the last call; returns how many."""
+    global _watermark, _last_save
+    store = history_store.store()
+    folded = 0
+    with _update_lock:
+        with _lock:
+            _load()
+        # Decoding happens outside _lock, so readers wait for one fold at most.
+        for position, records in store.iter_from(_watermark, FOLD_CHUNK):
+            with _lock:
+                _fold(records)
+                folded += position + len(records) - _watermark
+                _watermark = position + len(records)
+        if folded and time.monotonic() - _last_save >= SAVE_SECONDS:
+            _last_save = time.monotonic()
+            with _lock:
+                _prune()
+                payload = _payload() if _owns_file() else None
+            if payload is not None:
+                _write(payload)
+    return folded
+
+
+def save() -> None:
+    """Persist the rollups now (shutdown)."""
+    with _update_lock:
+        with _lock:
+            if not _loaded or not _owns_file():
+                return
+            _prune()
+            payload = _payload()
+        _write(payload)
+
+
+async def run() -> None:
+    """Fold in rows written by any worker every REFRESH_SECONDS."""
+    while True:
+        try:
+            await asyncio.to_thread(update)
+        except (OSError, ValueError):
+            logger.exception("Updating history rollups failed")
+        await asyncio.sleep(REFRESH_SECONDS)
+
+
+def _row(name: str, code: int, start: float, values: list) -> dict:
+    return {
+        "start": datetime.fromtimestamp(start, timezone.utc).isoformat(),
+        "epoch": start,
+        "resolution": name,
+        "priority": history_store.priority_name(code),
+        "count": values[COUNT],
+        "min": values[MIN],
+        "max": values[MAX],
+        "mean": round(values[SUM] / values[COUNT], 4),
+        "last": values[LAST],
+        "mean_mempool_tx_count": round(values[MEMPOOL_SUM] / values[COUNT], 1),
+    }
+
+
+def buckets(
+    resolution: str,
+    priority: str | None = None,
+    since: float | None = None,
+    until: float | None = None,
+    limit: int | None = None,
+) -> list[dict]:
+    """Buckets of `resolution`, oldest first (the newest `limit` if given)."""
+    code = None if priority is None else history_store.PRIORITY_CODES.get(priority, history_store.UNKNOWN_PRIORITY)
+    with _lock:
+        selected = [
+            (start, key_code, list(values))
+            for (key_code, start), values in _buckets[resolution].items()
+            if (code is None or key_code == code)
+            and (since is None or start + RESOLUTIONS[resolution] > since)
+            and (until is None or start < until)
+        ]
+    selected.sort(key=lambda item: (item[0], item[1]))
+    if limit is not None:
+        selected = selected[-limit:]
+    return [_row(resolution, key_code, start, values) for start, key_code, values in selected]
+
+
+def summary(window: float, resolution: str = "minute") -> dict[str, dict]:
+    """Per priority count and mean fee over the `window` seconds up to the newest record."""
+    width = RESOLUTIONS[resolution]
+    totals: dict[int, list] = {}
+    with _lock:
+        cutoff = _newest - window
+        # Insertion order is roughly chronological; walk back from the newest
+        # bucket and stop once clearly past the window (late rows may land a
+        # little out of order).
+        for (code, start), values in reversed(_buckets[resolution].items()):
+            if start + width <= cutoff - 10 * width:
+                break
+            if start + width > cutoff:
+                total = totals.setdefault(code, [0, 0.0])
+                total[0] += values[COUNT]
+                total[1] += values[SUM]
+    return {
+        history_store.priority_name(code): {"count": count, "mean": round(total / count, 4)}
+        for code, (count, total) in totals.items()
+        if count
+    }
@@ -0,0 +1,869 @@
+"""Append-only binary history store, split into compressed time segments.
+
+History lives in `data/history/` (`HISTORY_STORE_DIR`). The active segment is
+a `HistoryStore`: a 64-byte header followed by fixed-width 32-byte records
+(`RECORD_DTYPE`): epoch seconds, base fee, recommended fee, mempool tx count
+and a priority code. The file is memory-mapped and read through NumPy views,
+so a query copies only the rows it returns.
+
+The header's record count is the commit point. Appenders write records past
+it and then bump it, under an exclusive file lock, so other worker processes
+never read half-written rows. Each process keeps an in-memory index and
+extends it incrementally as the count grows:
+- per block of INDEX_STRIDE records, the min/max epoch (rows arrive in
+  roughly time order, so a range query only touches overlapping blocks);
+- per priority, the positions of its records.
+
+`SegmentedStore` seals the active segment per HISTORY_SEGMENT_SECONDS into a
+compressed file, drops old segments (HISTORY_RETENTION_DAYS,
+HISTORY_MAX_BYTES) and merges cold ones (HISTORY_COMPACT_AFTER_DAYS). Record
+positions are global and stable, so reads and cursors span segments.
+
+Import the legacy CSV (done automatically when the store is created):
+    python -m backend.history_store import data/history.csv
+"""
+
+import argparse
+import csv
+import gzip
+import json
+import logging
+import lzma
+import mmap
+import os
+import struct
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from pathlib import Path
+
+import numpy as np
+
+from . import metrics
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover - Windows
+    fcntl = None
+    import msvcrt
+
+_DATA_DIR = Path(__file__).resolve().parent.parent / "data"
+HISTORY_DIR = Path(os.getenv("HISTORY_STORE_DIR", str(_DATA_DIR / "history")))
+LEGACY_STORE_PATH = _DATA_DIR / "history.bin"
+CSV_PATH = _DATA_DIR / "history.csv"
+SEGMENT_SECONDS = float(os.getenv("HISTORY_SEGMENT_SECONDS", "86400"))
+SEGMENT_MAX_RECORDS = int(os.getenv("HISTORY_SEGMENT_MAX_RECORDS", "1000000"))
+SEGMENT_CODEC = os.getenv("HISTORY_SEGMENT_CODEC", "gzip")
+COLD_CODEC = os.getenv("HISTORY_COLD_CODEC", "lzma")
+COMPACT_AFTER_DAYS = float(os.getenv("HISTORY_COMPACT_AFTER_DAYS", "7"))
+COMPACT_SPAN_DAYS = float(os.getenv("HISTORY_COMPACT_SPAN_DAYS", "30"))
+RETENTION_DAYS = float(os.getenv("HISTORY_RETENTION_DAYS", "0"))  # 0 keeps everything
+MAX_BYTES = int(os.getenv("HISTORY_MAX_BYTES", "0"))  # 0 means no size cap
+DECODED_SEGMENTS = 4
+INDEX_STRIDE = 1024
+GROW_RECORDS = 32 * 1024  # file grows 1 MiB at a time
+SCAN_CHUNK = 4096
+
+MAGIC = b"BFAHST01"
+HEADER_SIZE = 64
+_HEADER = struct.Struct("<8sI")
+_COUNT = struct.Struct("<Q")
+_COUNT_OFFSET = 16
+SEGMENT_MAGIC = b"BFAHSG01"
+_SEGMENT_HEADER = struct.Struct("<8sQQ")  # magic, base position, record count
+CODECS = {"gzip": (".gz", gzip.open), "lzma": (".xz", lzma.open)}
+
+RECORD_DTYPE = np.dtype(
+    [
+        ("epoch", "<f8"),
+        ("base_fee", "<f8"),
+        ("recommended_fee", "<f8"),
+        ("mempool_tx_count", "<u4"),
+        ("priority", "u1"),
+        ("_pad", "V3"),
+    ]
+)
+# Codes are stored on disk; only ever append to this tuple.
+PRIORITY_NAMES = ("fast", "medium", "slow", "estimate", "normal", "cheap", "very_fast", "extreme_fast", "extreme_slow")
+PRIORITY_CODES = {name: code for code, name in enumerate(PRIORITY_NAMES)}
+UNKNOWN_PRIORITY = 255
+
+logger = logging.getLogger(__name__)
+
+
+def priority_name(code: int) -> str:
+    return PRIORITY_NAMES[code] if code < len(PRIORITY_NAMES) else "unknown"
+
+
+def _float(value) -> float:
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return float("nan")
+
+
+def _count(value) -> int:
+    try:
+        return max(0, int(float(value)))
+    except (TypeError, ValueError, OverflowError):
+        return 0
+
+
+def _epoch(timestamp) -> float:
+    if isinstance(timestamp, (int, float)):
+        return float(timestamp)
+    return datetime.fromisoformat(timestamp).timestamp()
+
+
+def encode(rows: list[dict]) -> np.ndarray:
+    """History rows (`timestamp`, `priority`, fee columns) as records."""
+    records = np.zeros(len(rows), dtype=RECORD_DTYPE)
+    for i, row in enumerate(rows):
+        records[i] = (
+            _epoch(row["timestamp"]),
+            _float(row.get("base_fee_sat_vb")),
+            _float(row.get("recommended_fee_sat_vb")),
+            _count(row.get("mempool_tx_count")),
+            PRIORITY_CODES.get(row.get("priority"), UNKNOWN_PRIORITY),
+            b"",
+        )
+    return records
+
+
+def _clean(value: float) -> float | None:
+    return None if value != value else value  # NaN -> None
+
+
+def to_items(records: np.ndarray) -> list[dict]:
+    """Records as JSON-ready history items."""
+    return [
+        {
+            "timestamp": datetime.fromtimestamp(epoch, timezone.utc).isoformat(),
+            "priority": priority_name(code),
+            "base_fee_sat_vb": _clean(base),
+            "mempool_tx_count": count,
+            "recommended_fee_sat_vb": _clean(fee),
+        }
+        for epoch, base, fee, count, code in zip(
+            records["epoch"].tolist(),
+            records["base_fee"].tolist(),
+            records["recommended_fee"].tolist(),
+            records["mempool_tx_count"].tolist(),
+            records["priority"].tolist(),
+        )
+    ]
+
+
+def _read_at(fd: int, size: int, offset: int) -> bytes:
+    # Callers serialize on HistoryStore._lock, so the shared fd offset is safe.
+    os.lseek(fd, offset, os.SEEK_SET)
+    return os.read(fd, size)
+
+
+def _write_at(fd: int, data: bytes, offset: int) -> None:
+    os.lseek(fd, offset, os.SEEK_SET)
+    view = memoryview(data)
+    while view:
+        view = view[os.write(fd, view) :]
+
+
+@contextmanager
+def _locked(fd: int):
+    """Exclusive lock on `fd` across processes."""
+    if fcntl is not None:
+        fcntl.flock(fd, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(fd, fcntl.LOCK_UN)
+    else:
+        os.lseek(fd, 0, os.SEEK_SET)
+        msvcrt.locking(fd, msvcrt.LK_LOCK, 1)
+        try:
+            yield
+        finally:
+            os.lseek(fd, 0, os.SEEK_SET)
+            msvcrt.locking(fd, msvcrt.LK_UNLCK, 1)
+
+
+class _Positions:
+    """Growable array of record positions (old views stay valid on growth)."""
+
+    __slots__ = ("data", "size")
+
+    def __init__(self):
+        self.data = np.empty(256, dtype=np.int64)
+        self.size = 0
+
+    def extend(self, positions: np.ndarray) -> None:
+        needed = self.size + len(positions)
+        if needed > len(self.data):
+            grown = np.empty(max(needed, 2 * len(self.data)), dtype=np.int64)
+            grown[: self.size] = self.data[: self.size]
+            self.data = grown
+        self.data[self.size : needed] = positions
+        self.size = needed
+
+    def view(self) -> np.ndarray:
+        return self.data[: self.size]
+
+
+class HistoryStore:
+    def __init__(self, path: Path):
+        self.path = path
+        self._lock = threading.Lock()
+        self._fd: int | None = None
+        self._map: mmap.mmap | None = None
+        self._old_maps: list[mmap.mmap] = []
+        self._records = np.empty(0, dtype=RECORD_DTYPE)
+        self._indexed = 0
+        self._block_min = np.empty(0)
+        self._block_max = np.empty(0)
+        self._positions: dict[int, _Positions] = {}
+
+    # -- file handling (caller holds self._lock) --
+
+    def _open(self) -> None:
+        if self._fd is not None:
+            return
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        fd = os.open(self.path, os.O_RDWR | os.O_CREAT | getattr(os, "O_BINARY", 0), 0o644)
+        self._fd = fd
+        with self._file_lock():
+            if os.fstat(fd).st_size < HEADER_SIZE:
+                header = bytearray(HEADER_SIZE)
+                _HEADER.pack_into(header, 0, MAGIC, RECORD_DTYPE.itemsize)
+                _write_at(fd, bytes(header), 0)
+        magic, record_size = _HEADER.unpack(_read_at(fd, _HEADER.size, 0))
+        if magic != MAGIC or record_size != RECORD_DTYPE.itemsize:
+            os.close(fd)
+            self._fd = None
+            raise ValueError(f"{self.path} is not a history store")
+
+    def _file_lock(self):
+        return _locked(self._fd)
+
+    def _committed(self) -> int:
+        return _COUNT.unpack(_read_at(self._fd, _COUNT.size, _COUNT_OFFSET))[0]
+
+    def _remap(self, count: int) -> None:
+        size = os.fstat(self._fd).st_size
+        if self._map is not None and len(self._map) >= HEADER_SIZE + count * RECORD_DTYPE.itemsize:
+            return
+        # The old map stays open until close(): a `view()` may still use it.
+        if self._map is not None:
+            self._old_maps.append(self._map)
+        self._map = mmap.mmap(self._fd, size, access=mmap.ACCESS_READ)
+        capacity = (size - HEADER_SIZE) // RECORD_DTYPE.itemsize
+        self._records = np.frombuffer(self._map, dtype=RECORD_DTYPE, count=capacity, offset=HEADER_SIZE)
+
+    def _sync(self) -> int:
+        """Map and index everything committed so far; returns the record count."""
+        self._open()
+        count = self._committed()
+        if count > self._indexed:
+            self._remap(count)
+            self._extend_index(count)
+        return self._indexed
+
+    def _extend_index(self, count: int) -> None:
+        start = self._indexed
+        codes = self._records["priority"][start:count]
+        for code in np.unique(codes).tolist():
+            self._positions.setdefault(code, _Positions()).extend(np.flatnonzero(codes == code) + start)
+        first_block = start // INDEX_STRIDE
+        epochs = self._records["epoch"][first_block * INDEX_STRIDE : count]
+        starts = np.arange(0, len(epochs), INDEX_STRIDE)
+        self._block_min = np.concatenate([self._block_min[:first_block], np.minimum.reduceat(epochs, starts)])
+        self._block_max = np.concatenate([self._block_max[:first_block], np.maximum.reduceat(epochs, starts)])
+        self._indexed = count
+
+    # -- public API --
+
+    def append(self, records: np.ndarray, fsync: bool = False) -> None:
+        """Append records and commit them (visible to every process)."""
+        if not len(records):
+            return
+        with self._lock:
+            self._open()
+            with self._file_lock():
+                count = self._committed()
+                total = count + len(records)
+                end = HEADER_SIZE + total * RECORD_DTYPE.itemsize
+                if os.fstat(self._fd).st_size < end:
+                    capacity = -(-total // GROW_RECORDS) * GROW_RECORDS
+                    os.ftruncate(self._fd, HEADER_SIZE + capacity * RECORD_DTYPE.itemsize)
+                _write_at(self._fd, records.astype(RECORD_DTYPE, copy=False).tobytes(), end - records.nbytes)
+                if fsync:
+                    os.fsync(self._fd)
+                _write_at(self._fd, _COUNT.pack(total), _COUNT_OFFSET)
+                if fsync:
+                    os.fsync(self._fd)
+
+    def count(self) -> int:
+        with self._lock:
+            return self._sync()
+
+    def view(self) -> np.ndarray:
+        """Every committed record, as a read-only view of the map (no copy)."""
+        with self._lock:
+            return self._records[: self._sync()]
+
+    def close(self) -> None:
+        """Unmap and close the file (Windows cannot delete it before that).
+
+        Views from `view()` must be dropped first; a map that is still
+        viewed is released with its last view instead.
+        """
+        with self._lock:
+            self._records = np.empty(0, dtype=RECORD_DTYPE)
+            self._indexed = 0
+            self._block_min = self._block_max = np.empty(0)
+            self._positions = {}
+            for old in [*self._old_maps, self._map]:
+                if old is not None:
+                    try:
+                        old.close()
+                    except BufferError:
+                        pass
+            self._map = None
+            self._old_maps = []
+            if self._fd is not None:
+                os.close(self._fd)
+            self._fd = None
+
+    def read(self, start: int, stop: int | None = None) -> np.ndarray:
+        """Records [start, stop) (copied), clipped to what is committed."""
+        with self._lock:
+            count = self._sync()
+            return self._records[min(start, count) : count if stop is None else min(stop, count)].copy()
+
+    def tail(self, limit: int) -> np.ndarray:
+        """Last `limit` records (copied), oldest first."""
+        with self._lock:
+            count = self._sync()
+            return self._records[max(0, count - limit) : count].copy()
+
+    def query(
+        self,
+        since: float | None = None,
+        until: float | None = None,
+        priority: str | None = None,
+        limit: int = 100,
+        before: int | None = None,
+    ) -> tuple[np.ndarray, int | None]:
+        """Newest `limit` records with since <= epoch < until, positioned before `before`.
+
+        Returns the records oldest first and the cursor for the next (older)
+        page, or None when there is nothing older.
+        """
+        records, positions, older = self.select(since, until, priority, limit, before)
+        return records, int(positions[0]) if older else None
+
+    def select(
+        self,
+        since: float | None = None,
+        until: float | None = None,
+        priority: str | None = None,
+        limit: int = 100,
+        before: int | None = None,
+    ) -> tuple[np.ndarray, np.ndarray, bool]:
+        """`query` as (records, their positions, whether older matches may exist)."""
+        with self._lock:
+            count = self._sync()
+            lo, hi = 0, count if before is None else max(0, min(before, count))
+            if since is not None:
+                blocks = np.flatnonzero(self._block_max >= since)
+                lo = int(blocks[0]) * INDEX_STRIDE if len(blocks) else hi
+            if until is not None:
+                blocks = np.flatnonzero(self._block_min < until)
+                hi = min(hi, (int(blocks[-1]) + 1) * INDEX_STRIDE) if len(blocks) else lo
+            if priority is None:
+                candidates = None
+                end = hi
+            else:
+                code = PRIORITY_CODES.get(priority, UNKNOWN_PRIORITY)
+                index = self._positions[code].view() if code in self._positions else np.empty(0, np.int64)
+                candidates = index[np.searchsorted(index, lo) : np.searchsorted(index, hi)]
+                end = len(candidates)
+
+            found: list[np.ndarray] = []
+            total = 0
+            # Walk back from the newest candidate in chunks until the page is full.
+            while end > (0 if candidates is not None else lo) and total < limit:
+                start = max(end - SCAN_CHUNK, 0 if candidates is not None else lo)
+                positions = candidates[start:end] if candidates is not None else np.arange(start, end)
+                epochs = self._records["epoch"][positions]
+                mask = np.ones(len(positions), dtype=bool)
+                if since is not None:
+                    mask &= epochs >= since
+                if until is not None:
+                    mask &= epochs < until
+                matched = positions[mask][::-1][: limit - total]
+                found.append(matched)
+                total += len(matched)
+                end = start
+            page = np.sort(np.concatenate(found)) if found else np.empty(0, np.int64)
+            older = False
+            if total >= limit and len(page):
+                oldest = int(page[0])
+                older = bool(np.searchsorted(candidates, oldest) > 0 if candidates is not None else oldest > lo)
+            return self._records[page], page, older
+
+
+def _segment_name(base: int, codec: str | None = None) -> str:
+    return f"{base:020d}" + (CODECS[codec][0] if codec else ".bin")
+
+
+class SegmentedStore:
+    """History split into time-bounded segments, addressed by global record position.
+
+    The active segment is a `HistoryStore` file. When a record falls into a
+    new `HISTORY_SEGMENT_SECONDS` window (or the segment is full), the active
+    segment is sealed: streamed through the codec into an immutable
+    compressed file and listed in `manifest.json` with its base position,
+    count and time range. Sealing, retention and compaction run under a
+    directory lock, so worker processes agree on which file is active.
+    """
+
+    def __init__(self, directory: Path):
+        self.directory = directory
+        self.manifest_path = directory / "manifest.json"
+        self._lock = threading.Lock()
+        self._lock_fd: int | None = None
+        self._manifest_key = None
+        self._sealed: list[dict] = []
+        self._garbage: list[str] = []  # retired files whose deletion failed
+        self._active_meta = {"file": _segment_name(0), "base": 0}
+        self._active: HistoryStore | None = None
+        self._active_window: int | None = None
+        self._decoded: OrderedDict[tuple[str, int], np.ndarray] = OrderedDict()
+
+    # -- manifest and locking (caller holds self._lock) --
+
+    def _dir_lock(self):
+        if self._lock_fd is None:
+            self.directory.mkdir(parents=True, exist_ok=True)
+            self._lock_fd = os.open(self.directory / ".lock", os.O_RDWR | os.O_CREAT, 0o644)
+        return _locked(self._lock_fd)
+
+    def _refresh(self) -> None:
+        """Reload the manifest if another process changed it."""
+        try:
+            stat = os.stat(self.manifest_path)
+            key = (stat.st_ino, stat.st_mtime_ns, stat.st_size)
+        except FileNotFoundError:
+            key = None
+        if key == self._manifest_key and self._active is not None:
+            return
+        manifest = {"sealed": [], "active": {"file": _segment_name(0), "base": 0}}
+        if key is not None:
+            with self.manifest_path.open("r", encoding="utf-8") as f:
+                manifest = json.load(f)
+        self._manifest_key = key
+        self._sealed = manifest["sealed"]
+        self._garbage = manifest.get("garbage", [])
+        active = manifest["active"]
+        if self._active is None or active["file"] != self._active_meta["file"]:
+            if self._active is not None:
+                self._active.close()
+            self._active = HistoryStore(self.directory / active["file"])
+            self._active_window = None
+        self._active_meta = active
+        live = {(entry["file"], entry["count"]) for entry in self._sealed}
+        for stale in [cached for cached in self._decoded if cached not in live]:
+            del self._decoded[stale]
+
+    def _write_manifest(self) -> None:
+        payload = json.dumps(
+            {"schema": 1, "sealed": self._sealed, "active": self._active_meta, "garbage": self._garbage}, indent=1
+        )
+        tmp = self.manifest_path.with_name(f".manifest.{os.getpid()}.tmp")
+        tmp.write_text(payload, encoding="utf-8")
+        os.replace(tmp, self.manifest_path)
+        stat = os.stat(self.manifest_path)
+        self._manifest_key = (stat.st_ino, stat.st_mtime_ns, stat.st_size)
+
+    def _segments(self) -> list[tuple[dict | None, int, int]]:
+        """(sealed entry, or None for the active segment, base, count), oldest first."""
+        segments = [(entry, entry["base"], entry["count"]) for entry in self._sealed]
+        segments.append((None, self._active_meta["base"], self._active.count()))
+        return segments
+
+    # -- sealed segment files --
+
+    def _write_segment(self, base: int, count: int, chunks, codec: str) -> dict:
+        """Stream `chunks` of records into a new compressed segment file."""
+        _, opener = CODECS[codec]
+        path = self.directory / _segment_name(base, codec)
+        tmp = path.with_name(f".{path.name}.{os.getpid()}.tmp")
+        low, high = float("inf"), float("-inf")
+        with opener(tmp, "wb") as f:
+            f.write(_SEGMENT_HEADER.pack(SEGMENT_MAGIC, base, count))
+            for chunk in chunks:
+                if len(chunk):
+                    low = min(low, float(chunk["epoch"].min()))
+                    high = max(high, float(chunk["epoch"].max()))
+                    f.write(chunk.tobytes())
+        os.replace(tmp, path)
+        return {
+            "file": path.name,
+            "base": base,
+            "count": count,
+            "min_epoch": low,
+            "max_epoch": high,
+            "codec": codec,
+            "bytes": path.stat().st_size,
+        }
+
+    def _stream(self, entry: dict, start: int = 0, chunk: int = 65536):
+        """Decode a sealed segment from local position `start`, `chunk` records at a time."""
+        _, opener = CODECS[entry["codec"]]
+        with opener(self.directory / entry["file"], "rb") as f:
+            magic, base, count = _SEGMENT_HEADER.unpack(f.read(_SEGMENT_HEADER.size))
+            if magic != SEGMENT_MAGIC or base != entry["base"] or count != entry["count"]:
+                raise ValueError(f"{entry['file']} does not match the manifest")
+            if start:
+                f.seek(_SEGMENT_HEADER.size + start * RECORD_DTYPE.itemsize)
+            while True:
+                data = f.read(chunk * RECORD_DTYPE.itemsize)
+                if not data:
+                    return
+                yield np.frombuffer(data, dtype=RECORD_DTYPE)
+
+    def _decoded_records(self, entry: dict) -> np.ndarray:
+        """A whole sealed segment, decoded once and kept in a small LRU."""
+        key = (entry["file"], entry["count"])
+        records = self._decoded.get(key)
+        if records is None:
+            records = np.empty(entry["count"], dtype=RECORD_DTYPE)
+            filled = 0
+            for chunk in self._stream(entry):
+                records[filled : filled + len(chunk)] = chunk
+                filled += len(chunk)
+            self._decoded[key] = records
+            while len(self._decoded) > DECODED_SEGMENTS:
+                self._decoded.popitem(last=False)
+        else:
+            self._decoded.move_to_end(key)
+        return records
+
+    # -- sealing, retention, compaction (caller holds both locks) --
+
+    def _window_of_active(self) -> int:
+        if self._active_window is None:
+            self._active_window = int(self._active.read(0, 1)["epoch"][0] // SEGMENT_SECONDS)
+        return self._active_window
+
+    def _seal(self) -> None:
+        old, base = self._active, self._active_meta["base"]
+        records = old.view()
+        chunks = (records[i : i + 65536] for i in range(0, len(records), 65536))
+        self._sealed.append(self._write_segment(base, len(records), chunks, SEGMENT_CODEC))
+        end = base + len(records)
+        del records, chunks  # views of the map, which close() releases
+        self._active_meta = {"file": _segment_name(end), "base": end}
+        self._active = HistoryStore(self.directory / self._active_meta["file"])
+        self._active_window = None
+        self._write_manifest()
+        old.close()
+        self._remove([old.path.name])
+        metrics.incr("history.segments_sealed")
+
+    def _remove(self, names: list[str]) -> None:
+        """Delete retired files; any still open elsewhere (Windows) are retried later."""
+        pending = list(dict.fromkeys(self._garbage + names))
+        failed = []
+        for name in pending:
+            try:
+                (self.directory / name).unlink()
+            except FileNotFoundError:
+                pass
+            except OSError:
+                failed.append(name)
+        if failed != self._garbage:
+            self._garbage = failed
+            self._write_manifest()
+
+    def _drop(self, entries: list[dict]) -> None:
+        self._write_manifest()
+        self._remove([entry["file"] for entry in entries])
+
+    def _maintain(self) -> None:
+        """Retry pending deletions, apply retention, then compact; best effort."""
+        try:
+            self._retire()
+        except OSError:
+            # The rows are safe either way; the next seal tries again.
+            logger.exception("History segment maintenance failed")
+            metrics.incr("history.maintenance_errors")
+
+    def _retire(self) -> None:
+        if self._garbage:
+            self._remove([])
+        dropped = []
+        if RETENTION_DAYS > 0:
+            cutoff = time.time() - RETENTION_DAYS * 86400
+            while self._sealed and self._sealed[0]["max_epoch"] < cutoff:
+                dropped.append(self._sealed.pop(0))
+        if MAX_BYTES > 0:
+            total = sum(entry["bytes"] for entry in self._sealed) + self._active.path.stat().st_size
+            while self._sealed and total > MAX_BYTES:
+                dropped.append(self._sealed.pop(0))
+                total -= dropped[-1]["bytes"]
+        if dropped:
+            self._drop(dropped)
+            metrics.incr("history.segments_dropped", len(dropped))
+        self._compact()
+
+    def _compact(self) -> None:
+        """Merge the sealed segments of each COMPACT_SPAN_DAYS window once it is cold.
+
+        A window is rewritten once, into a single COLD_CODEC segment.
+        """
+        span = COMPACT_SPAN_DAYS * 86400
+        cutoff = time.time() - COMPACT_AFTER_DAYS * 86400
+        runs: list[list[dict]] = []
+        for entry in self._sealed:
+            if runs and runs[-1][0]["min_epoch"] // span == entry["min_epoch"] // span:
+                runs[-1].append(entry)
+            else:
+                runs.append([entry])
+        sealed: list[dict] = []
+        replaced: list[dict] = []
+        for run in runs:
+            window_end = (run[0]["min_epoch"] // span + 1) * span
+            if window_end > cutoff or (len(run) == 1 and run[0]["codec"] == COLD_CODEC):
+                sealed.extend(run)
+                continue
+            chunks = (chunk for entry in run for chunk in self._stream(entry))
+            merged = self._write_segment(run[0]["base"], sum(entry["count"] for entry in run), chunks, COLD_CODEC)
+            sealed.append(merged)
+            # A merged file can take the name of its first input; keep that one.
+            replaced.extend(entry for entry in run if entry["file"] != merged["file"])
+        if len(sealed) != len(self._sealed) or replaced:
+            self._sealed = sealed
+            self._drop(replaced)
+            metrics.incr("history.segments_compacted", len(replaced))
+
+    # -- public API (global positions) --
+
+    def append(self, records: np.ndarray, fsync: bool = False) -> None:
+        """Append records, sealing the active segment at window boundaries."""
+        if not len(records):
+            return
+        records = records.astype(RECORD_DTYPE, copy=False)
+        with self._lock, self._dir_lock():
+            self._refresh()
+            # Cut where the running max window moves on; late rows stay in
+            # the segment that is open.
+            windows = np.maximum.accumulate(records["epoch"] // SEGMENT_SECONDS).astype(np.int64)
+            cuts = np.flatnonzero(np.diff(windows) > 0) + 1
+            for part, window in zip(np.split(records, cuts), windows[np.r_[0, cuts]].tolist()):
+                count = self._active.count()
+                if count and (window > self._window_of_active() or count + len(part) > SEGMENT_MAX_RECORDS):
+                    self._seal()
+                    self._maintain()
+                self._active.append(part, fsync)
+
+    def maintain(self) -> None:
+        """Apply retention and compaction now."""
+        with self._lock, self._dir_lock():
+            self._refresh()
+            self._maintain()
+
+    def count(self) -> int:
+        """Global position one past the newest record."""
+        with self._lock:
+            self._refresh()
+            return self._active_meta["base"] + self._active.count()
+
+    def _read(self, start: int, stop: int | None) -> np.ndarray:
+        parts = []
+        for entry, base, count in self._segments():
+            lo, hi = max(start, base), base + count if stop is None else min(stop, base + count)
+            if lo >= hi:
+                continue
+            if entry is None:
+                parts.append(self._active.read(lo - base, hi - base))
+            else:
+                parts.append(self._decoded_records(entry)[lo - base : hi - base].copy())
+        return np.concatenate(parts) if parts else np.empty(0, dtype=RECORD_DTYPE)
+
+    def read(self, start: int, stop: int | None = None) -> np.ndarray:
+        """Records at global positions [start, stop) that still exist (copied)."""
+        with self._lock:
+            self._refresh()
+            return self._read(start, stop)
+
+    def tail(self, limit: int) -> np.ndarray:
+        """Last `limit` records (copied), oldest first."""
+        with self._lock:
+            self._refresh()
+            end = self._active_meta["base"] + self._active.count()
+            return self._read(max(0, end - limit), end)
+
+    def iter_from(self, start: int, chunk: int = 65536):
+        """Yield (position, records) from global position `start` to the end.
+
+        Sealed segments are streamed through their decoder rather than
+        decoded whole, so long scans run in bounded memory.
+        """
+        position = start
+        while True:
+            with self._lock:
+                self._refresh()
+                segments = self._segments()
+                position = max(position, segments[0][1])  # dropped by retention
+                entry = next((e for e, base, n in segments if e and base <= position < base + n), None)
+                cached = entry is not None and (entry["file"], entry["count"]) in self._decoded
+            if entry is not None and not cached:
+                try:
+                    for records in self._stream(entry, position - entry["base"], chunk):
+                        yield position, records
+                        position += len(records)
+                except FileNotFoundError:
+                    # Compacted or dropped meanwhile; look the position up again.
+                    with self._lock:
+                        self._manifest_key = None
+                        self._refresh()
+                        if entry in self._sealed:
+                            raise
+                continue
+            records = self.read(position, position + chunk)
+            if not len(records):
+                return
+            yield position, records
+            position += len(records)
+
+    def query(
+        self,
+        since: float | None = None,
+        until: float | None = None,
+        priority: str | None = None,
+        limit: int = 100,
+        before: int | None = None,
+    ) -> tuple[np.ndarray, int | None]:
+        """Newest `limit` matching records before global position `before`, across segments.
+
+        Returns the records oldest first and the cursor for the next (older)
+        page, or None once nothing older can match.
+        """
+        code = None if priority is None else PRIORITY_CODES.get(priority, UNKNOWN_PRIORITY)
+        with self._lock:
+            self._refresh()
+            pages: list[tuple[np.ndarray, np.ndarray]] = []
+            total = 0
+            older = False
+            for entry, base, count in reversed(self._segments()):
+                if before is not None and base >= before:
+                    continue
+                if entry is not None and (
+                    (since is not None and entry["max_epoch"] < since)
+                    or (until is not None and entry["min_epoch"] >= until)
+                ):
+                    continue
+                if total >= limit:
+                    older = True
+                    break
+                local_before = None if before is None else before - base
+                want = limit - total
+                if entry is None:
+                    records, positions, older = self._active.select(since, until, priority, want, local_before)
+                else:
+                    segment = self._decoded_records(entry)[:local_before]
+                    mask = np.ones(len(segment), dtype=bool)
+                    if since is not None:
+                        mask &= segment["epoch"] >= since
+                    if until is not None:
+                        mask &= segment["epoch"] < until
+                    if code is not None:
+                        mask &= segment["priority"] == code
+                    matched = np.flatnonzero(mask)
+                    positions = matched[len(matched) - min(want, len(matched)) :]
+                    records = segment[positions]
+                    older = len(matched) > want
+                pages.append((records, positions + base))
+                total += len(positions)
+                if older:
+                    break
+            if not pages:
+                return np.empty(0, dtype=RECORD_DTYPE), None
+            pages.reverse()
+            positions = np.concatenate([page[1] for page in pages])
+            cursor = int(positions[0]) if older and len(positions) else None
+            return np.concatenate([page[0] for page in pages]), cursor
+
+    def migrate(self) -> None:
+        """Adopt a pre-segment `history.bin`, or import the legacy CSV, into an empty store."""
+        with self._lock, self._dir_lock():
+            first = self.directory / _segment_name(0)
+            if self.manifest_path.exists() or first.exists():
+                return
+            if LEGACY_STORE_PATH.exists():
+                # Same file format; it becomes the active segment at base 0.
+                os.replace(LEGACY_STORE_PATH, first)
+                logger.info("Moved %s into %s", LEGACY_STORE_PATH, self.directory)
+            elif CSV_PATH.exists():
+                staging = first.with_name(f".{first.name}.{os.getpid()}.import")
+                staging_store = HistoryStore(staging)
+                try:
+                    imported = import_csv(CSV_PATH, staging_store)
+                finally:
+                    staging_store.close()  # unmapped before the rename (Windows)
+                os.replace(staging, first)
+                logger.info("Imported %d rows from %s into %s", imported, CSV_PATH, self.directory)
+
+
+_store: SegmentedStore | None = None
+_store_lock = threading.Lock()
+
+
+def store() -> SegmentedStore:
+    """The default store; adopts legacy history the first time it is opened."""
+    global _store
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                instance = SegmentedStore(HISTORY_DIR)
+                instance.migrate()
+                _store = instance
+    return _store
+
+
+def import_csv(path: Path, target: "HistoryStore | SegmentedStore | None" = None, batch: int = 10_000) -> int:
+    """Append every parsable row of a history CSV to the store; returns the row count."""
+    target = target or store()
+    imported = 0
+    pending: list[dict] = []
+    with path.open("r", newline="", encoding="utf-8") as f:
+        for row in csv.DictReader(f):
+            try:
+                _epoch(row.get("timestamp") or "")
+            except ValueError:
+                continue  # stray header lines, partial writes
+            pending.append(row)
+            if len(pending) >= batch:
+                target.append(encode(pending))
+                imported += len(pending)
+                pending = []
+    if pending:
+        target.append(encode(pending))
+        imported += len(pending)
+    return imported
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(prog="python -m backend.history_store")
+    sub = parser.add_subparsers(dest="command", required=True)
+    imp = sub.add_parser("import", help="append a history CSV to the store")
+    imp.add_argument("csv", type=Path, nargs="?", default=CSV_PATH)
+    args = parser.parse_args()
+    if args.command == "import":
+        print(f"Imported {import_csv(args.csv)} rows into {HISTORY_DIR}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,106 @@
+"""Shared keep-alive HTTP connection pool for upstream APIs.
+
+The pool lives on its own event loop thread so that both async callers (the
+FastAPI loop) and sync callers (threadpool handlers, scripts) reuse the same
+connections instead of paying a TCP+TLS handshake per request.
+"""
+
+import asyncio
+import concurrent.futures
+import os
+import threading
+from typing import Any, Awaitable, Coroutine, TypeVar
+from urllib.parse import urlsplit
+
+import httpx
+
+try:  # HTTP/2 needs the optional `h2` package (httpx[http2]).
+    import h2  # noqa: F401
+except ImportError:  # pragma: no cover - depends on environment
+    _HAS_H2 = False
+else:
+    _HAS_H2 = True
+
+POOL_SIZE = int(os.getenv("MEMPOOL_POOL_SIZE", "20"))
+POOL_PER_HOST = int(os.getenv("MEMPOOL_POOL_PER_HOST", "6"))
+KEEPALIVE_EXPIRY = float(os.getenv("MEMPOOL_KEEPALIVE_SECONDS", "60"))
+HTTP2_ENABLED = os.getenv("MEMPOOL_HTTP2", "1") == "1" and _HAS_H2
+
+T = TypeVar("T")
+
+_loop: asyncio.AbstractEventLoop | None = None
+_loop_lock = threading.Lock()
+_client: httpx.AsyncClient | None = None
+_host_slots: dict[str, asyncio.Semaphore] = {}
+
+
+def _pool_loop() -> asyncio.AbstractEventLoop:
+    """Return the pool's event loop, starting its thread on first use."""
+    global _loop
+    with _loop_lock:
+        if _loop is None or _loop.is_closed():
+            loop = asyncio.new_event_loop()
+            threading.Thread(target=loop.run_forever, name="http-pool", daemon=True).start()
+            _loop = loop
+        return _loop
+
+
+def _get_client() -> httpx.AsyncClient:
+    # Only called on the pool loop, so no locking is needed.
+    global _client
+    if _client is None or _client.is_closed:
+        _client = httpx.AsyncClient(
+            http2=HTTP2_ENABLED,
+            limits=httpx.Limits(
+                max_connections=POOL_SIZE,
+                max_keepalive_connections=POOL_SIZE,
+                keepalive_expiry=KEEPALIVE_EXPIRY,
+            ),
+        )
+    return _client
+
+
+async def _get_on_pool(url: str, timeout: float, headers: dict | None) -> httpx.Response:
+    host = urlsplit(url).netloc
+    slots = _host_slots.get(host)
+    if slots is None:
+        slots = _host_slots[host] = asyncio.Semaphore(POOL_PER_HOST)
+    async with slots:
+        return await _get_client().get(url, timeout=timeout, headers=headers)
+
+
+def _submit(coro: Coroutine[Any, Any, T]) -> "asyncio.Future[T]":
+    loop = _pool_loop()
+    return asyncio.wrap_future(asyncio.run_coroutine_threadsafe(coro, loop))
+
+
+async def get(url: str, timeout: float, headers: dict | None = None) -> httpx.Response:
+    """GET `url` through the shared pool; safe to await from any event loop."""
+    return await _submit(_get_on_pool(url, timeout, headers))
+
+
+def spawn(coro: Coroutine[Any, Any, T]) -> "concurrent.futures.Future[T]":
+    """Schedule a coroutine on the pool loop; safe to call from any thread."""
+    return asyncio.run_coroutine_threadsafe(coro, _pool_loop())
+
+
+def run_sync(coro: Awaitable[T]) -> T:
+    """Run a coroutine on the pool loop and block until it finishes.
+
+    Must not be called from a running event loop.
+    """
+    return spawn(coro).result()
+
+
+async def aclose() -> None:
+    """Close pooled connections; the pool reopens lazily on next use."""
+
+    async def _close() -> None:
+        global _client
+        if _client is not None:
+            await _client.aclose()
+            _client = None
+
+    if _loop is None or _loop.is_closed():
+        return
+    await _submit(_close())
@@ -1,24 +1,39 @@
 import asyncio
+import hashlib
 import json
+import time
 from datetime import datetime, timezone
-from pathlib import Path
-from typing import Annotated
+from typing import Annotated, Literal
 from collections import Counter
 
-from fastapi import FastAPI, Query
+from fastapi import FastAPI, Query, Request, Response, WebSocket, WebSocketDisconnect
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import StreamingResponse
 
-from .agent import estimate_fee, recommend_fee
-from .data_fetcher import get_fee_recommendations, get_mempool_stats, get_mining_targets
-from .history import append_history, read_recent
+import numpy as np
+
+from . import cache_store, history_rollup, metrics, precompute, projection, refresh, scheduler, shared_state, stream_ingest, tape
+from .agent import ESTIMATE_CLASSES, estimate_batch
+from .broadcast import HEARTBEAT_SECONDS, broadcaster
+from .data_fetcher import REFRESH_DEADLINE, fetch_mining_targets
+from .history import append_history_async, read_recent, seed_recent
+from .history import close as close_history, query as query_history
+from .http_client import aclose as close_http_pool
 from .llm import generate_llm_explanation
 from .models import (
     CompareResponse,
+    EstimateBatchRequest,
+    EstimateBatchResponse,
     FeeRecommendation,
     HealthStatus,
     LiveStatus,
     MiningTargetResponse,
 )
+from .refresh import drain as drain_publish_listeners, refresh_once_async, restore_snapshot
+
+HISTORY_INSIGHT_WINDOW_SECONDS = 3600
+# Upstream projected blocks listed by /mining-target (more if the target is deeper).
+MINING_TARGET_LISTED_BLOCKS = 6
 
 app = FastAPI()
 
@@ -30,170 +45,140 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-CACHE_PATH = Path(__file__).resolve().parent.parent / "data" / "cache.json"
-LATEST_STATE = {
-    "updated_at_epoch": None,
-    "timestamp": None,
-    "fee_data": None,
-    "mempool_data": None,
-    "cache_used": False,
-    "error": None,
-    "source": "mempool.space",
-    "network_state": None,
-    "network_note": None,
-}
-
 
-async def _refresh_live_state():
-    while True:
-        await asyncio.to_thread(refresh_once)
-        await asyncio.sleep(10)
+@app.middleware("http")
+async def _record_first_response(request: Request, call_next):
+    response = await call_next(request)
+    if response.status_code < 500:
+        metrics.set_gauge_once("startup.boot_to_first_response_seconds", metrics.since_start())
+    return response
 
 
 @app.on_event("startup")
 async def startup_event():
-    asyncio.create_task(_refresh_live_state())
-
-
-def _load_cache_file() -> dict:
-    if not CACHE_PATH.exists():
-        return {}
-    try:
-        with CACHE_PATH.open("r", encoding="utf-8") as f:
-            return json.load(f)
-    except Exception:
-        return {}
-
-
-def _save_cache_file(fee_data: dict, mempool: dict) -> None:
-    payload = {"fees": fee_data, "mempool": mempool}
-    CACHE_PATH.parent.mkdir(parents=True, exist_ok=True)
-    with CACHE_PATH.open("w", encoding="utf-8") as f:
-        json.dump(payload, f, indent=2)
-
+    broadcaster.attach(asyncio.get_running_loop())
+    restore_snapshot()
+    await asyncio.to_thread(seed_recent)
+    asyncio.create_task(history_rollup.run())
+    if shared_state.enabled():
+        # Only the elected worker talks to upstream; the rest follow its snapshots.
+        asyncio.create_task(shared_state.run(_start_fetchers))
+    else:
+        _start_fetchers()
 
-def classify_network_state(fee_data: dict, mempool: dict) -> tuple[str, str]:
-    mempool_tx = int((mempool or {}).get("count", 0) or 0)
-    fastest = fee_data.get("fastestFee") or fee_data.get("halfHourFee") or 0
-    economy = fee_data.get("economyFee") or fee_data.get("minimumFee") or 0
-    fee_spread = max(0, fastest - economy)
 
-    if mempool_tx < 120_000 and fee_spread <= 2:
-        return "calm", "Network is calm; fee differences may have limited impact on speed."
-    if mempool_tx < 250_000 and fee_spread <= 8:
-        return "moderate", "Network is moderately congested; higher fees might gain speed."
-    return "congested", "Network is congested; low fees may cause significant delays."
+def _start_fetchers() -> None:
+    asyncio.create_task(scheduler.run())
+    if stream_ingest.enabled():
+        asyncio.create_task(stream_ingest.run())
 
 
-def _apply_agent_messages(rec: FeeRecommendation, network_state: str | None, fee_data: dict) -> FeeRecommendation:
-    state_text = network_state or "unknown"
-    summary = (
-        f"Network state: {state_text}. ETA {rec.eta_blocks_min}-{rec.eta_blocks_max} blocks "
-        f"(~{rec.eta_minutes_min}-{rec.eta_minutes_max} min). Risk: {rec.risk_level}."
-    )
-    what_if = None
-    economy_fee = fee_data.get("economyFee") or fee_data.get("minimumFee")
-    if rec.mode == "recommend":
-        if network_state == "calm" and rec.priority == "fast":
-            what_if = "Network is calm; medium fee might offer similar speed with cost savings."
-        if network_state == "congested" and rec.priority == "slow":
-            what_if = "Network is congested; choosing slow may cause severe delays, consider medium or fast."
-    else:  # estimate
-        if economy_fee and rec.input_fee_sat_vb and rec.input_fee_sat_vb < economy_fee:
-            what_if = f"Fee is below economy level ({economy_fee} sat/vB); trying that or medium threshold will shorten confirmation time."
-
-    rec.agent_summary = summary
-    rec.what_if_hint = what_if
-    return rec
-
-
-def _build_compare_verdict(network_state: str | None, delta_sat: int, overpay_pct: float) -> tuple[str, str]:
-    if network_state == "calm":
-        return (
-            "Network Calm",
-            f"Fee difference is small (+{delta_sat} sat/vB, {overpay_pct}%) and speed gain might be limited.",
-        )
-    if network_state == "congested":
-        return (
-            "Network Congested",
-            f"Fast fee (+{delta_sat} sat/vB, {overpay_pct}%) can reduce delay risk; slow choice may cause severe delays.",
-        )
-    return (
-        "Network Moderate",
-        f"Difference between Fast and Medium is +{delta_sat} sat/vB ({overpay_pct}%); higher fee might reduce wait time in moderate congestion.",
-    )
+@app.on_event("shutdown")
+async def shutdown_event():
+    await close_http_pool()
+    cache_store.flush()
+    await asyncio.to_thread(close_history)
+    await asyncio.to_thread(drain_publish_listeners)
+    await asyncio.to_thread(tape.close)
 
 
-def _history_insight(items: list[dict], network_state: str | None) -> str:
-    if not items:
+def _history_insight(network_state: str | None) -> str:
+    recent = history_rollup.summary(HISTORY_INSIGHT_WINDOW_SECONDS)
+    if not recent:
         return "No records yet."
-    counts = Counter(i.get("priority", "unknown") for i in items)
+    counts = Counter({priority: stats["count"] for priority, stats in recent.items()})
     top = counts.most_common(1)[0][0]
     total = sum(counts.values())
     state = network_state or "unknown"
+    trend = _fee_trend(top, recent[top]["mean"])
     if total >= 5:
         share_top = counts[top] / total
         if state == "calm" and top in ("slow", "medium") and share_top > 0.5:
-            return "Recent records show a trend towards low/medium fees; logical since network is calm."
+            return "Recent records show a trend towards low/medium fees; logical since network is calm." + trend
         if state == "calm" and top == "fast" and share_top > 0.5:
-            return "Recent records show a trend towards fast fees; potential overpayment since network is calm."
+            return "Recent records show a trend towards fast fees; potential overpayment since network is calm." + trend
         if state == "congested" and top == "slow" and share_top > 0.4:
-            return "Recent records show a trend towards slow fees in a congested network; confirmation times may increase."
-    return f"Records are mixed; network state: {state}."
+            return "Recent records show a trend towards slow fees in a congested network; confirmation times may increase." + trend
+    return f"Records are mixed; network state: {state}." + trend
 
 
-def refresh_once():
-    try:
-        fee_data, fee_cache_used = get_fee_recommendations()
-        mempool, mempool_cache_used = get_mempool_stats()
-        cache_used = fee_cache_used or mempool_cache_used
-        _save_cache_file(fee_data, mempool)
-    except Exception as exc:
-        cached = _load_cache_file()
-        fee_data = cached.get("fees") or {}
-        mempool = cached.get("mempool") or {}
-        cache_used = True
-        LATEST_STATE["error"] = str(exc)
-    else:
-        LATEST_STATE["error"] = None
-
-    net_state, net_note = classify_network_state(fee_data, mempool)
-
-    now = datetime.now(timezone.utc)
-    LATEST_STATE.update(
-        {
-            "updated_at_epoch": now.timestamp(),
-            "timestamp": now.isoformat(),
-            "fee_data": fee_data,
-            "mempool_data": mempool,
-            "cache_used": cache_used,
-            "source": "mempool.space",
-            "network_state": net_state,
-            "network_note": net_note,
-        }
-    )
+def _fee_trend(priority: str, recent_mean: float) -> str:
+    day = history_rollup.summary(86400, "hour").get(priority)
+    if not day or not day["mean"]:
+        return ""
+    change = recent_mean / day["mean"] - 1
+    if abs(change) < 0.1:
+        return ""
+    direction = "above" if change > 0 else "below"
+    return f" {priority.capitalize()} fees are {abs(change) * 100:.0f}% {direction} their 24h average."
+
 
+async def _get_live_data():
+    state = refresh.LATEST_STATE
+    if state["fee_data"] is None or state["mempool_data"] is None:
+        if shared_state.role() == "follower" and await shared_state.wait_for_data(REFRESH_DEADLINE):
+            return _live_tuple()
+        await refresh_once_async()
+    return _live_tuple()
 
-def _get_live_data():
-    if LATEST_STATE["fee_data"] is None or LATEST_STATE["mempool_data"] is None:
-        refresh_once()
+
+def _live_tuple():
+    state = refresh.LATEST_STATE
     return (
-        LATEST_STATE["fee_data"],
-        LATEST_STATE["mempool_data"],
-        LATEST_STATE["cache_used"],
-        LATEST_STATE.get("network_state"),
-        LATEST_STATE.get("network_note"),
+        state["fee_data"],
+        state["mempool_data"],
+        state["cache_used"],
+        state.get("network_state"),
+        state.get("network_note"),
     )
 
 
 @app.get("/health", response_model=HealthStatus)
-def health() -> HealthStatus:
+async def health() -> HealthStatus:
     """Simple health probe endpoint."""
     return HealthStatus()
 
 
+def _json(body: bytes, headers: dict | None = None) -> Response:
+    return Response(content=body, media_type="application/json", headers=headers)
+
+
+def _etag(request: Request, state: dict, *extra) -> str:
+    """Strong ETag for this URL (path + query) and snapshot `state`."""
+    key = "|".join([request.url.path, request.url.query, refresh.identity(state), *map(str, extra)])
+    return f'"v{state["version"]}-{hashlib.blake2b(key.encode(), digest_size=8).hexdigest()}"'
+
+
+def _fresh_until(now: float) -> float:
+    """When the snapshot may next change: the leader's next poll if known."""
+    state = refresh.LATEST_STATE
+    fresh_until = state["fresh_until_epoch"]
+    if fresh_until and fresh_until > now:
+        return fresh_until
+    # Unknown (live feed, no scheduler yet) or passed (followers only see it
+    # with a new version): assume polls keep the configured interval.
+    anchor = fresh_until or state["checked_at_epoch"] or now
+    interval = max(1.0, scheduler.BASE_INTERVAL)
+    return anchor + interval * (int((now - anchor) // interval) + 1)
+
+
+def _cache_headers(etag: str) -> dict:
+    now = time.time()
+    max_age = max(0, int(_fresh_until(now) - now))
+    return {"ETag": etag, "Cache-Control": f"public, max-age={max_age}"}
+
+
+def _not_modified(request: Request, etag: str) -> Response | None:
+    tags = [tag.strip().removeprefix("W/") for tag in request.headers.get("if-none-match", "").split(",")]
+    if etag in tags or "*" in tags:
+        metrics.incr("http.not_modified")
+        return Response(status_code=304, headers=_cache_headers(etag))
+    return None
+
+
 @app.get("/recommend", response_model=FeeRecommendation)
-def recommend(
+async def recommend(
+    request: Request,
     priority: Annotated[
         str,
         Query(
@@ -204,133 +189,260 @@ def recommend(
     explain: Annotated[str | None, Query(enum=["none", "llm"], description="Explanation mode")] = "none",
 ) -> FeeRecommendation:
     """Suggest a transaction fee based on mempool stats and desired priority."""
-    fee_data, mempool, cache_used, network_state, _ = _get_live_data()
-    rec = recommend_fee(priority, fee_data, mempool, cache_used=cache_used)
-    rec = _apply_agent_messages(rec, network_state, fee_data)
+    await _get_live_data()
+    state = refresh.LATEST_STATE
+    snapshot = precompute.current(state)
+    await append_history_async([snapshot.history_rows[priority]])
     if explain == "llm":
-        rec.llm_explanation = generate_llm_explanation(rec.model_dump())
-    append_history(
-        [
-            {
-                "priority": rec.priority,
-                "base_fee_sat_vb": rec.base_fee_sat_vb,
-                "mempool_tx_count": rec.mempool_tx_count,
-                "recommended_fee_sat_vb": rec.recommended_fee_sat_vb,
-            }
-        ]
-    )
-    return rec
+        rec = snapshot.recommendations[priority].model_copy()
+        rec.llm_explanation = await asyncio.to_thread(generate_llm_explanation, rec.model_dump())
+        return rec
+    etag = _etag(request, state)
+    return _not_modified(request, etag) or _json(snapshot.recommend_json[priority], _cache_headers(etag))
 
 
 @app.get("/compare", response_model=CompareResponse)
-def compare(
+async def compare(
+    request: Request,
     explain: Annotated[str | None, Query(enum=["none", "llm"], description="Explanation mode")] = "none",
 ) -> CompareResponse:
     """Return recommendations for presets in one response."""
-    fee_data, mempool, cache_used, network_state, _ = _get_live_data()
-    fast_rec = recommend_fee("fast", fee_data, mempool, cache_used=cache_used)
-    medium_rec = recommend_fee("medium", fee_data, mempool, cache_used=cache_used)
-    slow_rec = recommend_fee("slow", fee_data, mempool, cache_used=cache_used)
-    fast_rec = _apply_agent_messages(fast_rec, network_state, fee_data)
-    medium_rec = _apply_agent_messages(medium_rec, network_state, fee_data)
-    slow_rec = _apply_agent_messages(slow_rec, network_state, fee_data)
+    await _get_live_data()
+    state = refresh.LATEST_STATE
+    snapshot = precompute.current(state)
+    await append_history_async([snapshot.history_rows[priority] for priority in precompute.PRIORITIES])
     if explain == "llm":
-        fast_rec.llm_explanation = generate_llm_explanation(fast_rec.model_dump())
-        medium_rec.llm_explanation = generate_llm_explanation(medium_rec.model_dump())
-        slow_rec.llm_explanation = generate_llm_explanation(slow_rec.model_dump())
-    append_history(
-        [
-            {
-                "priority": fast_rec.priority,
-                "base_fee_sat_vb": fast_rec.base_fee_sat_vb,
-                "mempool_tx_count": fast_rec.mempool_tx_count,
-                "recommended_fee_sat_vb": fast_rec.recommended_fee_sat_vb,
-            },
-            {
-                "priority": medium_rec.priority,
-                "base_fee_sat_vb": medium_rec.base_fee_sat_vb,
-                "mempool_tx_count": medium_rec.mempool_tx_count,
-                "recommended_fee_sat_vb": medium_rec.recommended_fee_sat_vb,
-            },
-            {
-                "priority": slow_rec.priority,
-                "base_fee_sat_vb": slow_rec.base_fee_sat_vb,
-                "mempool_tx_count": slow_rec.mempool_tx_count,
-                "recommended_fee_sat_vb": slow_rec.recommended_fee_sat_vb,
-            },
-        ]
-    )
-    overpay_percent = 0.0
-    overpay_delta = 0.0
-    note = ""
-    if medium_rec.recommended_fee_sat_vb:
-        overpay_delta = max(0.0, fast_rec.recommended_fee_sat_vb - medium_rec.recommended_fee_sat_vb)
-        overpay_percent = round((overpay_delta / medium_rec.recommended_fee_sat_vb) * 100, 2)
-        overpay_delta = round(overpay_delta, 4)
-    fee_spread = fast_rec.recommended_fee_sat_vb - slow_rec.recommended_fee_sat_vb
-    if fee_spread <= 2:
-        note = "Fee differences may have limited impact right now."
-    else:
-        note = "Fast pays more, slow delays more."
-    verdict_title, verdict_text = _build_compare_verdict(network_state, overpay_delta, overpay_percent)
-    return CompareResponse(
-        fast=fast_rec,
-        medium=medium_rec,
-        slow=slow_rec,
-        overpay_percent_fast_vs_medium=overpay_percent,
-        overpay_delta_fast_vs_medium_sat_vb=overpay_delta,
-        note=note,
-        verdict_title=verdict_title,
-        verdict_text=verdict_text,
-    )
+        result = snapshot.compare.model_copy(deep=True)
+        recs = (result.fast, result.medium, result.slow)
+        texts = await asyncio.gather(
+            *(asyncio.to_thread(generate_llm_explanation, rec.model_dump()) for rec in recs)
+        )
+        for rec, text in zip(recs, texts):
+            rec.llm_explanation = text
+        return result
+    etag = _etag(request, state)
+    return _not_modified(request, etag) or _json(snapshot.compare_json, _cache_headers(etag))
 
 
 @app.get("/estimate", response_model=FeeRecommendation)
-def estimate(
+async def estimate(
     fee: Annotated[float, Query(gt=0, description="Custom fee in sat/vB (decimals allowed)")],
     explain: Annotated[str | None, Query(enum=["none", "llm"], description="Explanation mode")] = "none",
 ) -> FeeRecommendation:
     """Estimate confirmation time for a custom fee."""
-    fee_data, mempool, cache_used, network_state, _ = _get_live_data()
-    rec = estimate_fee(fee, fee_data, mempool, cache_used=cache_used)
-    rec = _apply_agent_messages(rec, network_state, fee_data)
+    await _get_live_data()
+    rec, body = precompute.estimate(fee)
+    await append_history_async([precompute.history_row(rec, priority="estimate")])
     if explain == "llm":
-        rec.llm_explanation = generate_llm_explanation(rec.model_dump())
-    append_history(
-        [
-            {
-                "priority": "estimate",
-                "base_fee_sat_vb": rec.base_fee_sat_vb,
-                "mempool_tx_count": rec.mempool_tx_count,
-                "recommended_fee_sat_vb": rec.recommended_fee_sat_vb,
-            }
-        ]
+        rec = rec.model_copy()
+        rec.llm_explanation = await asyncio.to_thread(generate_llm_explanation, rec.model_dump())
+        return rec
+    return _json(body)
+
+
+def _estimate_batch_body(fees: list[float]) -> bytes:
+    state = refresh.LATEST_STATE
+    result = estimate_batch(
+        fees, state["fee_data"] or {}, state["mempool_data"] or {}, cache_used=state["cache_used"]
     )
-    return rec
+    blocks = projection.current(state).positions(result["fee_sat_vb"])
+    etas = np.asarray(projection.ETA_TABLE)[np.maximum(blocks, 1) - 1]
+    for key, value in result.items():
+        if hasattr(value, "tolist"):
+            result[key] = value.tolist()
+    beyond = (blocks == 0).tolist()
+    result["projected_block"] = [None if out else b for b, out in zip(blocks.tolist(), beyond)]
+    result["eta_minutes_p10"] = [None if out else m for m, out in zip(etas[:, 0].tolist(), beyond)]
+    result["eta_minutes_p50"] = [None if out else m for m, out in zip(etas[:, 1].tolist(), beyond)]
+    result["eta_minutes_p90"] = [None if out else m for m, out in zip(etas[:, 2].tolist(), beyond)]
+    result["count"] = len(fees)
+    result["classes"] = [
+        {"priority": c["priority"], "rule": c["rule"], "risk_level": c["risk"]} for c in ESTIMATE_CLASSES
+    ]
+    result["version"] = state["version"]
+    metrics.incr("estimate_batch.fees", len(fees))
+    return json.dumps(result, separators=(",", ":")).encode("utf-8")
+
+
+@app.post("/estimate/batch", response_model=EstimateBatchResponse)
+async def estimate_batch_endpoint(body: EstimateBatchRequest):
+    """Classify many candidate fees at once (not written to history)."""
+    await _get_live_data()
+    return _json(await asyncio.to_thread(_estimate_batch_body, body.fees))
+
+
+def _epoch(moment: datetime | None) -> float | None:
+    if moment is None:
+        return None
+    if moment.tzinfo is None:
+        moment = moment.replace(tzinfo=timezone.utc)
+    return moment.timestamp()
 
 
 @app.get("/history")
-def history():
-    """Return last 10 recommendation records."""
-    items = read_recent(10)
-    insight = _history_insight(items, LATEST_STATE.get("network_state"))
-    return {"items": items, "insight": insight}
+async def history(
+    since: datetime | None = None,
+    until: datetime | None = None,
+    priority: str | None = None,
+    limit: Annotated[int, Query(ge=1, le=5000)] = 10,
+    cursor: Annotated[int | None, Query(ge=0)] = None,
+):
+    """Return the latest recommendation records, or a filtered page from the history store.
+
+    Without filters the newest `limit` rows come from the in-memory ring
+    (caught up with rows committed by any worker). With `since`,
+    `until`, `priority` or `cursor` the store's index answers, newest page
+    first; pass `next_cursor` back as `cursor` for the previous page.
+    """
+    if since is None and until is None and priority is None and cursor is None:
+        items = await asyncio.to_thread(read_recent, limit)
+        next_cursor = None
+    else:
+        items, next_cursor = await asyncio.to_thread(
+            query_history,
+            _epoch(since),
+            _epoch(until),
+            priority,
+            limit,
+            cursor,
+        )
+    insight = await asyncio.to_thread(_history_insight, refresh.LATEST_STATE.get("network_state"))
+    return {"items": items, "insight": insight, "next_cursor": next_cursor}
+
+
+@app.get("/history/rollup")
+async def history_rollups(
+    resolution: Literal["minute", "hour", "day"] = "hour",
+    priority: str | None = None,
+    since: datetime | None = None,
+    until: datetime | None = None,
+    limit: Annotated[int, Query(ge=1, le=10000)] = 500,
+):
+    """Per-priority fee buckets (count/min/max/mean/last, mean mempool count), oldest first."""
+    items = await asyncio.to_thread(history_rollup.buckets, resolution, priority, _epoch(since), _epoch(until), limit)
+    return {"resolution": resolution, "items": items}
+
+
+@app.get("/metrics")
+async def get_metrics():
+    """Return process counters and gauges (startup timings etc.)."""
+    return metrics.snapshot()
 
 
 @app.get("/live/status", response_model=LiveStatus)
-def live_status() -> LiveStatus:
+async def live_status(request: Request):
     """Return latest periodically fetched mempool and fee data."""
-    return LiveStatus(**LATEST_STATE)
+    status = scheduler.status()
+    # checked_at / scheduler fields move on every refresh, even without a new version.
+    state = refresh.LATEST_STATE
+    etag = _etag(request, state, state["checked_at_epoch"], status["last_refresh_epoch"])
+    cached = _not_modified(request, etag)
+    if cached is not None:
+        return cached
+    body = LiveStatus(**state, **status).model_dump_json().encode("utf-8")
+    return _json(body, _cache_headers(etag))
+
+
+@app.get("/live/stream")
+async def live_stream(request: Request):
+    """Server-Sent Events: a `snapshot` event (LiveStatus + compare) per new version."""
+    queue = broadcaster.subscribe()
+    last_event_id = request.headers.get("last-event-id")
+
+    async def events():
+        sent = int(last_event_id) if last_event_id and last_event_id.isdigit() else 0
+        try:
+            current = broadcaster.latest()
+            if current is not None and current.version != sent:
+                sent = current.version
+                yield current.sse
+            while True:
+                try:
+                    payload = await asyncio.wait_for(queue.get(), HEARTBEAT_SECONDS)
+                except asyncio.TimeoutError:
+                    yield b": ping\n\n"
+                    continue
+                if payload.version > sent:
+                    sent = payload.version
+                    yield payload.sse
+        finally:
+            broadcaster.unsubscribe(queue)
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+@app.websocket("/live/ws")
+async def live_ws(ws: WebSocket):
+    """WebSocket alternative to /live/stream; sends the same JSON payloads."""
+    await ws.accept()
+    queue = broadcaster.subscribe()
+
+    async def drain() -> None:
+        # Incoming messages are ignored; this only notices the disconnect.
+        while True:
+            await ws.receive_text()
+
+    closed = asyncio.create_task(drain())
+    sent = 0
+    try:
+        current = broadcaster.latest()
+        if current is not None:
+            sent = current.version
+            await ws.send_text(current.json)
+        while True:
+            getter = asyncio.create_task(queue.get())
+            done, _ = await asyncio.wait({getter, closed}, return_when=asyncio.FIRST_COMPLETED)
+            if closed in done:
+                getter.cancel()
+                break
+            payload = getter.result()
+            if payload.version > sent:
+                sent = payload.version
+                await ws.send_text(payload.json)
+    except WebSocketDisconnect:
+        pass
+    finally:
+        closed.cancel()
+        broadcaster.unsubscribe(queue)
 
 
 @app.get("/mining-target", response_model=MiningTargetResponse)
-def mining_target(
+async def mining_target(
+    request: Request,
+    response: Response,
     fee: Annotated[float | None, Query(gt=0, description="Optional fee to test in sat/vB")] = None,
-    target_blocks: Annotated[int | None, Query(ge=1, le=6, description="Desired confirmation within N blocks")] = None,
+    target_blocks: Annotated[
+        int | None, Query(ge=1, le=projection.MAX_BLOCKS, description="Desired confirmation within N blocks")
+    ] = None,
 ):
-    """Return projected mempool blocks (top 3)."""
+    """Return projected mempool blocks and evaluate a fee / target against the deep projection.
+
+    `blocks` lists the first MINING_TARGET_LISTED_BLOCKS upstream blocks, or
+    up to `target_blocks` when upstream projects that many (it usually sends
+    about 8). Deeper targets are answered by the projection alone, so
+    `target_median_fee` is only set for a listed block.
+    """
+    state = refresh.LATEST_STATE
     try:
-        data, cache_used = get_mining_targets()
+        if state["mempool_blocks"] is not None:
+            data = state["mempool_blocks"]
+            cache_used = "mempool_blocks" in state["stale_parts"]
+            proj = projection.current(state)
+            # Stamp with the snapshot time so the body only changes with the version.
+            timestamp = state["timestamp"]
+            etag = _etag(request, state)
+            cached = _not_modified(request, etag)
+            if cached is not None:
+                return cached
+            response.headers.update(_cache_headers(etag))
+        else:
+            data, cache_used = await fetch_mining_targets()
+            proj = projection.build(data, state["mempool_data"])
+            timestamp = None
     except Exception as exc:  # pragma: no cover - defensive
         now = datetime.now(timezone.utc).isoformat()
         return {
@@ -341,8 +453,9 @@ def mining_target(
             "error": str(exc),
         }
 
+    target_idx = target_blocks or 1
     blocks = []
-    for idx, blk in enumerate((data or [])[:6], start=1):
+    for idx, blk in enumerate((data or [])[: max(MINING_TARGET_LISTED_BLOCKS, target_idx)], start=1):
         fee_range = blk.get("feeRange") or []
         min_fee = blk.get("minFee")
         if min_fee is None and fee_range:
@@ -357,49 +470,55 @@ def mining_target(
             }
         )
 
+    # Neither projected blocks nor a fee histogram: nothing to place a fee in.
+    unavailable = not proj.fees_asc
     user_eval = None
     if fee is not None:
-        fits_idx = None
-        for b in blocks:
-            min_req = b.get("minFee") or 0
-            if fee >= min_req:
-                fits_idx = b["block_index"]
-                break
+        fits_idx = proj.position(fee)
         meets = fits_idx is not None
-        if meets:
-            note = f"Your {fee} sat/vB fee looks sufficient to enter block {fits_idx}."
+        eta = projection.eta_minutes(fits_idx)
+        if unavailable:
+            note = f"Projection unavailable: no projected blocks yet to place your {fee} sat/vB fee."
+        elif meets:
+            note = (
+                f"Your {fee} sat/vB fee is projected to enter block {fits_idx} "
+                f"(~{eta[1]:.0f} min median, ~{eta[2]:.0f} min at 90%)."
+            )
         else:
-            note = f"Your {fee} sat/vB fee is below the minimum for the first {len(blocks)} blocks."
+            note = f"Your {fee} sat/vB fee is below the projected minimum for the next {projection.MAX_BLOCKS} blocks."
         user_eval = {
             "provided_fee_sat_vb": fee,
             "fits_in_block_index": fits_idx,
             "meets_min_fee": meets,
             "note": note,
         }
+        if eta is not None:
+            user_eval.update(zip(("eta_minutes_p10", "eta_minutes_p50", "eta_minutes_p90"), eta))
 
     # Target block summary (savings/delay)
-    target_idx = target_blocks or 1
-    target_idx = max(1, min(target_idx, len(blocks) if blocks else 1))
-    target_block = blocks[target_idx - 1] if blocks else {}
+    target_block = blocks[target_idx - 1] if target_idx <= len(blocks) else {}
     fastest_min = blocks[0].get("minFee") if blocks else None
-    target_min = target_block.get("minFee")
+    target_min = proj.min_fee_for(target_idx)
+    if target_min is None:
+        target_min = target_block.get("minFee")
     target_med = target_block.get("medianFee")
     savings = None
     if fastest_min is not None and target_min is not None:
         savings = round(max(0, fastest_min - target_min), 4)
-    extra_delay_minutes = (target_idx - 1) * 10.0
+    extra_delay_minutes = (target_idx - 1) * projection.BLOCK_MINUTES
     target_note = None
-    if target_min is not None:
+    if unavailable:
+        target_note = f"Projection unavailable: cannot estimate the fee to confirm within {target_idx} blocks."
+    elif target_min is not None:
         target_note = (
             f"Target confirm within {target_idx} blocks: min ~{target_min:.4f} sat/vB, "
             f"savings vs fast ~{savings or 0} sat/vB, extra delay ~{extra_delay_minutes:.1f} min."
         )
 
-    now = datetime.now(timezone.utc).isoformat()
     return {
-        "timestamp": now,
+        "timestamp": timestamp or datetime.now(timezone.utc).isoformat(),
         "cache_used": cache_used,
-        "source": "mempool.space",
+        "source": state["source"],
         "blocks": blocks,
         "error": None,
         "user_fee_eval": user_eval,
@@ -409,4 +528,5 @@ def mining_target(
         "savings_vs_fast_sat_vb": savings,
         "extra_delay_minutes": extra_delay_minutes,
         "target_note": target_note,
+        "projection_blocks": proj.blocks,
     }
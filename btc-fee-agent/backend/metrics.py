@@ -0,0 +1,39 @@
+"""Process-local counters and gauges exposed on `/metrics`."""
+
+import threading
+import time
+
+PROCESS_START = time.monotonic()
+
+_lock = threading.Lock()
+_counters: dict[str, float] = {}
+_gauges: dict[str, float] = {}
+
+
+def incr(name: str, amount: float = 1) -> None:
+    with _lock:
+        _counters[name] = _counters.get(name, 0) + amount
+
+
+def set_gauge(name: str, value: float) -> None:
+    with _lock:
+        _gauges[name] = value
+
+
+def set_gauge_once(name: str, value: float) -> bool:
+    """Set a gauge only if it has no value yet; return True if it was set."""
+    with _lock:
+        if name in _gauges:
+            return False
+        _gauges[name] = value
+        return True
+
+
+def since_start() -> float:
+    """Seconds since this process imported the metrics module."""
+    return time.monotonic() - PROCESS_START
+
+
+def snapshot() -> dict:
+    with _lock:
+        return {"counters": dict(_counters), "gauges": dict(_gauges)}
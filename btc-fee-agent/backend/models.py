@@ -1,3 +1,5 @@
+from typing import Annotated
+
 from pydantic import BaseModel, Field
 
 
@@ -40,6 +42,12 @@ class FeeRecommendation(BaseModel):
         False, description="True when data comes from local cache fallback"
     )
     source: str = Field("mempool.space", description="Upstream data source")
+    projected_block: int | None = Field(
+        None, description="Projected mempool block for the fee (estimate mode; None beyond the projection)"
+    )
+    eta_minutes_p10: float | None = Field(None, description="10th percentile ETA for the projected block")
+    eta_minutes_p50: float | None = Field(None, description="Median ETA for the projected block")
+    eta_minutes_p90: float | None = Field(None, description="90th percentile ETA for the projected block")
     llm_explanation: str | None = Field(
         None, description="Optional LLM-generated explanation (Turkish)"
     )
@@ -65,15 +73,32 @@ class CompareResponse(BaseModel):
 class LiveStatus(BaseModel):
     """Latest observed mempool data snapshot."""
 
-    updated_at_epoch: float | None = Field(None, description="Unix epoch seconds")
+    version: int = Field(0, description="Snapshot version; increments only when the data changes")
+    checked_at_epoch: float | None = Field(None, description="Unix epoch seconds of the last upstream poll")
+    updated_at_epoch: float | None = Field(None, description="Unix epoch seconds of the last data change")
     timestamp: str | None = Field(None, description="ISO timestamp of last refresh")
     cache_used: bool = Field(False, description="True when latest data is from cache")
     fee_data: dict | None = Field(None, description="Raw fee data")
     mempool_data: dict | None = Field(None, description="Raw mempool data")
+    tip_height: int | None = Field(None, description="Chain tip height at last refresh")
+    stale_parts: list[str] = Field(
+        default_factory=list,
+        description="Snapshot parts served from cache because the fetch failed or missed the deadline",
+    )
     error: str | None = Field(None, description="Last fetch error if any")
     source: str = Field("mempool.space", description="Upstream data source")
     network_state: str | None = Field(None, description="calm | moderate | congested")
     network_note: str | None = Field(None, description="Short human-readable note")
+    restored_from_snapshot: bool = Field(
+        False, description="True until the first refresh after a restart replaces the restored snapshot"
+    )
+    ingest: str = Field("poll", description="poll | stream: which path published this snapshot")
+    refresh_interval_seconds: float | None = Field(None, description="Current adaptive refresh interval")
+    last_refresh_reason: str | None = Field(
+        None, description="startup | interval | new_block | stream_backfill"
+    )
+    last_refresh_epoch: float | None = Field(None, description="Unix epoch seconds of the last refresh")
+    next_refresh_epoch: float | None = Field(None, description="Unix epoch seconds of the next scheduled refresh")
 
 
 class HealthStatus(BaseModel):
@@ -82,6 +107,48 @@ class HealthStatus(BaseModel):
     status: str = "ok"
 
 
+class EstimateBatchRequest(BaseModel):
+    """Candidate fees to classify in one pass."""
+
+    fees: list[Annotated[float, Field(gt=0)]] = Field(
+        ..., min_length=1, max_length=100_000, description="Candidate fees in sat/vB"
+    )
+
+
+class EstimateClass(BaseModel):
+    """Legend entry for a batch `class_code`."""
+
+    priority: str
+    rule: str
+    risk_level: str
+
+
+class EstimateBatchResponse(BaseModel):
+    """Columnar batch estimate; per-fee arrays share the order of the request."""
+
+    count: int
+    fee_sat_vb: list[float]
+    recommended_fee_sat_vb: list[float]
+    class_code: list[int] = Field(..., description="Index into `classes`")
+    eta_blocks_min: list[int]
+    eta_blocks_max: list[int]
+    eta_minutes_min: list[float]
+    eta_minutes_max: list[float]
+    classes: list[EstimateClass]
+    congestion_multiplier: float
+    congestion_level: str
+    confidence: str
+    mempool_tx_count: int
+    reference_fees: dict[str, float]
+    projected_block: list[int | None] = Field(..., description="None beyond the projection")
+    eta_minutes_p10: list[float | None]
+    eta_minutes_p50: list[float | None]
+    eta_minutes_p90: list[float | None]
+    shared_rules: list[str] = Field(..., description="Rules fired for every fee, after its class rule")
+    cache_used: bool
+    version: int
+
+
 class MiningBlock(BaseModel):
     """Projected mempool block entry."""
 
@@ -99,6 +166,9 @@ class MiningTargetEval(BaseModel):
     fits_in_block_index: int | None = None
     meets_min_fee: bool = False
     note: str
+    eta_minutes_p10: float | None = None
+    eta_minutes_p50: float | None = None
+    eta_minutes_p90: float | None = None
 
 
 class MiningTargetResponse(BaseModel):
@@ -107,7 +177,9 @@ class MiningTargetResponse(BaseModel):
     timestamp: str
     cache_used: bool
     source: str
-    blocks: list[MiningBlock]
+    blocks: list[MiningBlock] = Field(
+        description="Upstream projected blocks: the first 6, or up to target_blocks when available"
+    )
     error: str | None = None
     user_fee_eval: MiningTargetEval | None = None
     target_blocks: int | None = None
@@ -116,3 +188,4 @@ class MiningTargetResponse(BaseModel):
     savings_vs_fast_sat_vb: float | None = None
     extra_delay_minutes: float | None = None
     target_note: str | None = None
+    projection_blocks: int | None = Field(None, description="Blocks the current mempool is projected to fill")
@@ -1,6 +1,5 @@
 from __future__ import annotations
 
-import csv
 from datetime import datetime
 from pathlib import Path
 from typing import Dict, List
@@ -10,37 +9,30 @@ import matplotlib
 matplotlib.use("Agg")
 import matplotlib.pyplot as plt  # noqa: E402
 
+from . import history_rollup  # noqa: E402
+
 DATA_DIR = Path(__file__).resolve().parent.parent / "data"
-HISTORY_PATH = DATA_DIR / "history.csv"
 OUTPUT_PATH = DATA_DIR / "plot.png"
 
 
-def read_history() -> List[Dict[str, str]]:
-    if not HISTORY_PATH.exists():
-        print("history.csv not found; nothing to plot.")
-        return []
-    with HISTORY_PATH.open("r", newline="", encoding="utf-8") as f:
-        return list(csv.DictReader(f))
+def choose_resolution() -> str:
+    """Finest rollup resolution that still covers the whole history."""
+    days = history_rollup.buckets("day")
+    span = days[-1]["epoch"] - days[0]["epoch"] if days else 0
+    if span < history_rollup.RETENTION_SECONDS["minute"] - 86400:
+        return "minute"
+    if span < history_rollup.RETENTION_SECONDS["hour"] - 86400:
+        return "hour"
+    return "day"
 
 
-def parse_rows(rows: List[Dict[str, str]]) -> Dict[str, List[tuple]]:
+def read_series(resolution: str | None = None) -> Dict[str, List[tuple]]:
+    """Mean recommended fee per bucket and priority, from the rollups."""
+    history_rollup.update()
     series: Dict[str, List[tuple]] = {"fast": [], "normal": [], "cheap": []}
-    for row in rows:
-        ts = row.get("timestamp")
-        priority = row.get("priority")
-        fee = row.get("recommended_fee_sat_vb")
-        if not ts or not priority or not fee:
-            continue
-        try:
-            dt = datetime.fromisoformat(ts)
-            fee_val = float(fee)
-        except ValueError:
-            continue
-        series.setdefault(priority, []).append((dt, fee_val))
-
-    # sort by timestamp per series
-    for key, values in series.items():
-        series[key] = sorted(values, key=lambda x: x[0])
+    for bucket in history_rollup.buckets(resolution or choose_resolution()):
+        dt = datetime.fromisoformat(bucket["start"])
+        series.setdefault(bucket["priority"], []).append((dt, bucket["mean"]))
     return series
 
 
@@ -60,7 +52,7 @@ def plot_history(series: Dict[str, List[tuple]]) -> None:
         print("No data to plot.")
         return
 
-    plt.title("Recommended Fee Over Time")
+    plt.title("Mean Recommended Fee Over Time")
     plt.xlabel("Timestamp")
     plt.ylabel("Recommended Fee (sat/vB)")
     plt.grid(True, alpha=0.3)
@@ -73,8 +65,7 @@ def plot_history(series: Dict[str, List[tuple]]) -> None:
 
 
 def main() -> None:
-    rows = read_history()
-    series = parse_rows(rows)
+    series = read_series()
     plot_history(series)
 
 
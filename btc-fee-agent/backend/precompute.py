@@ -0,0 +1,192 @@
+"""Per-version precomputed recommendations and their serialized responses.
+
+Recommendation inputs only change when the snapshot version moves, so the
+fast/medium/slow recommendations, the compare response and their JSON bytes
+are built once per version (from the refresh pipeline) and shared by every
+request until the next one. Objects held here must be treated as read-only;
+callers that need to modify one (e.g. to add an LLM explanation) copy it.
+"""
+
+import threading
+from dataclasses import dataclass
+from types import MappingProxyType
+from typing import Mapping
+
+from . import projection, refresh
+from .agent import estimate_fee, recommend_fee
+from .models import CompareResponse, FeeRecommendation
+from .refresh import on_publish
+
+PRIORITIES = ("fast", "medium", "slow")
+ESTIMATE_CACHE_SIZE = 1024
+
+
+@dataclass(frozen=True)
+class Snapshot:
+    version: int
+    identity: str  # refresh.identity of the state it was built from
+    recommendations: Mapping[str, FeeRecommendation]
+    compare: CompareResponse
+    recommend_json: Mapping[str, bytes]
+    compare_json: bytes
+    history_rows: Mapping[str, dict]
+
+
+def apply_agent_messages(rec: FeeRecommendation, network_state: str | None, fee_data: dict) -> FeeRecommendation:
+    state_text = network_state or "unknown"
+    summary = (
+        f"Network state: {state_text}. ETA {rec.eta_blocks_min}-{rec.eta_blocks_max} blocks "
+        f"(~{rec.eta_minutes_min}-{rec.eta_minutes_max} min). Risk: {rec.risk_level}."
+    )
+    what_if = None
+    economy_fee = fee_data.get("economyFee") or fee_data.get("minimumFee")
+    if rec.mode == "recommend":
+        if network_state == "calm" and rec.priority == "fast":
+            what_if = "Network is calm; medium fee might offer similar speed with cost savings."
+        if network_state == "congested" and rec.priority == "slow":
+            what_if = "Network is congested; choosing slow may cause severe delays, consider medium or fast."
+    else:  # estimate
+        if economy_fee and rec.input_fee_sat_vb and rec.input_fee_sat_vb < economy_fee:
+            what_if = f"Fee is below economy level ({economy_fee} sat/vB); trying that or medium threshold will shorten confirmation time."
+
+    rec.agent_summary = summary
+    rec.what_if_hint = what_if
+    return rec
+
+
+def build_compare_verdict(network_state: str | None, delta_sat: int, overpay_pct: float) -> tuple[str, str]:
+    if network_state == "calm":
+        return (
+            "Network Calm",
+            f"Fee difference is small (+{delta_sat} sat/vB, {overpay_pct}%) and speed gain might be limited.",
+        )
+    if network_state == "congested":
+        return (
+            "Network Congested",
+            f"Fast fee (+{delta_sat} sat/vB, {overpay_pct}%) can reduce delay risk; slow choice may cause severe delays.",
+        )
+    return (
+        "Network Moderate",
+        f"Difference between Fast and Medium is +{delta_sat} sat/vB ({overpay_pct}%); higher fee might reduce wait time in moderate congestion.",
+    )
+
+
+def build_compare(
+    fast_rec: FeeRecommendation,
+    medium_rec: FeeRecommendation,
+    slow_rec: FeeRecommendation,
+    network_state: str | None,
+) -> CompareResponse:
+    overpay_percent = 0.0
+    overpay_delta = 0.0
+    note = ""
+    if medium_rec.recommended_fee_sat_vb:
+        overpay_delta = max(0.0, fast_rec.recommended_fee_sat_vb - medium_rec.recommended_fee_sat_vb)
+        overpay_percent = round((overpay_delta / medium_rec.recommended_fee_sat_vb) * 100, 2)
+        overpay_delta = round(overpay_delta, 4)
+    fee_spread = fast_rec.recommended_fee_sat_vb - slow_rec.recommended_fee_sat_vb
+    if fee_spread <= 2:
+        note = "Fee differences may have limited impact right now."
+    else:
+        note = "Fast pays more, slow delays more."
+    verdict_title, verdict_text = build_compare_verdict(network_state, overpay_delta, overpay_percent)
+    return CompareResponse(
+        fast=fast_rec,
+        medium=medium_rec,
+        slow=slow_rec,
+        overpay_percent_fast_vs_medium=overpay_percent,
+        overpay_delta_fast_vs_medium_sat_vb=overpay_delta,
+        note=note,
+        verdict_title=verdict_title,
+        verdict_text=verdict_text,
+    )
+
+
+def apply_projection(rec: FeeRecommendation, fee: float, state: dict | None = None) -> FeeRecommendation:
+    block = projection.current(state).position(fee)
+    rec.projected_block = block
+    eta = projection.eta_minutes(block)
+    if eta is not None:
+        rec.eta_minutes_p10, rec.eta_minutes_p50, rec.eta_minutes_p90 = eta
+    return rec
+
+
+def history_row(rec: FeeRecommendation, priority: str | None = None) -> dict:
+    return {
+        "priority": priority or rec.priority,
+        "base_fee_sat_vb": rec.base_fee_sat_vb,
+        "mempool_tx_count": rec.mempool_tx_count,
+        "recommended_fee_sat_vb": rec.recommended_fee_sat_vb,
+    }
+
+
+_lock = threading.Lock()
+_current: Snapshot | None = None
+_estimates: dict[float, tuple[FeeRecommendation, bytes]] = {}
+_estimates_identity = ""
+
+
+def rebuild(state: dict) -> Snapshot:
+    """Build and install the precomputed snapshot for `state`."""
+    global _current
+    fee_data = state["fee_data"] or {}
+    mempool = state["mempool_data"] or {}
+    network_state = state.get("network_state")
+    recs = {
+        priority: apply_agent_messages(
+            recommend_fee(priority, fee_data, mempool, cache_used=state["cache_used"]), network_state, fee_data
+        )
+        for priority in PRIORITIES
+    }
+    compare = build_compare(recs["fast"], recs["medium"], recs["slow"], network_state)
+    snapshot = Snapshot(
+        version=state["version"],
+        identity=refresh.identity(state),
+        recommendations=MappingProxyType(recs),
+        compare=compare,
+        recommend_json=MappingProxyType({p: rec.model_dump_json().encode("utf-8") for p, rec in recs.items()}),
+        compare_json=compare.model_dump_json().encode("utf-8"),
+        history_rows=MappingProxyType({p: history_row(rec) for p, rec in recs.items()}),
+    )
+    with _lock:
+        if _current is None or snapshot.version >= _current.version:
+            _current = snapshot
+    return snapshot
+
+
+def current(state: dict | None = None) -> Snapshot:
+    """Precomputed snapshot for `state` (default: the live state), rebuilding if it lags behind."""
+    snapshot = _current
+    state = state or refresh.LATEST_STATE
+    if snapshot is None or snapshot.identity != refresh.identity(state):
+        snapshot = rebuild(state)
+    return snapshot
+
+
+def estimate(fee: float) -> tuple[FeeRecommendation, bytes]:
+    """Estimate for `fee`, memoized per snapshot."""
+    global _estimates_identity
+    state = refresh.LATEST_STATE
+    key = refresh.identity(state)
+    with _lock:
+        if _estimates_identity != key:
+            _estimates.clear()
+            _estimates_identity = key
+        cached = _estimates.get(fee)
+    if cached is not None:
+        return cached
+
+    fee_data = state["fee_data"] or {}
+    rec = estimate_fee(fee, fee_data, state["mempool_data"] or {}, cache_used=state["cache_used"])
+    rec = apply_agent_messages(rec, state.get("network_state"), fee_data)
+    rec = apply_projection(rec, fee, state)
+    result = (rec, rec.model_dump_json().encode("utf-8"))
+    with _lock:
+        if _estimates_identity == key and refresh.LATEST_STATE is state:
+            if len(_estimates) >= ESTIMATE_CACHE_SIZE:
+                _estimates.pop(next(iter(_estimates)))
+            _estimates[fee] = result
+    return result
+
+
+on_publish(rebuild)
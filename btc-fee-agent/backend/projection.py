@@ -0,0 +1,198 @@
+"""Deep mempool projection: a cumulative vsize-by-fee-rate curve and fee→ETA index.
+
+Rebuilt whenever a new snapshot version is published. The first projected
+blocks come from `/v1/fees/mempool-blocks` (each block's `feeRange` spread
+over its vsize); anything deeper comes from the mempool fee histogram. A fee
+maps to the vsize paying more than it, and from there to a projected block
+position and ETA percentiles, with a binary search over the curve.
+
+ETAs treat block arrivals as a Poisson process (mean `BLOCK_MINUTES`), so the
+wait for the k-th block is Gamma(k) distributed. New transactions that outbid
+the fee are not modelled, so deep positions are optimistic.
+"""
+
+import bisect
+import math
+import os
+import threading
+from dataclasses import dataclass
+
+import numpy as np
+
+from . import refresh
+from .refresh import on_publish
+
+MAX_BLOCKS = int(os.getenv("MEMPOOL_PROJECTION_BLOCKS", "144"))
+BLOCK_VSIZE = 1_000_000
+BLOCK_MINUTES = 10.0
+ETA_PERCENTILES = (0.1, 0.5, 0.9)
+_Z = {0.1: -1.2815516, 0.5: 0.0, 0.9: 1.2815516}
+
+
+def _gamma_quantile_minutes(blocks: int, p: float) -> float:
+    """Minutes until `blocks` blocks have been found, at probability `p`."""
+    if blocks == 1:
+        return -BLOCK_MINUTES * math.log(1 - p)  # exponential, exact
+    # Wilson–Hilferty: Gamma(k, θ) = θ/2 · χ²(2k).
+    nu = 2 * blocks
+    c = 2 / (9 * nu)
+    chi2 = nu * max(0.0, 1 - c + _Z[p] * math.sqrt(c)) ** 3
+    return BLOCK_MINUTES / 2 * chi2
+
+
+# ETA_TABLE[k - 1] -> (p10, p50, p90) minutes for projected block k.
+ETA_TABLE = tuple(
+    tuple(round(_gamma_quantile_minutes(k, p), 1) for p in ETA_PERCENTILES) for k in range(1, MAX_BLOCKS + 1)
+)
+
+
+@dataclass(frozen=True)
+class Projection:
+    version: int
+    identity: str  # refresh.identity of the state it was built from
+    fees_asc: tuple[float, ...]  # curve fee rates, ascending
+    vsize_ahead: tuple[float, ...]  # vsize paying at least fees_asc[i]
+    total_vsize: float
+    block_min_fee: tuple[float, ...]  # block_min_fee[k - 1]: lowest fee still in block k
+
+    @property
+    def blocks(self) -> int:
+        """Number of projected blocks the current mempool fills (capped at MAX_BLOCKS)."""
+        return min(MAX_BLOCKS, math.ceil(self.total_vsize / BLOCK_VSIZE))
+
+    def ahead_of(self, fee: float) -> float:
+        """Projected vsize that outbids `fee`."""
+        fees = self.fees_asc
+        if not fees:
+            return 0.0
+        i = bisect.bisect_right(fees, fee)
+        if i == len(fees):
+            return 0.0
+        if i == 0:
+            return self.total_vsize
+        lo, hi = fees[i - 1], fees[i]
+        return self.vsize_ahead[i] + (self.vsize_ahead[i - 1] - self.vsize_ahead[i]) * (hi - fee) / (hi - lo)
+
+    def position(self, fee: float) -> int | None:
+        """1-based projected block for `fee`, or None beyond MAX_BLOCKS / without data."""
+        if not self.fees_asc:
+            return None
+        block = int(self.ahead_of(fee) // BLOCK_VSIZE) + 1
+        return block if block <= MAX_BLOCKS else None
+
+    def positions(self, fees) -> np.ndarray:
+        """Vectorized `position`; 0 stands for None."""
+        fees = np.asarray(fees, dtype=np.float64)
+        if not self.fees_asc:
+            return np.zeros(fees.shape, dtype=np.int64)
+        ahead = np.interp(fees, self.fees_asc, self.vsize_ahead, left=self.total_vsize, right=0.0)
+        blocks = (ahead // BLOCK_VSIZE).astype(np.int64) + 1
+        blocks[blocks > MAX_BLOCKS] = 0
+        return blocks
+
+    def min_fee_for(self, blocks: int) -> float | None:
+        """Lowest fee projected to confirm within `blocks` blocks."""
+        if not self.block_min_fee:
+            return None
+        return self.block_min_fee[min(blocks, len(self.block_min_fee)) - 1]
+
+
+def eta_minutes(block: int | None) -> tuple[float, float, float] | None:
+    """(p10, p50, p90) minutes until projected block `block` is mined."""
+    if not block:
+        return None
+    return ETA_TABLE[min(block, MAX_BLOCKS) - 1]
+
+
+def _block_points(mempool_blocks: list[dict]) -> tuple[list[tuple[float, float]], float]:
+    """Curve points from projected blocks; returns (points, vsize covered)."""
+    points: list[tuple[float, float]] = []
+    start = 0.0
+    for i, blk in enumerate(mempool_blocks):
+        vsize = float(blk.get("blockVSize") or 0)
+        fee_range = sorted(blk.get("feeRange") or [])
+        # mempool.space folds the rest of the mempool into the last block;
+        # the histogram describes that tail better.
+        if not vsize or not fee_range or (i == len(mempool_blocks) - 1 and i > 0 and vsize > BLOCK_VSIZE * 1.05):
+            break
+        steps = len(fee_range) - 1
+        for j, fee in enumerate(fee_range):
+            points.append((float(fee), start + vsize * (1 - j / steps if steps else 1)))
+        start += vsize
+    return points, start
+
+
+def _histogram_points(histogram: list, covered: float) -> list[tuple[float, float]]:
+    points = []
+    cumulative = 0.0
+    for fee, vsize in sorted(histogram or [], key=lambda item: -item[0]):
+        cumulative += float(vsize)
+        if cumulative > covered:
+            points.append((float(fee), cumulative))
+    return points
+
+
+def build(mempool_blocks: list | None, mempool_data: dict | None, version: int = 0, identity: str = "") -> Projection:
+    """Build a projection from raw mempool-blocks and mempool stats."""
+    points, covered = _block_points(mempool_blocks or [])
+    points += _histogram_points((mempool_data or {}).get("fee_histogram"), covered)
+
+    # Walk the points by depth and keep the running minimum fee, so the curve
+    # is strictly monotone even where feeRanges of neighbouring blocks overlap.
+    curve: list[tuple[float, float]] = []
+    for fee, ahead in sorted(points, key=lambda point: (point[1], -point[0])):
+        if not curve or fee < curve[-1][0]:
+            curve.append((fee, ahead))
+    if curve:
+        curve[0] = (curve[0][0], 0.0)
+    total = curve[-1][1] if curve else 0.0
+
+    fees_desc = [fee for fee, _ in curve]
+    ahead_asc = [ahead for _, ahead in curve]
+    block_min_fee = []
+    for k in range(1, MAX_BLOCKS + 1 if curve else 1):
+        # Fee at which the vsize ahead reaches the end of block k.
+        target = k * BLOCK_VSIZE
+        i = bisect.bisect_left(ahead_asc, target)
+        if i >= len(curve):
+            block_min_fee.append(fees_desc[-1])
+            continue
+        if i == 0:
+            block_min_fee.append(fees_desc[0])
+            continue
+        (f0, a0), (f1, a1) = curve[i - 1], curve[i]
+        block_min_fee.append(round(f0 + (f1 - f0) * (target - a0) / (a1 - a0), 3))
+
+    return Projection(
+        version=version,
+        identity=identity,
+        fees_asc=tuple(reversed(fees_desc)),
+        vsize_ahead=tuple(reversed(ahead_asc)),
+        total_vsize=total,
+        block_min_fee=tuple(block_min_fee),
+    )
+
+
+_lock = threading.Lock()
+_current: Projection | None = None
+
+
+def rebuild(state: dict) -> Projection:
+    global _current
+    projection = build(state["mempool_blocks"], state["mempool_data"], state["version"], refresh.identity(state))
+    with _lock:
+        if _current is None or projection.version >= _current.version:
+            _current = projection
+    return projection
+
+
+def current(state: dict | None = None) -> Projection:
+    """Projection for `state` (default: the live state), rebuilding if it lags behind."""
+    projection = _current
+    state = state or refresh.LATEST_STATE
+    if projection is None or projection.identity != refresh.identity(state):
+        projection = rebuild(state)
+    return projection
+
+
+on_publish(rebuild)
@@ -0,0 +1,103 @@
+"""Token-bucket rate limiting for upstream requests.
+
+Buckets hand out reservations under a lock and callers wait outside it, so
+the same limiter works from threads (`acquire`) and event loops
+(`acquire_async`) without ever blocking a loop.
+"""
+
+import asyncio
+import threading
+import time
+
+from . import metrics
+
+
+class TokenBucket:
+    """Refills `rate` tokens per second up to `burst`."""
+
+    def __init__(self, rate: float, burst: float):
+        self.rate = rate
+        self.burst = max(1.0, burst)
+        self._tokens = self.burst
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def reserve(self) -> float:
+        """Take one token and return how long the caller must wait for it."""
+        if self.rate <= 0:
+            return 0.0
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            self._tokens -= 1
+            return 0.0 if self._tokens >= 0 else -self._tokens / self.rate
+
+
+class RateLimiter:
+    """Per-host and per-endpoint token buckets with throttling counters."""
+
+    def __init__(
+        self,
+        host_interval: float,
+        host_burst: float,
+        endpoint_interval: float,
+        endpoint_burst: float,
+    ):
+        self._host_args = (_rate(host_interval), host_burst)
+        self._endpoint_args = (_rate(endpoint_interval), endpoint_burst)
+        self._buckets: dict[tuple[str, str], TokenBucket] = {}
+        self._lock = threading.Lock()
+        self._queued = 0
+
+    def _bucket(self, kind: str, key: str) -> TokenBucket:
+        with self._lock:
+            bucket = self._buckets.get((kind, key))
+            if bucket is None:
+                args = self._host_args if kind == "host" else self._endpoint_args
+                bucket = self._buckets[(kind, key)] = TokenBucket(*args)
+            return bucket
+
+    def _reserve(self, host: str, endpoint: str) -> float:
+        wait = max(
+            self._bucket("host", host).reserve(),
+            self._bucket("endpoint", f"{host}{endpoint}").reserve(),
+        )
+        metrics.incr("ratelimit.requests")
+        if wait > 0:
+            metrics.incr("ratelimit.throttled")
+            metrics.incr(f"ratelimit.throttled.{endpoint}")
+            metrics.incr("ratelimit.wait_seconds", wait)
+        return wait
+
+    def _set_queued(self, delta: int) -> None:
+        with self._lock:
+            self._queued += delta
+            queued = self._queued
+        metrics.set_gauge("ratelimit.queued", queued)
+        if delta > 0:
+            metrics.incr("ratelimit.queued_total")
+
+    def acquire(self, host: str, endpoint: str) -> None:
+        """Block the calling thread until a request to `endpoint` is allowed."""
+        wait = self._reserve(host, endpoint)
+        if wait > 0:
+            self._set_queued(1)
+            try:
+                time.sleep(wait)
+            finally:
+                self._set_queued(-1)
+
+    async def acquire_async(self, host: str, endpoint: str) -> None:
+        """Await until a request to `endpoint` is allowed."""
+        wait = self._reserve(host, endpoint)
+        if wait > 0:
+            self._set_queued(1)
+            try:
+                await asyncio.sleep(wait)
+            finally:
+                self._set_queued(-1)
+
+
+def _rate(interval: float) -> float:
+    return 1.0 / interval if interval > 0 else 0.0
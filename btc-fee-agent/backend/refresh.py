@@ -0,0 +1,295 @@
+"""Live network snapshot shared by the API endpoints.
+
+`LATEST_STATE` is replaced, never changed in place: every publish builds a
+new dict under `_publish_lock` and rebinds the module attribute. Readers
+take the reference once (`state = refresh.LATEST_STATE`) and get a
+consistent snapshot, whichever thread or loop publishes meanwhile. Import
+the module, not the name, so later reads see the newest dict.
+"""
+
+import hashlib
+import logging
+import queue
+import threading
+import time
+from datetime import datetime, timezone
+from typing import Callable
+
+from . import metrics, state_snapshot
+from .data_fetcher import SNAPSHOT_PARTS, fetch_snapshot, value_digest
+from .singleflight import flights
+
+LATEST_STATE = {
+    "version": 0,
+    "content_hash": None,
+    "checked_at_epoch": None,
+    "updated_at_epoch": None,
+    "timestamp": None,
+    "fee_data": None,
+    "mempool_data": None,
+    "mempool_blocks": None,
+    "tip_height": None,
+    "stale_parts": [],
+    "cache_used": False,
+    "error": None,
+    "source": "mempool.space",
+    "network_state": None,
+    "network_note": None,
+    "restored_from_snapshot": False,
+    "ingest": "poll",
+    # When the scheduler expects the next poll; travels with the state so
+    # followers can compute cache lifetimes too. None while a feed is live.
+    "fresh_until_epoch": None,
+}
+
+logger = logging.getLogger(__name__)
+
+_publish_lock = threading.Lock()
+_part_digests: dict = {}
+_listeners: list[Callable[[dict], None]] = []
+# (state copy, save to disk?) or a threading.Event from `drain`.
+_deliveries: queue.Queue = queue.Queue()
+_delivery_thread: threading.Thread | None = None
+_delivery_thread_lock = threading.Lock()
+
+
+def _swap(changes: dict) -> None:
+    # Caller holds _publish_lock. One reference assignment: readers see the
+    # old snapshot or the new one, never a mix.
+    global LATEST_STATE
+    LATEST_STATE = {**LATEST_STATE, **changes}
+
+
+def identity(state: dict) -> str:
+    """Key of what `state` serves, beyond its version.
+
+    The version is a per-process counter: a restored snapshot keeps it with
+    different staleness, and another worker may reuse it for other content.
+    """
+    return "|".join(
+        [
+            str(state["version"]),
+            str(state["content_hash"]),
+            str(state["updated_at_epoch"]),
+            str(state["cache_used"]),
+            ",".join(sorted(state["stale_parts"])),
+            str(state["restored_from_snapshot"]),
+        ]
+    )
+
+
+def on_publish(callback: Callable[[dict], None]) -> None:
+    """Call `callback(state)` for every new version, on the listener thread.
+
+    `state` is the (read-only) LATEST_STATE dict of that version;
+    `LATEST_STATE` itself may already have moved on when the callback runs.
+    """
+    _listeners.append(callback)
+
+
+def _deliver() -> None:
+    while True:
+        items = [_deliveries.get()]
+        while True:
+            try:
+                items.append(_deliveries.get_nowait())
+            except queue.Empty:
+                break
+        to_save = None
+        for item in items:
+            if isinstance(item, threading.Event):
+                continue
+            state, save = item
+            for callback in _listeners:
+                try:
+                    callback(state)
+                except Exception:
+                    logger.exception("Publish listener %r failed", callback)
+            if save:
+                to_save = state
+        if to_save is not None:
+            # Only the newest version of a burst is worth writing.
+            state_snapshot.save(to_save)
+        for item in items:
+            if isinstance(item, threading.Event):
+                item.set()
+
+
+def _notify(save: bool = False) -> None:
+    """Queue the current state for the listeners (caller holds _publish_lock).
+
+    Listeners and the disk snapshot run on their own thread, so publishing
+    (on the HTTP pool loop or the app loop) never waits for them.
+    """
+    global _delivery_thread
+    if _delivery_thread is None or not _delivery_thread.is_alive():
+        with _delivery_thread_lock:
+            if _delivery_thread is None or not _delivery_thread.is_alive():
+                _delivery_thread = threading.Thread(target=_deliver, name="publish-listeners", daemon=True)
+                _delivery_thread.start()
+    _deliveries.put((LATEST_STATE, save))
+
+
+def drain(timeout: float = 5.0) -> bool:
+    """Wait until every version published so far reached the listeners."""
+    if _delivery_thread is None or not _delivery_thread.is_alive():
+        return True
+    done = threading.Event()
+    _deliveries.put(done)
+    return done.wait(timeout)
+
+
+def classify_network_state(fee_data: dict, mempool: dict) -> tuple[str, str]:
+    mempool_tx = int((mempool or {}).get("count", 0) or 0)
+    fastest = fee_data.get("fastestFee") or fee_data.get("halfHourFee") or 0
+    economy = fee_data.get("economyFee") or fee_data.get("minimumFee") or 0
+    fee_spread = max(0, fastest - economy)
+
+    if mempool_tx < 120_000 and fee_spread <= 2:
+        return "calm", "Network is calm; fee differences may have limited impact on speed."
+    if mempool_tx < 250_000 and fee_spread <= 8:
+        return "moderate", "Network is moderately congested; higher fees might gain speed."
+    return "congested", "Network is congested; low fees may cause significant delays."
+
+
+def _snapshot_hash(digests: dict, stale: list[str]) -> str:
+    # Staleness is part of the identity: it changes cache_used downstream.
+    key = "|".join(f"{name}={digests.get(name)}" for name in sorted(digests))
+    key += "|stale=" + ",".join(sorted(stale))
+    return hashlib.blake2b(key.encode("utf-8"), digest_size=16).hexdigest()
+
+
+def publish(
+    parts: dict,
+    stale: list[str],
+    errors: dict[str, str],
+    digests: dict,
+    ingest: str = "poll",
+    source: str = "mempool.space",
+) -> bool:
+    """Publish a snapshot; bump the version only if its content changed.
+
+    Returns True when a new version was published. Unchanged snapshots only
+    refresh `checked_at_epoch` and `error`, so classification and persistence
+    are skipped.
+    """
+    with _publish_lock:
+        return _publish_locked(parts, stale, errors, digests, ingest, source)
+
+
+def publish_partial(updates: dict, ingest: str = "stream") -> bool:
+    """Merge changed parts (e.g. from a push feed) into the current snapshot."""
+    with _publish_lock:
+        parts = {name: LATEST_STATE[name] for name in SNAPSHOT_PARTS}
+        parts.update(updates)
+        digests = dict(_part_digests)
+        for name, value in updates.items():
+            digests[name] = value_digest(value)  # same digest as a poll of the same data
+        stale = [name for name in LATEST_STATE["stale_parts"] if name not in updates]
+        return _publish_locked(parts, stale, {}, digests, ingest, LATEST_STATE["source"])
+
+
+def _publish_locked(
+    parts: dict, stale: list[str], errors: dict[str, str], digests: dict, ingest: str, source: str
+) -> bool:
+    now = datetime.now(timezone.utc)
+    content_hash = _snapshot_hash(digests, stale)
+    error = "; ".join(f"{name}: {msg}" for name, msg in errors.items()) or None
+    if content_hash == LATEST_STATE["content_hash"]:
+        _swap({"checked_at_epoch": now.timestamp(), "error": error})
+        metrics.incr("refresh.unchanged")
+        return False
+
+    fee_data = parts["fee_data"] or {}
+    mempool = parts["mempool_data"] or {}
+    net_state, net_note = classify_network_state(fee_data, mempool)
+
+    _swap(
+        {
+            "version": LATEST_STATE["version"] + 1,
+            "content_hash": content_hash,
+            "checked_at_epoch": now.timestamp(),
+            "updated_at_epoch": now.timestamp(),
+            "timestamp": now.isoformat(),
+            "fee_data": fee_data,
+            "mempool_data": mempool,
+            "mempool_blocks": parts["mempool_blocks"],
+            "tip_height": parts["tip_height"],
+            "stale_parts": stale,
+            # Recommendations only depend on fees and mempool stats.
+            "cache_used": bool({"fee_data", "mempool_data"} & set(stale)),
+            "error": error,
+            "source": source,
+            "network_state": net_state,
+            "network_note": net_note,
+            "restored_from_snapshot": False,
+            "ingest": ingest,
+        }
+    )
+    _part_digests.update(digests)
+    metrics.incr("refresh.published")
+    _notify(save=True)
+    return True
+
+
+def adopt(state: dict) -> None:
+    """Install a snapshot published by another worker (see shared_state)."""
+    with _publish_lock:
+        _swap({key: value for key, value in state.items() if key in LATEST_STATE})
+        _notify()
+
+
+def update_state(changes: dict) -> None:
+    """Change fields of the current snapshot without publishing a new version."""
+    with _publish_lock:
+        _swap(changes)
+
+
+async def _refresh_once():
+    snapshot = await fetch_snapshot()
+    publish(
+        snapshot["parts"],
+        snapshot["stale"],
+        snapshot["errors"],
+        snapshot["digests"],
+        source=snapshot["source"],
+    )
+    metrics.set_gauge_once("startup.boot_to_first_refresh_seconds", metrics.since_start())
+
+
+def restore_snapshot() -> bool:
+    """Seed LATEST_STATE from the last saved snapshot, marked as stale.
+
+    Lets the first requests after a restart be served immediately while the
+    background refresh catches up.
+    """
+    started = time.monotonic()
+    loaded = state_snapshot.load()
+    if loaded is None:
+        return False
+    state, saved_at = loaded
+    with _publish_lock:
+        _swap(
+            {
+                **{key: value for key, value in state.items() if key in LATEST_STATE},
+                "content_hash": None,  # force the first refresh to publish
+                "cache_used": True,
+                "stale_parts": list(SNAPSHOT_PARTS),
+                "restored_from_snapshot": True,
+            }
+        )
+    metrics.set_gauge("startup.snapshot_restore_seconds", time.monotonic() - started)
+    metrics.set_gauge("startup.snapshot_age_seconds", time.time() - saved_at)
+    return True
+
+
+async def refresh_once_async():
+    """Fetch all upstream parts concurrently and publish one snapshot.
+
+    Concurrent callers (scheduler, request handlers) share one refresh.
+    """
+    await flights.do("refresh", _refresh_once)
+
+
+def refresh_once():
+    flights.do_sync("refresh", _refresh_once)
@@ -0,0 +1,300 @@
+"""Record upstream traffic and replay it from a local mempool stand-in.
+
+Record real responses (with timing) into a compact trace:
+    python -m backend.replay record --out data/trace.jsonl.gz --duration 600
+
+Serve them back, optionally with added latency, errors and a throughput cap:
+    python -m backend.replay serve --trace data/trace.jsonl.gz --port 8999 \\
+        --latency-ms 50 --error-rate 0.05 --max-rps 20 --loop
+    MEMPOOL_BASE_URL=http://127.0.0.1:8999/api python -m uvicorn backend.main:app
+
+Benchmark a running service:
+    python -m backend.replay bench --url http://127.0.0.1:8000/compare -n 2000 -c 50
+
+Trace format: gzip-compressed JSON lines. The first line is a header; every
+other line is one response `{"t", "p", "s", "l", "h", "b" | "r"}` (offset
+seconds, path, status, latency, headers, body). Bodies identical to an
+earlier one are stored as `"r"`, a reference to that body's index.
+"""
+
+import argparse
+import asyncio
+import bisect
+import gzip
+import json
+import random
+import time
+from pathlib import Path
+
+import httpx
+
+from .data_fetcher import BASE_URL
+from .ratelimit import TokenBucket
+
+TRACE_FORMAT = "btc-fee-agent-trace"
+TRACE_VERSION = 1
+RECORD_PATHS = [
+    "/v1/fees/recommended",
+    "/mempool",
+    "/v1/fees/mempool-blocks",
+    "/blocks/tip/height",
+    "/blocks",
+]
+_KEPT_HEADERS = ("content-type", "etag", "last-modified")
+
+
+class TraceWriter:
+    def __init__(self, path: Path, base_url: str):
+        self._file = gzip.open(path, "wt", encoding="utf-8")
+        self._started = time.monotonic()
+        self._body_ids: dict[str, int] = {}
+        self._write({"format": TRACE_FORMAT, "version": TRACE_VERSION, "base_url": base_url, "started_at": time.time()})
+
+    def _write(self, record: dict) -> None:
+        self._file.write(json.dumps(record, separators=(",", ":")) + "\n")
+
+    def add(self, path: str, response: httpx.Response, latency: float) -> None:
+        record = {
+            "t": round(time.monotonic() - self._started, 3),
+            "p": path,
+            "s": response.status_code,
+            "l": round(latency, 4),
+            "h": {k: response.headers[k] for k in _KEPT_HEADERS if k in response.headers},
+        }
+        body = response.text
+        if body in self._body_ids:
+            record["r"] = self._body_ids[body]
+        else:
+            self._body_ids[body] = len(self._body_ids)
+            record["b"] = body
+        self._write(record)
+
+    def close(self) -> None:
+        self._file.close()
+
+
+def load_trace(path: Path) -> tuple[dict, dict[str, list[dict]]]:
+    """Return the header and, per path, entries sorted by offset with bodies resolved."""
+    bodies: list[str] = []
+    by_path: dict[str, list[dict]] = {}
+    with gzip.open(path, "rt", encoding="utf-8") as f:
+        header = json.loads(f.readline())
+        if header.get("format") != TRACE_FORMAT or header.get("version") != TRACE_VERSION:
+            raise ValueError(f"{path} is not a v{TRACE_VERSION} trace")
+        for line in f:
+            record = json.loads(line)
+            if "b" in record:
+                bodies.append(record.pop("b"))
+                record["body"] = bodies[-1]
+            else:
+                record["body"] = bodies[record.pop("r")]
+            by_path.setdefault(record["p"], []).append(record)
+    for entries in by_path.values():
+        entries.sort(key=lambda e: e["t"])
+    return header, by_path
+
+
+async def record(out: Path, base_url: str, duration: float, interval: float) -> int:
+    """Poll the upstream endpoints every `interval` seconds for `duration` seconds."""
+    writer = TraceWriter(out, base_url)
+    count = 0
+    deadline = time.monotonic() + duration
+    try:
+        async with httpx.AsyncClient(timeout=10) as client:
+
+            async def one(path: str) -> None:
+                nonlocal count
+                started = time.monotonic()
+                try:
+                    response = await client.get(f"{base_url}{path}")
+                except httpx.HTTPError:
+                    return
+                writer.add(path, response, time.monotonic() - started)
+                count += 1
+
+            while time.monotonic() < deadline:
+                tick = time.monotonic()
+                await asyncio.gather(*(one(path) for path in RECORD_PATHS))
+                await asyncio.sleep(max(0.0, interval - (time.monotonic() - tick)))
+    finally:
+        writer.close()
+    return count
+
+
+class Replayer:
+    """Picks the trace entry that was current at the (scaled) playback time."""
+
+    def __init__(self, by_path: dict[str, list[dict]], speed: float = 1.0, loop: bool = False):
+        self.by_path = by_path
+        self._offsets = {path: [e["t"] for e in entries] for path, entries in by_path.items()}
+        self.duration = max((offsets[-1] for offsets in self._offsets.values() if offsets), default=0.0)
+        self.speed = speed
+        self.loop = loop
+        self._started = time.monotonic()
+
+    def position(self) -> float:
+        elapsed = (time.monotonic() - self._started) * self.speed
+        if self.loop and self.duration > 0:
+            return elapsed % self.duration
+        return elapsed
+
+    def current(self, path: str) -> dict | None:
+        offsets = self._offsets.get(path)
+        if not offsets:
+            return None
+        idx = bisect.bisect_right(offsets, self.position()) - 1
+        return self.by_path[path][max(0, idx)]
+
+
+def create_app(
+    replayer: Replayer,
+    latency_ms: float | None = None,
+    jitter_ms: float = 0.0,
+    error_rate: float = 0.0,
+    max_rps: float = 0.0,
+):
+    """Build the stand-in ASGI app. `latency_ms=None` replays recorded latency."""
+    from fastapi import FastAPI, Request, Response, WebSocket, WebSocketDisconnect
+
+    app = FastAPI(title="mempool stand-in")
+    bucket = TokenBucket(max_rps, max_rps) if max_rps > 0 else None
+
+    @app.websocket("/api/v1/ws")
+    async def feed(ws: WebSocket):
+        # Minimal mempool.space-style push feed for MEMPOOL_INGEST_MODE=stream.
+        await ws.accept()
+        sent: dict[str, int] = {}
+        try:
+            while True:
+                message = {}
+                for path, key in (("/v1/fees/recommended", "fees"), ("/v1/fees/mempool-blocks", "mempool-blocks")):
+                    entry = replayer.current(path)
+                    if entry and entry["s"] == 200 and sent.get(path) != id(entry):
+                        sent[path] = id(entry)
+                        message[key] = json.loads(entry["body"])
+                entry = replayer.current("/mempool")
+                if entry and entry["s"] == 200 and sent.get("/mempool") != id(entry):
+                    sent["/mempool"] = id(entry)
+                    stats = json.loads(entry["body"])
+                    message["mempoolInfo"] = {
+                        "size": stats.get("count"),
+                        "bytes": stats.get("vsize"),
+                        "total_fee": (stats.get("total_fee") or 0) / 100_000_000,
+                    }
+                entry = replayer.current("/blocks/tip/height")
+                if entry and entry["s"] == 200 and sent.get("tip") != id(entry):
+                    sent["tip"] = id(entry)
+                    message["block"] = {"height": json.loads(entry["body"])}
+                if message:
+                    await ws.send_text(json.dumps(message))
+                await asyncio.sleep(1)
+        except WebSocketDisconnect:
+            return
+
+    @app.get("/api/{path:path}")
+    async def upstream(path: str, request: Request):
+        entry = replayer.current(f"/{path}")
+        if entry is None:
+            return Response(status_code=404)
+        if bucket is not None and bucket.reserve() > 0:
+            return Response(status_code=429)
+        delay = entry["l"] if latency_ms is None else latency_ms / 1000
+        await asyncio.sleep(max(0.0, delay + random.uniform(-jitter_ms, jitter_ms) / 1000))
+        if error_rate and random.random() < error_rate:
+            return Response(status_code=503)
+        etag = entry["h"].get("etag")
+        if etag and request.headers.get("if-none-match") == etag:
+            return Response(status_code=304, headers={"etag": etag})
+        return Response(content=entry["body"], status_code=entry["s"], headers=entry["h"])
+
+    return app
+
+
+async def bench(url: str, total: int, concurrency: int) -> dict:
+    """Fire `total` GETs at `url` with `concurrency` workers; return latency stats."""
+    latencies: list[float] = []
+    statuses: dict[int, int] = {}
+    remaining = total
+
+    async with httpx.AsyncClient(timeout=30) as client:
+
+        async def worker() -> None:
+            nonlocal remaining
+            while remaining > 0:
+                remaining -= 1
+                started = time.perf_counter()
+                try:
+                    response = await client.get(url)
+                    statuses[response.status_code] = statuses.get(response.status_code, 0) + 1
+                except httpx.HTTPError:
+                    statuses[0] = statuses.get(0, 0) + 1
+                latencies.append(time.perf_counter() - started)
+
+        started = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+        elapsed = time.perf_counter() - started
+
+    latencies.sort()
+
+    def pct(q: float) -> float:
+        return round(latencies[min(len(latencies) - 1, int(len(latencies) * q))] * 1000, 2) if latencies else 0.0
+
+    return {
+        "requests": len(latencies),
+        "seconds": round(elapsed, 3),
+        "rps": round(len(latencies) / elapsed, 1) if elapsed else 0.0,
+        "p50_ms": pct(0.50),
+        "p90_ms": pct(0.90),
+        "p99_ms": pct(0.99),
+        "statuses": statuses,
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(prog="python -m backend.replay")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    rec = sub.add_parser("record", help="record upstream responses into a trace")
+    rec.add_argument("--out", type=Path, required=True)
+    rec.add_argument("--base-url", default=BASE_URL)
+    rec.add_argument("--duration", type=float, default=600)
+    rec.add_argument("--interval", type=float, default=10)
+
+    srv = sub.add_parser("serve", help="replay a trace as a mempool stand-in")
+    srv.add_argument("--trace", type=Path, required=True)
+    srv.add_argument("--host", default="127.0.0.1")
+    srv.add_argument("--port", type=int, default=8999)
+    srv.add_argument("--latency-ms", type=float, default=None, help="fixed latency (default: recorded)")
+    srv.add_argument("--jitter-ms", type=float, default=0.0)
+    srv.add_argument("--error-rate", type=float, default=0.0)
+    srv.add_argument("--max-rps", type=float, default=0.0, help="429 above this rate (0 = unlimited)")
+    srv.add_argument("--speed", type=float, default=1.0, help="playback speed multiplier")
+    srv.add_argument("--loop", action="store_true")
+
+    bn = sub.add_parser("bench", help="load-test a running service endpoint")
+    bn.add_argument("--url", required=True)
+    bn.add_argument("-n", "--requests", type=int, default=1000)
+    bn.add_argument("-c", "--concurrency", type=int, default=20)
+
+    args = parser.parse_args()
+    if args.command == "record":
+        count = asyncio.run(record(args.out, args.base_url.rstrip("/"), args.duration, args.interval))
+        print(f"Recorded {count} responses to {args.out}")
+    elif args.command == "serve":
+        import uvicorn
+
+        _, by_path = load_trace(args.trace)
+        app = create_app(
+            Replayer(by_path, speed=args.speed, loop=args.loop),
+            latency_ms=args.latency_ms,
+            jitter_ms=args.jitter_ms,
+            error_rate=args.error_rate,
+            max_rps=args.max_rps,
+        )
+        uvicorn.run(app, host=args.host, port=args.port)
+    else:
+        print(json.dumps(asyncio.run(bench(args.url, args.requests, args.concurrency)), indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,131 @@
+"""Adaptive refresh scheduling driven by block arrival and fee volatility.
+
+Between full refreshes the scheduler polls the tip height, which is cheap,
+and refreshes immediately when a new block shows up. The interval between
+regular refreshes shrinks while fees are moving and grows while they are
+flat, bounded by `MIN_INTERVAL` and `MAX_INTERVAL`.
+"""
+
+import asyncio
+import logging
+import os
+import time
+from collections import deque
+
+from . import metrics, refresh, stream_ingest
+from .data_fetcher import fetch_tip_height
+from .refresh import refresh_once_async
+
+BASE_INTERVAL = float(os.getenv("MEMPOOL_REFRESH_INTERVAL_SECONDS", "10"))
+MIN_INTERVAL = float(os.getenv("MEMPOOL_REFRESH_MIN_SECONDS", "5"))
+MAX_INTERVAL = float(os.getenv("MEMPOOL_REFRESH_MAX_SECONDS", "60"))
+TIP_POLL_SECONDS = float(os.getenv("MEMPOOL_TIP_POLL_SECONDS", "3"))
+# Largest relative fee move across the window that counts as volatile / calm.
+VOLATILE_MOVE = float(os.getenv("MEMPOOL_REFRESH_VOLATILE_MOVE", "0.10"))
+CALM_MOVE = float(os.getenv("MEMPOOL_REFRESH_CALM_MOVE", "0.02"))
+WINDOW = 6
+
+logger = logging.getLogger(__name__)
+
+STATUS = {
+    "refresh_interval_seconds": BASE_INTERVAL,
+    "last_refresh_reason": None,
+    "last_refresh_epoch": None,
+    "next_refresh_epoch": None,
+    "fee_move": 0.0,
+}
+
+# Fee data seen at each of the last WINDOW refreshes, changed or not, so a
+# single jump ages out once fees stay flat.
+_recent_fees: deque[dict] = deque(maxlen=WINDOW)
+# Newest tip height that already triggered a refresh, published or not, so a
+# failing refresh does not re-trigger on the same block every tip poll.
+_seen_tip: int | None = None
+
+
+def status() -> dict:
+    return dict(STATUS)
+
+
+def _fee_move(window: list[dict]) -> float:
+    """Largest relative change of the fast/medium fee between consecutive snapshots."""
+    move = 0.0
+    for prev, cur in zip(window, window[1:]):
+        for key in ("fastestFee", "hourFee"):
+            before, after = prev.get(key), cur.get(key)
+            if before and after is not None:
+                move = max(move, abs(after - before) / before)
+    return move
+
+
+def _adapt_interval() -> None:
+    _recent_fees.append(refresh.LATEST_STATE["fee_data"] or {})
+    if len(_recent_fees) < 2:
+        return  # one snapshot says nothing about movement yet
+    move = _fee_move(list(_recent_fees))
+    interval = STATUS["refresh_interval_seconds"]
+    if move >= VOLATILE_MOVE:
+        interval = max(MIN_INTERVAL, interval / 2)
+    elif move <= CALM_MOVE:
+        interval = min(MAX_INTERVAL, interval * 1.5)
+    STATUS.update({"refresh_interval_seconds": interval, "fee_move": round(move, 4)})
+    metrics.set_gauge("scheduler.interval_seconds", interval)
+
+
+def _set_fresh_until(epoch: float) -> None:
+    # A live feed can change the snapshot at any moment: no promise then.
+    refresh.update_state({"fresh_until_epoch": None if stream_ingest.is_live() else epoch})
+
+
+async def _refresh(reason: str) -> None:
+    # Set before publishing so the copy shared with followers carries it.
+    _set_fresh_until(time.time() + STATUS["refresh_interval_seconds"])
+    try:
+        await refresh_once_async()
+    except Exception:  # keep the loop alive; the next tick retries
+        logger.exception("Refresh (%s) failed", reason)
+    _adapt_interval()
+    now = time.time()
+    STATUS.update(
+        {
+            "last_refresh_reason": reason,
+            "last_refresh_epoch": now,
+            "next_refresh_epoch": now + STATUS["refresh_interval_seconds"],
+        }
+    )
+    _set_fresh_until(STATUS["next_refresh_epoch"])
+    metrics.incr(f"scheduler.refresh.{reason}")
+
+
+async def _new_block_seen() -> bool:
+    global _seen_tip
+    try:
+        height, cache_used = await fetch_tip_height()
+    except Exception:
+        return False
+    known = refresh.LATEST_STATE["tip_height"]
+    if cache_used or known is None or height in (known, _seen_tip):
+        return False
+    _seen_tip = height
+    return True
+
+
+async def run() -> None:
+    """Refresh forever: on new blocks, on the adaptive interval, or as stream backfill."""
+    await _refresh("startup")
+    while True:
+        if stream_ingest.is_live():
+            # The feed already delivers blocks; poll only to backfill.
+            STATUS["next_refresh_epoch"] = STATUS["last_refresh_epoch"] + stream_ingest.STREAM_POLL_SECONDS
+            if time.time() >= STATUS["next_refresh_epoch"]:
+                await _refresh("stream_backfill")
+            await asyncio.sleep(TIP_POLL_SECONDS)
+            continue
+        if time.time() >= STATUS["next_refresh_epoch"]:
+            await _refresh("interval")
+            continue
+        if await _new_block_seen():
+            STATUS["refresh_interval_seconds"] = MIN_INTERVAL
+            await _refresh("new_block")
+            continue
+        await asyncio.sleep(max(0.0, min(TIP_POLL_SECONDS, STATUS["next_refresh_epoch"] - time.time())))
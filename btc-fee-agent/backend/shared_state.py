@@ -0,0 +1,200 @@
+"""Share one live snapshot between uvicorn worker processes.
+
+Enabled with `MEMPOOL_SHARED_STATE=1`. Workers compete for an exclusive lock
+on `LOCK_PATH`; the holder is the leader. Only the leader runs the refresh
+scheduler and stream ingest, and it writes every new version into a
+memory-mapped region at `REGION_PATH`. The other workers (followers) watch
+the region's version counter and adopt a new snapshot once per version, so
+upstream traffic does not grow with the worker count and every worker serves
+the same version. The OS releases the lock when the leader exits, and the
+next follower to try the lock takes over.
+
+Region layout: header `<8sQQdI` (magic, sequence, version, published-at,
+payload length) followed by the state as compact JSON. Writes follow a
+seqlock protocol: the sequence is odd while the leader is writing, and a
+reader retries if it changed during its read.
+"""
+
+import asyncio
+import json
+import logging
+import mmap
+import os
+import struct
+import threading
+import time
+from pathlib import Path
+
+from . import metrics, refresh
+from .refresh import adopt, on_publish
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover - Windows
+    fcntl = None
+    import msvcrt
+
+ENABLED = os.getenv("MEMPOOL_SHARED_STATE", "0") == "1"
+_DATA_DIR = Path(__file__).resolve().parent.parent / "data"
+REGION_PATH = Path(os.getenv("MEMPOOL_SHARED_STATE_PATH", str(_DATA_DIR / "shared_state.mmap")))
+LOCK_PATH = REGION_PATH.with_suffix(".lock")
+REGION_BYTES = int(os.getenv("MEMPOOL_SHARED_STATE_BYTES", str(4 * 1024 * 1024)))
+FOLLOW_SECONDS = float(os.getenv("MEMPOOL_SHARED_STATE_POLL_SECONDS", "0.25"))
+ELECTION_SECONDS = float(os.getenv("MEMPOOL_LEADER_RETRY_SECONDS", "2"))
+
+MAGIC = b"BFASHM01"
+_HEADER = struct.Struct("<8sQQdI")
+_SEQ = struct.Struct("<Q")
+_SEQ_OFFSET = 8
+
+logger = logging.getLogger(__name__)
+
+_region: mmap.mmap | None = None
+_lock_file = None
+_role = "single"
+_adopted_version = 0
+_write_lock = threading.Lock()
+
+
+def enabled() -> bool:
+    return ENABLED
+
+
+def role() -> str:
+    """`single` (feature off), `leader` or `follower`."""
+    return _role
+
+
+def _open_region() -> mmap.mmap:
+    global _region
+    if _region is None:
+        REGION_PATH.parent.mkdir(parents=True, exist_ok=True)
+        fd = os.open(REGION_PATH, os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            if os.fstat(fd).st_size < REGION_BYTES:
+                os.ftruncate(fd, REGION_BYTES)
+            _region = mmap.mmap(fd, REGION_BYTES)
+        finally:
+            os.close(fd)
+    return _region
+
+
+def _try_lock() -> bool:
+    """Take the leader lock without blocking; held until the process exits."""
+    global _lock_file
+    if _lock_file is not None:
+        return True
+    LOCK_PATH.parent.mkdir(parents=True, exist_ok=True)
+    f = open(LOCK_PATH, "a+b")
+    try:
+        if fcntl is not None:
+            fcntl.flock(f.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+        else:
+            f.seek(0)
+            msvcrt.locking(f.fileno(), msvcrt.LK_NBLCK, 1)
+    except OSError:
+        f.close()
+        return False
+    _lock_file = f
+    return True
+
+
+def write(state: dict) -> None:
+    """Leader: publish `state` into the region (seqlock write)."""
+    payload = json.dumps(state, separators=(",", ":")).encode("utf-8")
+    if _HEADER.size + len(payload) > REGION_BYTES:
+        logger.warning("Snapshot of %d bytes does not fit the shared region", len(payload))
+        metrics.incr("shared_state.oversize")
+        return
+    region = _open_region()
+    # Publish listeners and the election loop both write; one writer at a time.
+    with _write_lock:
+        (seq,) = _SEQ.unpack_from(region, _SEQ_OFFSET)
+        seq += 1 if seq % 2 == 0 else 2  # a leader that died mid-write left it odd
+        _SEQ.pack_into(region, _SEQ_OFFSET, seq)
+        region[_HEADER.size : _HEADER.size + len(payload)] = payload
+        _HEADER.pack_into(region, 0, MAGIC, seq, state["version"], time.time(), len(payload))
+        _SEQ.pack_into(region, _SEQ_OFFSET, seq + 1)
+    metrics.incr("shared_state.writes")
+
+
+def version() -> int:
+    """Version currently in the region (0 if empty); an 8-byte read."""
+    region = _open_region()
+    magic, _, current, _, _ = _HEADER.unpack_from(region)
+    return current if magic == MAGIC else 0
+
+
+def read() -> dict | None:
+    """Consistent copy of the region's state, or None if empty."""
+    region = _open_region()
+    for _ in range(100):
+        magic, seq, _, _, length = _HEADER.unpack_from(region)
+        if magic != MAGIC:
+            return None
+        if seq % 2:
+            time.sleep(0)
+            continue
+        payload = region[_HEADER.size : _HEADER.size + length]
+        if _SEQ.unpack_from(region, _SEQ_OFFSET)[0] == seq:
+            return json.loads(payload)
+    metrics.incr("shared_state.read_retries_exhausted")
+    return None
+
+
+def sync() -> bool:
+    """Follower: adopt the region's snapshot if it is newer; True if adopted."""
+    global _adopted_version
+    known = max(_adopted_version, refresh.LATEST_STATE["version"])
+    if version() <= known:
+        return False
+    state = read()
+    if state is None or state["version"] <= known:
+        return False
+    adopt(state)
+    _adopted_version = state["version"]
+    metrics.incr("shared_state.adopted")
+    return True
+
+
+async def wait_for_data(timeout: float) -> bool:
+    """Follower: wait up to `timeout` seconds for the leader's first snapshot."""
+    deadline = time.monotonic() + timeout
+    while refresh.LATEST_STATE["fee_data"] is None and time.monotonic() < deadline:
+        sync()
+        await asyncio.sleep(FOLLOW_SECONDS)
+    return refresh.LATEST_STATE["fee_data"] is not None
+
+
+def _publish(state: dict) -> None:
+    if _role == "leader":
+        write(state)
+
+
+async def run(start_leader) -> None:
+    """Follow the region until this worker wins the lock, then call `start_leader()`."""
+    global _role
+    last_attempt = 0.0
+    while True:
+        if time.monotonic() - last_attempt >= ELECTION_SECONDS:
+            last_attempt = time.monotonic()
+            if _try_lock():
+                _role = "leader"
+                metrics.set_gauge("shared_state.leader", 1)
+                logger.info("Worker %d is the live-state leader", os.getpid())
+                sync()  # continue from the previous leader's version
+                state = refresh.LATEST_STATE
+                if state["version"]:
+                    write(state)
+                start_leader()
+                return
+        _role = "follower"
+        metrics.set_gauge("shared_state.leader", 0)
+        try:
+            sync()
+        except (OSError, ValueError):
+            logger.exception("Reading the shared live state failed")
+        await asyncio.sleep(FOLLOW_SECONDS)
+
+
+on_publish(_publish)
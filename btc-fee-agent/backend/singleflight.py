@@ -0,0 +1,48 @@
+"""Coalesce concurrent calls for the same upstream resource into one.
+
+The first caller for a key starts the work on the HTTP pool loop; everyone
+who asks for that key while it is in flight, from any thread or event loop,
+waits on the same future. The key is forgotten as soon as the work finishes,
+so this only merges concurrent calls and never caches results.
+"""
+
+import asyncio
+import concurrent.futures
+import threading
+from typing import Any, Callable, Coroutine, TypeVar
+
+from . import http_client, metrics
+
+T = TypeVar("T")
+
+
+class Group:
+    def __init__(self):
+        self._inflight: dict[str, concurrent.futures.Future] = {}
+        self._lock = threading.Lock()
+
+    def _start(self, key: str, factory: Callable[[], Coroutine[Any, Any, T]]) -> "concurrent.futures.Future[T]":
+        with self._lock:
+            future = self._inflight.get(key)
+            if future is not None:
+                metrics.incr(f"singleflight.shared.{key}")
+                return future
+            future = self._inflight[key] = http_client.spawn(factory())
+        future.add_done_callback(lambda done: self._forget(key, done))
+        return future
+
+    def _forget(self, key: str, future: concurrent.futures.Future) -> None:
+        with self._lock:
+            if self._inflight.get(key) is future:
+                del self._inflight[key]
+
+    async def do(self, key: str, factory: Callable[[], Coroutine[Any, Any, T]]) -> T:
+        """Await the shared result; a cancelled caller does not cancel the others."""
+        return await asyncio.shield(asyncio.wrap_future(self._start(key, factory)))
+
+    def do_sync(self, key: str, factory: Callable[[], Coroutine[Any, Any, T]]) -> T:
+        """Blocking variant; must not be called on the HTTP pool loop."""
+        return self._start(key, factory).result()
+
+
+flights = Group()
@@ -0,0 +1,54 @@
+"""Compact on-disk copy of the live state for fast cold starts.
+
+File layout: a fixed header (magic, format version, saved-at epoch, payload
+length) followed by zlib-compressed compact JSON of the state dict.
+"""
+
+import json
+import os
+import struct
+import tempfile
+import time
+import zlib
+from pathlib import Path
+
+SNAPSHOT_PATH = Path(__file__).resolve().parent.parent / "data" / "state.bin"
+MAGIC = b"BFAS"
+FORMAT_VERSION = 1
+_HEADER = struct.Struct("<4sHdI")
+
+
+def save(state: dict) -> None:
+    """Atomically write `state` to the snapshot file."""
+    payload = zlib.compress(json.dumps(state, separators=(",", ":")).encode("utf-8"))
+    header = _HEADER.pack(MAGIC, FORMAT_VERSION, time.time(), len(payload))
+    SNAPSHOT_PATH.parent.mkdir(parents=True, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=SNAPSHOT_PATH.parent, prefix=".state-", suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(header + payload)
+        os.chmod(tmp_path, 0o644)
+        os.replace(tmp_path, SNAPSHOT_PATH)
+    except OSError:
+        try:
+            os.unlink(tmp_path)
+        except OSError:
+            pass
+
+
+def load() -> tuple[dict, float] | None:
+    """Return `(state, saved_at_epoch)`, or None if missing or unreadable."""
+    try:
+        raw = SNAPSHOT_PATH.read_bytes()
+    except OSError:
+        return None
+    if len(raw) < _HEADER.size:
+        return None
+    magic, version, saved_at, length = _HEADER.unpack_from(raw)
+    if magic != MAGIC or version != FORMAT_VERSION or len(raw) - _HEADER.size != length:
+        return None
+    try:
+        state = json.loads(zlib.decompress(raw[_HEADER.size:]))
+    except (zlib.error, ValueError):
+        return None
+    return state, saved_at
@@ -0,0 +1,136 @@
+"""Push-based ingest from a mempool.space-style WebSocket feed.
+
+Enabled with `MEMPOOL_INGEST_MODE=stream`. Each message updates the parts of
+`LATEST_STATE` it carries (fees, mempool stats, mempool-blocks, tip height)
+via `refresh.publish_partial`. While the feed is down the regular polling
+loop takes over; while it is up polling slows to `STREAM_POLL_SECONDS` so the
+parts the feed does not carry (e.g. the fee histogram) stay fresh.
+"""
+
+import asyncio
+import json
+import logging
+import os
+import random
+import time
+
+from . import metrics, refresh
+from .data_fetcher import BASE_URL, store_external
+from .refresh import publish_partial
+
+try:
+    import websockets
+except ImportError:  # pragma: no cover - optional dependency
+    websockets = None
+
+logger = logging.getLogger(__name__)
+
+
+def _default_ws_url() -> str:
+    url = BASE_URL.replace("https://", "wss://", 1).replace("http://", "ws://", 1)
+    return f"{url}/v1/ws"
+
+
+INGEST_MODE = os.getenv("MEMPOOL_INGEST_MODE", "poll")
+WS_URL = os.getenv("MEMPOOL_WS_URL") or _default_ws_url()
+RECONNECT_MIN_SECONDS = float(os.getenv("MEMPOOL_WS_RECONNECT_MIN", "1"))
+RECONNECT_MAX_SECONDS = float(os.getenv("MEMPOOL_WS_RECONNECT_MAX", "60"))
+# The feed counts as live only if a message arrived within this window.
+STALE_AFTER_SECONDS = float(os.getenv("MEMPOOL_WS_STALE_SECONDS", "30"))
+STREAM_POLL_SECONDS = float(os.getenv("MEMPOOL_STREAM_POLL_SECONDS", "60"))
+
+SUBSCRIPTIONS = ["stats", "mempool-blocks", "blocks"]
+
+_last_message_at = 0.0
+_connected = False
+
+
+def enabled() -> bool:
+    return INGEST_MODE == "stream" and websockets is not None
+
+
+def is_live() -> bool:
+    """True while the feed is connected and recently delivered a message."""
+    return _connected and time.monotonic() - _last_message_at < STALE_AFTER_SECONDS
+
+
+def parse_message(message: dict) -> dict:
+    """Map a feed message onto snapshot parts; unknown keys are ignored."""
+    updates = {}
+    if isinstance(message.get("fees"), dict):
+        updates["fee_data"] = message["fees"]
+    info = message.get("mempoolInfo")
+    if isinstance(info, dict):
+        mempool = dict(refresh.LATEST_STATE["mempool_data"] or {})
+        mempool["count"] = info.get("size", mempool.get("count"))
+        mempool["vsize"] = info.get("bytes", mempool.get("vsize"))
+        if info.get("total_fee") is not None:
+            mempool["total_fee"] = int(round(info["total_fee"] * 100_000_000))  # BTC -> sat
+        updates["mempool_data"] = mempool
+    if isinstance(message.get("mempool-blocks"), list):
+        updates["mempool_blocks"] = message["mempool-blocks"]
+    if isinstance(message.get("block"), dict) and message["block"].get("height") is not None:
+        updates["tip_height"] = message["block"]["height"]
+    elif isinstance(message.get("blocks"), list) and message["blocks"]:
+        updates["tip_height"] = max(block.get("height", 0) for block in message["blocks"])
+    return updates
+
+
+# Snapshot part -> cache key, so a restart or poll fallback sees stream data.
+_CACHE_KEYS = {
+    "fee_data": "fees",
+    "mempool_data": "mempool",
+    "mempool_blocks": "mempool_blocks",
+    "tip_height": "blocks_tip_height",
+}
+
+
+def _apply(message: dict) -> None:
+    updates = parse_message(message)
+    if not updates:
+        return
+    for name, value in updates.items():
+        store_external(_CACHE_KEYS[name], value)
+    if publish_partial(updates):
+        metrics.incr("stream.versions")
+
+
+async def _consume(url: str) -> None:
+    global _connected, _last_message_at
+    async with websockets.connect(url, open_timeout=10, ping_interval=20) as ws:
+        await ws.send(json.dumps({"action": "init"}))
+        await ws.send(json.dumps({"action": "want", "data": SUBSCRIPTIONS}))
+        _connected = True
+        metrics.set_gauge("stream.connected", 1)
+        async for raw in ws:
+            _last_message_at = time.monotonic()
+            metrics.incr("stream.messages")
+            try:
+                message = json.loads(raw)
+            except ValueError:
+                continue
+            if isinstance(message, dict):
+                _apply(message)
+
+
+async def run(url: str = WS_URL) -> None:
+    """Consume the feed forever, reconnecting with jittered exponential backoff."""
+    global _connected
+    delay = RECONNECT_MIN_SECONDS
+    while True:
+        connected_at = time.monotonic()
+        try:
+            await _consume(url)
+        except asyncio.CancelledError:
+            raise
+        except Exception as exc:
+            logger.warning("Mempool feed %s disconnected: %s", url, exc)
+        finally:
+            _connected = False
+            metrics.set_gauge("stream.connected", 0)
+        metrics.incr("stream.reconnects")
+        # A connection that stayed up for a while resets the backoff.
+        if time.monotonic() - connected_at > RECONNECT_MAX_SECONDS:
+            delay = RECONNECT_MIN_SECONDS
+        await asyncio.sleep(delay * (0.5 + random.random()))
+        delay = min(RECONNECT_MAX_SECONDS, delay * 2)
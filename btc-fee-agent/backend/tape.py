@@ -0,0 +1,478 @@
+"""Tape of every published network snapshot (fee_data, mempool, mempool blocks).
+
+Each new snapshot version is appended to a gzip JSON-lines file in
+`data/tape/` by a background writer; the refresh path only enqueues. Files
+rotate every `NETWORK_TAPE_ROTATE_SECONDS` and are named after their first
+record, `tape-20261016T000000Z-<pid>.jsonl.gz`. The first line is a header,
+every other line one version:
+
+    {"t": epoch, "v": version, "h": tip height, "s": [stale parts],
+     "p": {part: encoded value}, "k": 1 on keyframes}
+
+Parts identical to the previous version are left out of `"p"`. A part equal
+to any earlier value in the file is `{"r": id}` (a dictionary reference; ids
+count new distinct values in file order). A new value is stored as a delta
+against the part's previous value, `{"d": changed keys, "x": removed keys}`
+for objects or `{"i": {index: item}, "n": length}` for lists, or in full as
+`{"b": value}`, whichever is shorter. Every `NETWORK_TAPE_KEYFRAME_RECORDS`
+records the dictionary restarts with a keyframe holding full values, which
+bounds the memory a reader and the writer need.
+
+Each process writes its own chain of files (the pid in the name). With
+shared state on only the leader records; otherwise every worker does, and
+`iter_snapshots` merges the chains by time, dropping a snapshot equal to the
+previous one from another chain (the same upstream data seen twice).
+Versions are per-process counters, so they only order one chain.
+
+Stream a time range with `iter_snapshots(since, until)`, or export it
+downsampled to one snapshot per step:
+    python -m backend.tape export --since 2026-10-01T00:00:00Z --step 300 --out data/tape_5m.csv
+    python -m backend.tape info
+"""
+
+import argparse
+import atexit
+import csv
+import gzip
+import heapq
+import itertools
+import json
+import logging
+import os
+import queue
+import threading
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Iterable, Iterator
+
+from . import metrics, shared_state
+from .refresh import on_publish
+
+ENABLED = os.getenv("NETWORK_TAPE", "1") == "1"
+_DATA_DIR = Path(__file__).resolve().parent.parent / "data"
+TAPE_DIR = Path(os.getenv("NETWORK_TAPE_DIR", str(_DATA_DIR / "tape")))
+FLUSH_SECONDS = float(os.getenv("NETWORK_TAPE_FLUSH_SECONDS", "5"))
+ROTATE_SECONDS = float(os.getenv("NETWORK_TAPE_ROTATE_SECONDS", "86400"))
+KEYFRAME_RECORDS = int(os.getenv("NETWORK_TAPE_KEYFRAME_RECORDS", "1000"))
+RETENTION_DAYS = float(os.getenv("NETWORK_TAPE_RETENTION_DAYS", "0"))  # 0 keeps everything
+QUEUE_SIZE = 1000
+
+TAPE_FORMAT = "btc-fee-agent-tape"
+TAPE_VERSION = 1
+PARTS = ("fee_data", "mempool_data", "mempool_blocks")
+
+logger = logging.getLogger(__name__)
+
+_queue: queue.Queue = queue.Queue(maxsize=QUEUE_SIZE)
+_STOP = object()
+_thread: threading.Thread | None = None
+_thread_lock = threading.Lock()
+_last_version = 0
+
+
+def _canonical(value) -> str:
+    return json.dumps(value, sort_keys=True, separators=(",", ":"))
+
+
+def _delta(previous, value) -> dict | None:
+    if isinstance(previous, dict) and isinstance(value, dict):
+        return {
+            "d": {key: item for key, item in value.items() if key not in previous or previous[key] != item},
+            "x": [key for key in previous if key not in value],
+        }
+    if isinstance(previous, list) and isinstance(value, list):
+        return {
+            "i": {str(i): item for i, item in enumerate(value) if i >= len(previous) or previous[i] != item},
+            "n": len(value),
+        }
+    return None
+
+
+def _apply(previous, encoded: dict):
+    if "d" in encoded:
+        value = {key: item for key, item in previous.items() if key not in encoded["x"]}
+        value.update(encoded["d"])
+        return value
+    value = previous[: encoded["n"]] + [None] * max(0, encoded["n"] - len(previous))
+    for i, item in encoded["i"].items():
+        value[int(i)] = item
+    return value
+
+
+def _file_name(epoch: float) -> str:
+    return f"tape-{datetime.fromtimestamp(epoch, timezone.utc):%Y%m%dT%H%M%SZ}-{os.getpid()}.jsonl.gz"
+
+
+def _file_start(path: Path) -> float:
+    stamp = path.name.split("-")[1]
+    return datetime.strptime(stamp, "%Y%m%dT%H%M%SZ").replace(tzinfo=timezone.utc).timestamp()
+
+
+def _file_writer(path: Path) -> str:
+    return path.name.split("-")[2].split(".")[0]
+
+
+def _chains(paths: list[Path]) -> dict[str, list[Path]]:
+    """Files per writing process, oldest first; a file ends where the next one of its chain starts."""
+    chains: dict[str, list[Path]] = {}
+    for path in sorted(paths, key=_file_start):
+        chains.setdefault(_file_writer(path), []).append(path)
+    return chains
+
+
+class TapeWriter:
+    """Encodes snapshots into the current tape file (writer thread only)."""
+
+    def __init__(self, directory: Path):
+        self.directory = directory
+        self._file = None
+        self._window = None
+        self._records = 0
+        self._ids: dict[str, int] = {}
+        self._previous: dict[str, tuple[str, object]] = {}
+
+    def _open(self, epoch: float) -> None:
+        self.close()
+        self.directory.mkdir(parents=True, exist_ok=True)
+        path = self.directory / _file_name(epoch)
+        # A new file per writer session: an unclosed gzip member from a crash
+        # cannot be appended to.
+        self._file = gzip.open(path, "wt", encoding="utf-8", compresslevel=6)
+        header = {"format": TAPE_FORMAT, "version": TAPE_VERSION, "started_at": epoch, "pid": os.getpid()}
+        self._file.write(json.dumps(header) + "\n")
+        self._window = epoch // ROTATE_SECONDS
+        self._records = 0
+        metrics.incr("tape.files")
+        _prune(self.directory, epoch)
+
+    def _encode(self, part: str, value) -> dict | None:
+        key = _canonical(value)
+        previous = self._previous.get(part)
+        if previous is not None and previous[0] == key:
+            return None
+        self._previous[part] = (key, value)
+        if key in self._ids:
+            return {"r": self._ids[key]}
+        self._ids[key] = len(self._ids)
+        full = {"b": value}
+        delta = _delta(previous[1], value) if previous is not None else None
+        if delta is not None and len(_canonical(delta)) < len(key):
+            return delta
+        return full
+
+    def write(self, item: tuple) -> None:
+        epoch, version, tip, stale, parts = item
+        if self._file is None or epoch // ROTATE_SECONDS != self._window:
+            self._open(epoch)
+        record = {"t": epoch, "v": version, "h": tip}
+        if stale:
+            record["s"] = stale
+        if self._records % KEYFRAME_RECORDS == 0:
+            record["k"] = 1
+            self._ids.clear()
+            self._previous.clear()
+        encoded = {}
+        for part in PARTS:
+            value = self._encode(part, parts[part])
+            if value is not None:
+                encoded[part] = value
+        record["p"] = encoded
+        self._file.write(json.dumps(record, separators=(",", ":")) + "\n")
+        self._records += 1
+        metrics.incr("tape.records")
+
+    def flush(self) -> None:
+        if self._file is not None:
+            # A sync flush: everything so far is readable while the file stays open.
+            self._file.flush()
+
+    def close(self) -> None:
+        if self._file is not None:
+            self._file.close()
+        self._file = None
+
+
+def _prune(directory: Path, now: float) -> None:
+    if RETENTION_DAYS <= 0:
+        return
+    cutoff = now - RETENTION_DAYS * 86400
+    for chain in _chains(list(directory.glob("tape-*.jsonl.gz"))).values():
+        for path, following in itertools.zip_longest(chain, chain[1:]):
+            try:
+                # The last file of a chain ends with its last write (an exited worker).
+                end = _file_start(following) if following is not None else path.stat().st_mtime
+            except FileNotFoundError:
+                continue  # pruned by another worker
+            if end < cutoff:
+                path.unlink(missing_ok=True)
+                metrics.incr("tape.files_dropped")
+
+
+def _run() -> None:
+    writer = TapeWriter(TAPE_DIR)
+    try:
+        while True:
+            item = _queue.get()
+            deadline = time.monotonic() + FLUSH_SECONDS
+            stop = False
+            while True:
+                if item is _STOP:
+                    stop = True
+                    break
+                try:
+                    writer.write(item)
+                except (OSError, TypeError, ValueError):
+                    logger.exception("Writing to the network tape failed")
+                    metrics.incr("tape.write_errors")
+                    writer.close()
+                try:
+                    item = _queue.get(timeout=max(0.0, deadline - time.monotonic()))
+                except queue.Empty:
+                    break
+            try:
+                writer.flush()
+            except OSError:
+                logger.exception("Flushing the network tape failed")
+            if stop:
+                return
+    finally:
+        writer.close()
+
+
+def _ensure_writer() -> None:
+    global _thread
+    if _thread is None or not _thread.is_alive():
+        with _thread_lock:
+            if _thread is None or not _thread.is_alive():
+                _thread = threading.Thread(target=_run, name="tape-writer", daemon=True)
+                _thread.start()
+
+
+def record(state: dict) -> None:
+    """Queue the published snapshot (publish listener)."""
+    global _last_version
+    if not ENABLED or state["version"] == _last_version:
+        return
+    if shared_state.enabled() and shared_state.role() != "leader":
+        return  # adopted from the leader, which records it
+    _last_version = state["version"]
+    item = (
+        state["updated_at_epoch"],
+        state["version"],
+        state["tip_height"],
+        list(state["stale_parts"]),
+        {part: state[part] for part in PARTS},
+    )
+    _ensure_writer()
+    try:
+        _queue.put_nowait(item)
+    except queue.Full:
+        metrics.incr("tape.dropped")
+
+
+def close(timeout: float = 5.0) -> None:
+    """Write what is queued and close the current file (shutdown)."""
+    global _thread
+    thread = _thread
+    if thread is not None and thread.is_alive():
+        try:
+            _queue.put(_STOP, timeout=timeout)
+        except queue.Full:
+            logger.warning("Tape queue still full at shutdown")
+        thread.join(timeout)
+    _thread = None
+
+
+def _read_file(path: Path) -> Iterator[dict]:
+    values: list = []
+    previous: dict[str, object] = {}
+    with gzip.open(path, "rt", encoding="utf-8") as f:
+        try:
+            header = json.loads(f.readline())
+            if header.get("format") != TAPE_FORMAT or header.get("version") != TAPE_VERSION:
+                raise ValueError(f"{path} is not a v{TAPE_VERSION} tape")
+            for line in f:
+                if not line.endswith("\n"):
+                    break  # cut short mid-line
+                raw = json.loads(line)
+                if raw.get("k"):
+                    values.clear()
+                    previous.clear()
+                for part, encoded in raw["p"].items():
+                    if "r" in encoded:
+                        previous[part] = values[encoded["r"]]
+                        continue
+                    value = encoded["b"] if "b" in encoded else _apply(previous[part], encoded)
+                    values.append(value)
+                    previous[part] = value
+                yield {
+                    "epoch": raw["t"],
+                    "version": raw["v"],
+                    "tip_height": raw["h"],
+                    "stale_parts": raw.get("s", []),
+                    **{part: previous.get(part) for part in PARTS},
+                }
+        except EOFError:
+            pass  # the file still being written, or cut short by a crash
+
+
+def files(directory: Path = TAPE_DIR) -> list[Path]:
+    """Tape files, oldest first."""
+    return sorted(directory.glob("tape-*.jsonl.gz"), key=_file_start)
+
+
+def iter_snapshots(
+    since: float | None = None, until: float | None = None, directory: Path = TAPE_DIR
+) -> Iterator[dict]:
+    """Stream snapshots with since <= epoch < until, oldest first.
+
+    Only the files overlapping the range are decoded, one per writer chain at
+    a time. Unchanged parts are the same objects from one snapshot to the
+    next; treat them as read-only.
+    """
+    streams = []
+    for writer, chain in _chains(files(directory)).items():
+        selected = []
+        for path, following in itertools.zip_longest(chain, chain[1:]):
+            if until is not None and _file_start(path) >= until:
+                break
+            if since is not None and following is not None and _file_start(following) <= since:
+                continue
+            selected.append(path)
+        snapshots = itertools.chain.from_iterable(_read_range(path, since, until) for path in selected)
+        streams.append(zip(itertools.repeat(writer), snapshots))
+    previous_writer, previous = None, None
+    for writer, snapshot in heapq.merge(*streams, key=lambda item: item[1]["epoch"]):
+        if writer != previous_writer and previous is not None and _same_data(previous, snapshot):
+            continue  # another worker recorded the same upstream data
+        previous_writer, previous = writer, snapshot
+        yield snapshot
+
+
+def _read_range(path: Path, since: float | None, until: float | None) -> Iterator[dict]:
+    for snapshot in _read_file(path):
+        if since is not None and snapshot["epoch"] < since:
+            continue
+        if until is not None and snapshot["epoch"] >= until:
+            return
+        yield snapshot
+
+
+def _same_data(a: dict, b: dict) -> bool:
+    return (
+        a["tip_height"] == b["tip_height"]
+        and a["stale_parts"] == b["stale_parts"]
+        and all(a[part] == b[part] for part in PARTS)
+    )
+
+
+def downsample(snapshots: Iterable[dict], step: float) -> Iterator[dict]:
+    """The last snapshot of every `step`-second bucket."""
+    pending = None
+    for snapshot in snapshots:
+        if pending is not None and snapshot["epoch"] // step != pending["epoch"] // step:
+            yield pending
+        pending = snapshot
+    if pending is not None:
+        yield pending
+
+
+CSV_FIELDS = (
+    "timestamp",
+    "epoch",
+    "version",
+    "tip_height",
+    "fastest_fee",
+    "half_hour_fee",
+    "hour_fee",
+    "economy_fee",
+    "minimum_fee",
+    "mempool_tx_count",
+    "mempool_vsize",
+    "next_block_median_fee",
+    "next_block_min_fee",
+)
+
+
+def _csv_row(snapshot: dict) -> dict:
+    fee_data = snapshot["fee_data"] or {}
+    mempool = snapshot["mempool_data"] or {}
+    blocks = snapshot["mempool_blocks"] or [{}]
+    fee_range = blocks[0].get("feeRange") or [None]
+    return {
+        "timestamp": datetime.fromtimestamp(snapshot["epoch"], timezone.utc).isoformat(),
+        "epoch": snapshot["epoch"],
+        "version": snapshot["version"],
+        "tip_height": snapshot["tip_height"],
+        "fastest_fee": fee_data.get("fastestFee"),
+        "half_hour_fee": fee_data.get("halfHourFee"),
+        "hour_fee": fee_data.get("hourFee"),
+        "economy_fee": fee_data.get("economyFee"),
+        "minimum_fee": fee_data.get("minimumFee"),
+        "mempool_tx_count": mempool.get("count"),
+        "mempool_vsize": mempool.get("vsize"),
+        "next_block_median_fee": blocks[0].get("medianFee"),
+        "next_block_min_fee": min(fee_range) if fee_range[0] is not None else None,
+    }
+
+
+def export(out: Path, snapshots: Iterable[dict]) -> int:
+    """Write snapshots as CSV scalars (`.csv`) or full JSON lines (`.jsonl`, `.jsonl.gz`)."""
+    count = 0
+    if out.suffix == ".csv":
+        with out.open("w", newline="", encoding="utf-8") as f:
+            writer = csv.DictWriter(f, fieldnames=CSV_FIELDS)
+            writer.writeheader()
+            for snapshot in snapshots:
+                writer.writerow(_csv_row(snapshot))
+                count += 1
+        return count
+    opener = gzip.open if out.suffix == ".gz" else open
+    with opener(out, "wt", encoding="utf-8") as f:
+        for snapshot in snapshots:
+            f.write(json.dumps(snapshot, separators=(",", ":")) + "\n")
+            count += 1
+    return count
+
+
+def parse_time(value: str) -> float:
+    try:
+        return float(value)
+    except ValueError:
+        parsed = datetime.fromisoformat(value)
+        if parsed.tzinfo is None:
+            parsed = parsed.replace(tzinfo=timezone.utc)
+        return parsed.timestamp()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(prog="python -m backend.tape")
+    parser.add_argument("--dir", type=Path, default=TAPE_DIR)
+    sub = parser.add_subparsers(dest="command", required=True)
+    exp = sub.add_parser("export", help="export a time range, optionally downsampled")
+    exp.add_argument("--since", type=parse_time, help="ISO time or epoch")
+    exp.add_argument("--until", type=parse_time, help="ISO time or epoch")
+    exp.add_argument("--step", type=float, default=0.0, help="seconds per sample (0 keeps every version)")
+    exp.add_argument("--out", type=Path, required=True, help=".csv, .jsonl or .jsonl.gz")
+    sub.add_parser("info", help="list tape files")
+    args = parser.parse_args()
+
+    if args.command == "export":
+        snapshots = iter_snapshots(args.since, args.until, args.dir)
+        if args.step > 0:
+            snapshots = downsample(snapshots, args.step)
+        print(f"Exported {export(args.out, snapshots)} snapshots to {args.out}")
+    elif args.command == "info":
+        for path in files(args.dir):
+            count = sum(1 for _ in _read_file(path))
+            start = datetime.fromtimestamp(_file_start(path), timezone.utc).isoformat()
+            print(f"{path.name}  {start}  {count} versions  {path.stat().st_size} bytes")
+
+
+atexit.register(close)
+on_publish(record)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,230 @@
+"""Multiple upstream sources with hedged requests and circuit breakers.
+
+Sources are tried in configured order. If the first has not answered within
+its recent latency percentile, the request is also sent to the next healthy
+source, and so on; the first good answer wins and the rest are cancelled.
+Each source has a circuit breaker that stops traffic to a failing host and
+lets a single probe through after a cooldown.
+"""
+
+import asyncio
+import os
+import threading
+import time
+from collections import deque
+from typing import Callable
+from urllib.parse import urlsplit
+
+import httpx
+
+from . import http_client, metrics
+from .ratelimit import RateLimiter
+
+BREAKER_FAILURES = int(os.getenv("MEMPOOL_BREAKER_FAILURES", "3"))
+BREAKER_COOLDOWN_SECONDS = float(os.getenv("MEMPOOL_BREAKER_COOLDOWN", "30"))
+HEDGE_PERCENTILE = float(os.getenv("MEMPOOL_HEDGE_PERCENTILE", "0.9"))
+# Used until a source has enough latency samples for a percentile.
+HEDGE_DEFAULT_DELAY = float(os.getenv("MEMPOOL_HEDGE_DELAY", "0.5"))
+HEDGE_MIN_SAMPLES = 10
+
+# Esplora has no projected mempool blocks; fees come from /fee-estimates.
+_ESPLORA_PATHS = {
+    "/v1/fees/recommended": "/fee-estimates",
+    "/mempool": "/mempool",
+    "/blocks": "/blocks",
+    "/blocks/tip/height": "/blocks/tip/height",
+}
+
+
+class UpstreamUnavailable(Exception):
+    """No source can serve the endpoint (unsupported or all breakers open)."""
+
+
+class CircuitBreaker:
+    """closed -> open after N consecutive failures -> half-open probe after cooldown."""
+
+    def __init__(self, failures: int = BREAKER_FAILURES, cooldown: float = BREAKER_COOLDOWN_SECONDS):
+        self.failure_threshold = failures
+        self.cooldown = cooldown
+        self.state = "closed"
+        self._failures = 0
+        self._opened_at = 0.0
+        self._probing = False
+        self._lock = threading.Lock()
+
+    def allow(self) -> bool:
+        with self._lock:
+            if self.state == "closed":
+                return True
+            if self.state == "open" and time.monotonic() - self._opened_at >= self.cooldown:
+                self.state = "half_open"
+            if self.state == "half_open" and not self._probing:
+                self._probing = True
+                return True
+            return False
+
+    def record_success(self) -> None:
+        with self._lock:
+            self.state = "closed"
+            self._failures = 0
+            self._probing = False
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self._failures += 1
+            self._probing = False
+            if self.state == "half_open" or self._failures >= self.failure_threshold:
+                self.state = "open"
+                self._opened_at = time.monotonic()
+
+    def release(self) -> None:
+        """Give back a probe slot whose request was cancelled."""
+        with self._lock:
+            self._probing = False
+
+
+class Source:
+    def __init__(self, kind: str, base_url: str, name: str | None = None):
+        self.kind = kind
+        self.base_url = base_url.rstrip("/")
+        # Two sources on one host (e.g. different API prefixes) stay distinct.
+        self.name = name or self.base_url
+        # Rate limits apply per host, whatever the source is called.
+        self.host = urlsplit(self.base_url).netloc or self.base_url
+        self.breaker = CircuitBreaker()
+        self._latencies: deque[float] = deque(maxlen=100)
+
+    def path(self, endpoint: str) -> str | None:
+        if self.kind == "esplora":
+            return _ESPLORA_PATHS.get(endpoint)
+        return endpoint
+
+    def hedge_delay(self) -> float:
+        if len(self._latencies) < HEDGE_MIN_SAMPLES:
+            return HEDGE_DEFAULT_DELAY
+        ordered = sorted(self._latencies)
+        return ordered[min(len(ordered) - 1, int(len(ordered) * HEDGE_PERCENTILE))]
+
+    def record_latency(self, seconds: float) -> None:
+        self._latencies.append(seconds)
+
+    def decode(self, endpoint: str, response: httpx.Response):
+        """Parse a response body into the mempool.space shape for `endpoint`."""
+        data = response.json()
+        if self.kind == "esplora" and endpoint == "/v1/fees/recommended":
+            return _esplora_fees(data)
+        return data
+
+
+def _esplora_fees(estimates: dict) -> dict:
+    # Esplora maps confirmation target (blocks) -> sat/vB.
+    by_target = {int(k): float(v) for k, v in estimates.items()}
+
+    def at(target: int) -> float:
+        eligible = [fee for blocks, fee in by_target.items() if blocks <= target]
+        return round(min(eligible), 3) if eligible else 1.0
+
+    return {
+        "fastestFee": at(1),
+        "halfHourFee": at(3),
+        "hourFee": at(6),
+        "economyFee": at(144),
+        "minimumFee": round(min(by_target.values()), 3) if by_target else 1.0,
+    }
+
+
+def parse_sources(spec: str, default_url: str) -> list[Source]:
+    """Parse `[name:]kind=url,...`; a bare url is treated as a mempool source."""
+    sources = []
+    for item in filter(None, (part.strip() for part in spec.split(","))):
+        label, sep, url = item.partition("=")
+        if not sep:
+            sources.append(Source("mempool", item))
+            continue
+        name, _, kind = label.rpartition(":")
+        sources.append(Source(kind.strip(), url.strip(), name.strip() or None))
+    return sources or [Source("mempool", default_url)]
+
+
+def _is_source_failure(exc: Exception) -> bool:
+    """Transport errors, 5xx and 429 count toward the breaker; other 4xx mean the host is up."""
+    if isinstance(exc, httpx.HTTPStatusError):
+        status = exc.response.status_code
+        return status >= 500 or status == 429
+    return True
+
+
+class Upstream:
+    def __init__(self, sources: list[Source], limiter: RateLimiter):
+        self.sources = sources
+        self.limiter = limiter
+
+    async def _attempt(
+        self, source: Source, endpoint: str, timeout: float, headers: dict | None
+    ) -> httpx.Response:
+        path = source.path(endpoint)
+        await self.limiter.acquire_async(source.host, path)
+        started = time.monotonic()
+        try:
+            response = await http_client.get(f"{source.base_url}{path}", timeout=timeout, headers=headers)
+            if response.status_code != 304:
+                response.raise_for_status()
+        except asyncio.CancelledError:
+            source.breaker.release()
+            raise
+        except (httpx.HTTPError, ValueError) as exc:
+            if _is_source_failure(exc):
+                source.breaker.record_failure()
+            else:
+                source.breaker.record_success()
+            metrics.set_gauge(f"upstream.breaker_open.{source.name}", int(source.breaker.state != "closed"))
+            raise
+        source.record_latency(time.monotonic() - started)
+        source.breaker.record_success()
+        metrics.set_gauge(f"upstream.breaker_open.{source.name}", 0)
+        return response
+
+    async def get(
+        self,
+        endpoint: str,
+        timeout: float,
+        headers_for: Callable[[Source], dict | None] = lambda source: None,
+    ) -> tuple[httpx.Response, Source]:
+        """Hedged GET of `endpoint`; returns the first good response and its source."""
+        candidates = [source for source in self.sources if source.path(endpoint) is not None]
+        if not candidates:
+            raise UpstreamUnavailable(f"No source supports {endpoint}")
+
+        running: dict[asyncio.Task, Source] = {}
+        last_exception: Exception | None = None
+        try:
+            while True:
+                launched = False
+                while candidates:
+                    source = candidates.pop(0)
+                    if source.breaker.allow():
+                        task = asyncio.create_task(self._attempt(source, endpoint, timeout, headers_for(source)))
+                        running[task] = source
+                        launched = True
+                        if len(running) > 1:
+                            metrics.incr("upstream.hedged")
+                        break
+                if not running:
+                    if last_exception:
+                        raise last_exception
+                    raise UpstreamUnavailable(f"All sources for {endpoint} are unavailable")
+
+                # Hedge after the newest attempt's latency percentile, unless
+                # nothing is left to hedge with.
+                newest = list(running.values())[-1]
+                wait_for = newest.hedge_delay() if launched and candidates else None
+                done, _ = await asyncio.wait(running, timeout=wait_for, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    source = running.pop(task)
+                    if task.exception() is None:
+                        metrics.incr(f"upstream.wins.{source.name}")
+                        return task.result(), source
+                    last_exception = task.exception()
+        finally:
+            for task in running:
+                task.cancel()
@@ -192,24 +192,27 @@ async function handleCompare() {
     const explain = els.explainModeCompare.value;
     const explainParam = explain ? `?explain=${explain}` : "";
     const data = await fetchJson(`/compare${explainParam}`);
-    renderCompareVerdict(data.verdict_title, data.verdict_text);
-    renderCompareSummary(
-      data.overpay_percent_fast_vs_medium,
-      data.overpay_delta_fast_vs_medium_sat_vb,
-      data.note
-    );
-    renderRecommendation(appendCompareCard("fast"), "Fast", data.fast);
-    renderRecommendation(appendCompareCard("medium"), "Medium", data.medium);
-    renderRecommendation(appendCompareCard("slow"), "Slow", data.slow);
-    
-    // İşlem bitince emin olmak için tekrar görünür yapıyoruz (gerekli değil ama güvenli)
-    els.compareResult.classList.remove("hidden");
+    renderCompare(data);
     setCompareStatus("Done");
   } catch (err) {
     setCompareStatus(err.message, true);
   }
 }
 
+function renderCompare(data) {
+  renderCompareVerdict(data.verdict_title, data.verdict_text);
+  renderCompareSummary(
+    data.overpay_percent_fast_vs_medium,
+    data.overpay_delta_fast_vs_medium_sat_vb,
+    data.note
+  );
+  els.compareGrid.innerHTML = "";
+  renderRecommendation(appendCompareCard("fast"), "Fast", data.fast);
+  renderRecommendation(appendCompareCard("medium"), "Medium", data.medium);
+  renderRecommendation(appendCompareCard("slow"), "Slow", data.slow);
+  els.compareResult.classList.remove("hidden");
+}
+
 function appendCompareCard() {
   const card = document.createElement("div");
   card.className = "compare-card";
@@ -328,30 +331,67 @@ async function handleEstimate() {
   }
 }
 
+function renderLive(data) {
+  els.liveUpdated.textContent = data.updated_at_epoch
+    ? new Date(data.updated_at_epoch * 1000).toLocaleTimeString()
+    : "-";
+  const mempoolCount = data.mempool_data?.count ?? 0;
+  els.liveMempool.textContent = mempoolCount.toLocaleString();
+  els.liveFast.textContent = data.fee_data?.fastestFee ?? "-";
+  els.liveNormal.textContent = data.fee_data?.halfHourFee ?? "-";
+  els.liveCache.classList.toggle("hidden", !data.cache_used);
+  els.liveError.classList.toggle("hidden", !data.error);
+  els.liveError.textContent = data.error || "";
+  if (data.network_state) {
+    els.liveState.textContent = data.network_state;
+    els.liveState.className = `badge badge-${data.network_state}`;
+  }
+  els.liveNote.textContent = data.network_note || "";
+}
+
 async function pollLive() {
   try {
-    const data = await fetchJson("/live/status");
-    els.liveUpdated.textContent = data.updated_at_epoch
-      ? new Date(data.updated_at_epoch * 1000).toLocaleTimeString()
-      : "-";
-    const mempoolCount = data.mempool_data?.count ?? 0;
-    els.liveMempool.textContent = mempoolCount.toLocaleString();
-    els.liveFast.textContent = data.fee_data?.fastestFee ?? "-";
-    els.liveNormal.textContent = data.fee_data?.halfHourFee ?? "-";
-    els.liveCache.classList.toggle("hidden", !data.cache_used);
-    els.liveError.classList.toggle("hidden", !data.error);
-    els.liveError.textContent = data.error || "";
-    if (data.network_state) {
-      els.liveState.textContent = data.network_state;
-      els.liveState.className = `badge badge-${data.network_state}`;
-    }
-    els.liveNote.textContent = data.network_note || "";
+    renderLive(await fetchJson("/live/status"));
   } catch (err) {
     els.liveError.textContent = err.message;
     els.liveError.classList.remove("hidden");
   }
 }
 
+let pollTimer = null;
+
+function startPolling() {
+  if (pollTimer) return;
+  pollLive();
+  pollTimer = setInterval(pollLive, 3000);
+}
+
+function stopPolling() {
+  if (!pollTimer) return;
+  clearInterval(pollTimer);
+  pollTimer = null;
+}
+
+// Push updates from /live/stream (one event per snapshot version); poll
+// /live/status only while the stream is unavailable.
+function startLiveStream() {
+  if (!window.EventSource) {
+    startPolling();
+    return;
+  }
+  const source = new EventSource(`${API_BASE}/live/stream`);
+  source.addEventListener("snapshot", (event) => {
+    stopPolling();
+    const data = JSON.parse(event.data);
+    renderLive(data.status);
+    if (activateTab.compareLoadedOnce && els.explainModeCompare.value !== "llm") {
+      renderCompare(data.compare);
+    }
+  });
+  // EventSource reconnects by itself; keep the panel fresh meanwhile.
+  source.addEventListener("error", startPolling);
+}
+
 function activateTab(id) {
   els.tabs.forEach((t) => t.classList.toggle("active", t.dataset.tab === id));
   els.tabPanels.forEach((p) => p.classList.toggle("hidden", p.id !== `tab-${id}`));
@@ -417,8 +457,7 @@ function init() {
   setStatus("Ready");
   // Preload miner targets once so tab is not empty on first view.
   loadMinerTargets();
-  pollLive();
-  setInterval(pollLive, 3000);
+  startLiveStream();
 }
 
 document.addEventListener("DOMContentLoaded", init);
@@ -0,0 +1,17 @@
+"""Point every on-disk path at a temporary directory before the app modules load."""
+
+import os
+import tempfile
+from pathlib import Path
+
+DATA_DIR = Path(tempfile.mkdtemp(prefix="btc-fee-agent-tests-"))
+os.environ["HISTORY_STORE_DIR"] = str(DATA_DIR / "history")
+os.environ["NETWORK_TAPE_DIR"] = str(DATA_DIR / "tape")
+os.environ["MEMPOOL_SHARED_STATE_PATH"] = str(DATA_DIR / "shared_state.mmap")
+
+from backend import cache_store, history_store, state_snapshot  # noqa: E402
+
+cache_store.CACHE_PATH = DATA_DIR / "cache.json"
+state_snapshot.SNAPSHOT_PATH = DATA_DIR / "state.bin"
+history_store.LEGACY_STORE_PATH = DATA_DIR / "history.bin"
+history_store.CSV_PATH = DATA_DIR / "history.csv"
@@ -0,0 +1,40 @@
+import json
+
+import pytest
+
+from backend import cache_store
+
+
+@pytest.fixture
+def cache(tmp_path, monkeypatch):
+    monkeypatch.setattr(cache_store, "CACHE_PATH", tmp_path / "cache.json")
+    monkeypatch.setattr(cache_store, "FLUSH_DELAY", 3600.0)  # flush explicitly
+    monkeypatch.setattr(cache_store, "_entries", {})
+    monkeypatch.setattr(cache_store, "_dirty", False)
+    monkeypatch.setattr(cache_store, "_flush_timer", None)
+    yield tmp_path
+    if cache_store._flush_timer is not None:
+        cache_store._flush_timer.cancel()
+
+
+def test_flush_writes_snapshot(cache):
+    cache_store.put("fees", {"fastestFee": 12})
+    cache_store.flush()
+    raw = json.loads((cache / "cache.json").read_text())
+    assert raw["entries"]["fees"]["value"] == {"fastestFee": 12}
+    assert not cache_store._dirty
+
+
+def test_failed_flush_keeps_the_update(cache, monkeypatch):
+    blocked = cache / "blocked"
+    blocked.write_text("not a directory")
+    monkeypatch.setattr(cache_store, "CACHE_PATH", blocked / "cache.json")
+    cache_store.put("fees", {"fastestFee": 12})
+    cache_store.flush()
+    assert cache_store._dirty
+    assert cache_store._flush_timer is not None  # a retry is scheduled
+
+    monkeypatch.setattr(cache_store, "CACHE_PATH", cache / "cache.json")
+    cache_store.flush()
+    assert json.loads((cache / "cache.json").read_text())["entries"]["fees"]["value"] == {"fastestFee": 12}
+    assert not cache_store._dirty
@@ -0,0 +1,43 @@
+import random
+
+import pytest
+from fastapi.testclient import TestClient
+
+from backend import main, refresh
+from backend.agent import ESTIMATE_CLASSES, estimate_batch, estimate_fee
+
+FEES = {"fastestFee": 12, "halfHourFee": 8, "hourFee": 5, "economyFee": 3, "minimumFee": 1}
+
+
+# One mempool count per congestion band (low / medium / high) plus both edges.
+@pytest.mark.parametrize("count", [30_000, 50_000, 80_000, 137_500, 200_000, 250_000])
+def test_batch_matches_estimate_fee(count):
+    rng = random.Random(count)
+    fees = [round(rng.uniform(0.1, 40), rng.choice([0, 1, 2, 3])) for _ in range(2000)]
+    fees += [7.475, 0.1, 1, 3, 5, 8, 12]  # thresholds and a known half-way case
+    mempool = {"count": count}
+    batch = estimate_batch(fees, FEES, mempool)
+    for i, fee in enumerate(fees):
+        rec = estimate_fee(fee, FEES, mempool)
+        assert batch["recommended_fee_sat_vb"][i] == rec.recommended_fee_sat_vb, fee
+        assert ESTIMATE_CLASSES[batch["class_code"][i]]["priority"] == rec.priority, fee
+        assert (batch["eta_blocks_min"][i], batch["eta_blocks_max"][i]) == (rec.eta_blocks_min, rec.eta_blocks_max)
+        assert batch["confidence"] == rec.confidence
+
+
+def test_batch_endpoint_returns_every_eta_percentile():
+    parts = {
+        "fee_data": FEES,
+        "mempool_data": {"count": 90000, "vsize": 50_000_000, "fee_histogram": [[20, 500_000], [4, 2_000_000]]},
+        "mempool_blocks": [],
+        "tip_height": 850000,
+    }
+    refresh.publish(parts, [], {}, {name: repr(value) for name, value in parts.items()})
+    fees = [1.0, 5.0, 25.0]
+    body = TestClient(main.app).post("/estimate/batch", json={"fees": fees}).json()
+    for i, fee in enumerate(fees):
+        single = TestClient(main.app).get("/estimate", params={"fee": fee}).json()
+        assert body["recommended_fee_sat_vb"][i] == single["recommended_fee_sat_vb"]
+        assert body["projected_block"][i] == single["projected_block"]
+        for p in ("p10", "p50", "p90"):
+            assert body[f"eta_minutes_{p}"][i] == single[f"eta_minutes_{p}"]
@@ -0,0 +1,142 @@
+import math
+
+import numpy as np
+import pytest
+
+from backend import history_rollup as rollup
+from backend import history_store as hs
+
+
+@pytest.fixture
+def fresh(tmp_path, monkeypatch):
+    monkeypatch.setattr(rollup, "_buckets", {name: {} for name in rollup.RESOLUTIONS})
+    monkeypatch.setattr(rollup, "_watermark", 0)
+    monkeypatch.setattr(rollup, "_newest", 0.0)
+    monkeypatch.setattr(rollup, "_loaded", False)
+    monkeypatch.setattr(rollup, "_last_save", 0.0)
+    monkeypatch.setattr(rollup, "ROLLUP_PATH", tmp_path / "rollup.json")
+    monkeypatch.setattr(rollup, "RETENTION_SECONDS", {name: None for name in rollup.RESOLUTIONS})
+    store = hs.SegmentedStore(tmp_path / "history")
+    monkeypatch.setattr(hs, "store", lambda: store)
+    return store
+
+
+def _records(n: int, seed: int = 5) -> np.ndarray:
+    rng = np.random.default_rng(seed)
+    records = np.zeros(n, dtype=hs.RECORD_DTYPE)
+    records["epoch"] = 1_800_000_000 + np.sort(rng.uniform(0, 3 * 86400, n))
+    records["epoch"][::40] -= 400  # late rows
+    equal = records["epoch"][1::97]
+    records["epoch"][1::97] = records["epoch"][::97][: len(equal)]  # equal timestamps
+    records["recommended_fee"] = rng.integers(1, 200, n) / 4
+    records["recommended_fee"][::53] = np.nan
+    records["priority"] = rng.integers(0, 4, n)
+    records["mempool_tx_count"] = rng.integers(1000, 300_000, n)
+    return records
+
+
+def _brute(records: np.ndarray, width: int) -> dict:
+    buckets: dict[tuple[int, float], list] = {}
+    for record in records:
+        fee = float(record["recommended_fee"])
+        if math.isnan(fee):
+            continue
+        epoch = float(record["epoch"])
+        key = (int(record["priority"]), math.floor(epoch / width) * width)
+        bucket = buckets.setdefault(key, [0, math.inf, -math.inf, 0.0, -math.inf, None, 0.0])
+        bucket[0] += 1
+        bucket[1] = min(bucket[1], fee)
+        bucket[2] = max(bucket[2], fee)
+        bucket[3] += fee
+        if epoch >= bucket[4]:
+            bucket[4], bucket[5] = epoch, fee
+        bucket[6] += float(record["mempool_tx_count"])
+    return buckets
+
+
+def _assert_matches(records: np.ndarray) -> None:
+    for name, width in rollup.RESOLUTIONS.items():
+        expected = _brute(records, width)
+        got = rollup._buckets[name]
+        assert set(got) == set(expected), name
+        for key, values in expected.items():
+            assert got[key][:3] == values[:3]
+            assert got[key][rollup.SUM] == pytest.approx(values[3])
+            assert got[key][rollup.LAST_EPOCH:rollup.LAST + 1] == values[4:6]
+            assert got[key][rollup.MEMPOOL_SUM] == pytest.approx(values[6])
+
+
+def test_fold_matches_brute_force(fresh):
+    records = _records(5000)
+    rng = np.random.default_rng(9)
+    cuts = np.sort(rng.choice(np.arange(1, len(records)), 12, replace=False))
+    for chunk in np.split(records, cuts):
+        rollup._fold(chunk)
+    _assert_matches(records)
+
+
+def test_update_folds_each_stored_row_once(fresh):
+    records = _records(3000)
+    for chunk in np.array_split(records, 5):
+        fresh.append(chunk)
+        rollup.update()
+    assert rollup.update() == 0
+    assert rollup._watermark == len(records)
+    _assert_matches(records)
+
+
+def test_saved_rollups_reload(fresh, monkeypatch):
+    records = _records(1000)
+    fresh.append(records)
+    rollup.update()
+    rollup.save()
+    before = {name: dict(buckets) for name, buckets in rollup._buckets.items()}
+
+    monkeypatch.setattr(rollup, "_buckets", {name: {} for name in rollup.RESOLUTIONS})
+    monkeypatch.setattr(rollup, "_watermark", 0)
+    monkeypatch.setattr(rollup, "_loaded", False)
+    assert rollup.update() == 0  # nothing new past the saved watermark
+    assert rollup._buckets == before
+
+
+def test_summary_and_buckets_read_the_rollups(fresh):
+    records = _records(2000)
+    fresh.append(records)
+    rollup.update()
+    window = 3600
+    # Whole minute buckets that overlap the window count.
+    minute_start = np.floor((records["epoch"].max() - window) / 60) * 60
+    recent = records[(records["epoch"] >= minute_start) & ~np.isnan(records["recommended_fee"])]
+    summary = rollup.summary(window)
+    for code, name in enumerate(hs.PRIORITY_NAMES[:4]):
+        fees = recent["recommended_fee"][recent["priority"] == code]
+        assert summary[name]["count"] == len(fees)
+        assert summary[name]["mean"] == pytest.approx(fees.mean(), abs=1e-4)
+
+    days = rollup.buckets("day", priority="fast")
+    assert sum(row["count"] for row in days) == int(
+        ((records["priority"] == 0) & ~np.isnan(records["recommended_fee"])).sum()
+    )
+    assert [row["epoch"] for row in days] == sorted(row["epoch"] for row in days)
+
+
+def test_readers_do_not_fold(fresh):
+    records = _records(600)
+    fresh.append(records[:300])
+    rollup.update()
+    before = rollup.buckets("day")
+    fresh.append(records[300:])
+    assert rollup.buckets("day") == before  # folding is the writer's and the timer's job
+    rollup.update()
+    assert sum(row["count"] for row in rollup.buckets("day")) > sum(row["count"] for row in before)
+
+
+def test_only_the_leader_writes_the_file(fresh, monkeypatch):
+    fresh.append(_records(100))
+    monkeypatch.setattr(rollup.shared_state, "role", lambda: "follower")
+    rollup.update()
+    rollup.save()
+    assert not rollup.ROLLUP_PATH.exists()
+    monkeypatch.setattr(rollup.shared_state, "role", lambda: "leader")
+    rollup.save()
+    assert rollup.ROLLUP_PATH.exists()
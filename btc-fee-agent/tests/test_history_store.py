@@ -0,0 +1,172 @@
+import json
+import random
+import time
+from pathlib import Path
+
+import numpy as np
+import pytest
+
+from backend import history_store as hs
+
+DAY = 86400
+
+
+@pytest.fixture
+def make_store(tmp_path, monkeypatch):
+    monkeypatch.setattr(hs, "SEGMENT_SECONDS", 3600.0)
+    monkeypatch.setattr(hs, "COMPACT_AFTER_DAYS", 1.0)
+    monkeypatch.setattr(hs, "COMPACT_SPAN_DAYS", 0.25)
+    monkeypatch.setattr(hs, "RETENTION_DAYS", 0.0)
+    monkeypatch.setattr(hs, "MAX_BYTES", 0)
+    opened = []
+
+    def make():
+        opened.append(hs.SegmentedStore(tmp_path))
+        return opened[-1]
+
+    return make
+
+
+def _records(n: int, start: float, span: float) -> np.ndarray:
+    rng = np.random.default_rng(1)
+    epochs = np.sort(start + rng.uniform(0, span, n))
+    epochs[::50] -= 200  # late rows land in the segment that is open
+    records = np.zeros(n, dtype=hs.RECORD_DTYPE)
+    records["epoch"] = epochs
+    records["recommended_fee"] = np.arange(n)
+    records["priority"] = rng.integers(0, 4, n)
+    return records
+
+
+def _fill(store, records: np.ndarray, batch: int = 700) -> None:
+    for i in range(0, len(records), batch):
+        store.append(records[i : i + batch])
+
+
+def test_append_query_iter_across_seal_and_compaction(make_store):
+    start = time.time() - 3 * DAY
+    records = _records(8000, start, 3 * DAY)
+    store = make_store()
+    _fill(store, records)
+
+    assert len(store._sealed) > 1
+    assert any(entry["codec"] == hs.COLD_CODEC for entry in store._sealed)  # compacted
+    assert store.count() == len(records)
+    assert (store.read(0)["recommended_fee"] == records["recommended_fee"]).all()
+    assert (store.tail(50)["recommended_fee"] == records["recommended_fee"][-50:]).all()
+
+    rng = random.Random(3)
+    for _ in range(60):
+        since = rng.choice([None, start + rng.uniform(0, 3 * DAY)])
+        until = rng.choice([None, start + rng.uniform(0, 3 * DAY)])
+        priority = rng.choice([None, "fast", "slow"])
+        mask = np.ones(len(records), bool)
+        if since is not None:
+            mask &= records["epoch"] >= since
+        if until is not None:
+            mask &= records["epoch"] < until
+        if priority is not None:
+            mask &= records["priority"] == hs.PRIORITY_CODES[priority]
+        got, cursor = [], None
+        while True:
+            page, cursor = store.query(since, until, priority, rng.choice([7, 500]), cursor)
+            got = page["recommended_fee"].astype(int).tolist() + got
+            if cursor is None:
+                break
+        assert got == np.flatnonzero(mask).tolist()
+
+    position, chunks = 123, []
+    for at, chunk in store.iter_from(123, 1000):
+        assert at == position
+        position += len(chunk)
+        chunks.append(chunk)
+    assert (np.concatenate(chunks)["recommended_fee"] == records["recommended_fee"][123:]).all()
+
+    # Another process sees the same rows through the manifest.
+    assert (make_store().read(0)["recommended_fee"] == records["recommended_fee"]).all()
+
+
+def test_retention_drops_old_segments(make_store, monkeypatch):
+    records = _records(3000, time.time() - 3 * DAY, 3 * DAY)
+    store = make_store()
+    _fill(store, records)
+    monkeypatch.setattr(hs, "RETENTION_DAYS", 2.0)
+    store.maintain()
+    first = store._sealed[0]["base"]
+    assert first > 0
+    assert store.count() == len(records)
+    assert make_store().read(0)["recommended_fee"][0] == first
+    assert [at for at, _ in store.iter_from(0, 10_000)][0] == first
+
+
+def test_sealed_files_are_removed(make_store, tmp_path):
+    records = _records(2000, time.time() - 12 * 3600, 12 * 3600)
+    store = make_store()
+    _fill(store, records)
+    manifest = json.loads((tmp_path / "manifest.json").read_text())
+    listed = {entry["file"] for entry in manifest["sealed"]} | {manifest["active"]["file"]}
+    on_disk = {path.name for path in tmp_path.iterdir() if not path.name.startswith(".")} - {"manifest.json"}
+    assert on_disk == listed
+
+
+def test_undeletable_file_is_retried(make_store, tmp_path, monkeypatch):
+    hour = (time.time() // 3600 - 3) * 3600  # whole windows: exactly one seal below
+    store = make_store()
+    store.append(_records(100, hour + 300, 600))
+
+    unlink = Path.unlink
+
+    def locked(path, *args, **kwargs):
+        raise PermissionError("in use")
+
+    monkeypatch.setattr(Path, "unlink", locked)
+    store.append(_records(100, hour + 3600 + 300, 600))  # seals the first window
+    stuck = json.loads((tmp_path / "manifest.json").read_text())["garbage"]
+    assert len(stuck) == 1 and (tmp_path / stuck[0]).exists()
+    assert store.count() == 200
+
+    monkeypatch.setattr(Path, "unlink", unlink)
+    store.maintain()
+    assert not (tmp_path / stuck[0]).exists()
+    assert json.loads((tmp_path / "manifest.json").read_text())["garbage"] == []
+    assert store.read(0)["recommended_fee"].tolist() == list(range(100)) * 2
+
+
+def test_csv_import_closes_the_staging_store_before_the_rename(tmp_path, monkeypatch):
+    csv_path = tmp_path / "history.csv"
+    csv_path.write_text(
+        "timestamp,priority,base_fee_sat_vb,mempool_tx_count,recommended_fee_sat_vb\n"
+        "2024-01-01T00:00:00+00:00,fast,5,1000,6.5\n"
+        "2024-01-01T00:01:00+00:00,slow,2,1000,2.5\n"
+    )
+    monkeypatch.setattr(hs, "CSV_PATH", csv_path)
+    monkeypatch.setattr(hs, "LEGACY_STORE_PATH", tmp_path / "missing.bin")
+    closed = []
+    close = hs.HistoryStore.close
+
+    def tracking_close(store):
+        closed.append(store.path)
+        close(store)
+
+    replace = hs.os.replace
+
+    def checked_replace(src, dst):
+        assert Path(src) in closed  # still mapped otherwise
+        replace(src, dst)
+
+    monkeypatch.setattr(hs.HistoryStore, "close", tracking_close)
+    monkeypatch.setattr(hs.os, "replace", checked_replace)
+    store = hs.SegmentedStore(tmp_path / "store")
+    store.migrate()
+    assert store.tail(10)["recommended_fee"].tolist() == [6.5, 2.5]
+    assert not [path for path in (tmp_path / "store").iterdir() if path.name.endswith(".import")]
+
+
+def test_read_recent_serves_queued_rows_for_any_limit(monkeypatch):
+    from backend import history
+
+    monkeypatch.setattr(history, "FLUSH_SECONDS", 30.0)  # only a flush commits the batch
+    for limit in (1, history.RECENT_ROWS + 1):
+        marker = random.random()
+        history.append_history([{"priority": "fast", "recommended_fee_sat_vb": marker}])
+        assert history.read_recent(limit)[-1]["recommended_fee_sat_vb"] == marker
@@ -0,0 +1,77 @@
+import time
+
+import pytest
+from fastapi.testclient import TestClient
+
+from backend import main, refresh, state_snapshot
+
+FEES = {"fastestFee": 12, "halfHourFee": 8, "hourFee": 5, "economyFee": 3, "minimumFee": 1}
+MEMPOOL = {"count": 90000, "vsize": 50_000_000, "total_fee": 1, "fee_histogram": [[10, 1_500_000], [1, 20_000_000]]}
+
+
+@pytest.fixture(scope="module")
+def client():
+    # No lifespan: the scheduler stays off and the published snapshot is all there is.
+    parts = {"fee_data": FEES, "mempool_data": MEMPOOL, "mempool_blocks": None, "tip_height": 850000}
+    refresh.publish(parts, [], {}, {name: repr(value) for name, value in parts.items()})
+    return TestClient(main.app)
+
+
+def test_recommend_etag_round_trip(client):
+    first = client.get("/recommend", params={"priority": "fast"})
+    assert first.status_code == 200
+    etag = first.headers["etag"]
+    assert first.headers["cache-control"].startswith("public, max-age=")
+
+    again = client.get("/recommend", params={"priority": "fast"}, headers={"If-None-Match": etag})
+    assert again.status_code == 304
+    assert again.content == b""
+    assert again.headers["etag"] == etag
+
+    other = client.get("/recommend", params={"priority": "slow"}, headers={"If-None-Match": etag})
+    assert other.status_code == 200
+    assert other.headers["etag"] != etag
+
+
+def test_new_version_changes_etag(client):
+    etag = client.get("/recommend").headers["etag"]
+    parts = {"fee_data": dict(FEES, fastestFee=20), "mempool_data": MEMPOOL, "mempool_blocks": None, "tip_height": 850001}
+    refresh.publish(parts, [], {}, {name: repr(value) for name, value in parts.items()})
+    response = client.get("/recommend", headers={"If-None-Match": etag})
+    assert response.status_code == 200
+    assert response.headers["etag"] != etag
+
+
+def test_max_age_without_scheduler_uses_configured_interval(monkeypatch):
+    now = time.time()
+    monkeypatch.setitem(refresh.LATEST_STATE, "fresh_until_epoch", None)
+    monkeypatch.setitem(refresh.LATEST_STATE, "checked_at_epoch", now - 3)
+    monkeypatch.setattr(main.scheduler, "BASE_INTERVAL", 10.0)
+    assert main._fresh_until(now) == pytest.approx(now + 7)
+    # A follower's copy may be behind: roll forward by whole intervals.
+    monkeypatch.setitem(refresh.LATEST_STATE, "fresh_until_epoch", now - 25)
+    assert main._fresh_until(now) == pytest.approx(now + 5)
+    monkeypatch.setitem(refresh.LATEST_STATE, "fresh_until_epoch", now + 4)
+    assert main._fresh_until(now) == now + 4
+
+
+def test_restored_snapshot_gets_a_new_etag(client):
+    first = client.get("/recommend")
+    etag = first.headers["etag"]
+    state_snapshot.save(refresh.LATEST_STATE)
+    assert refresh.restore_snapshot()  # same version, now marked stale
+    restored = client.get("/recommend", headers={"If-None-Match": etag})
+    assert refresh.LATEST_STATE["restored_from_snapshot"]
+    assert restored.status_code == 200
+    assert restored.headers["etag"] != etag
+    assert restored.headers["etag"].split("-")[0] == etag.split("-")[0]  # same version number
+    assert restored.json()["cache_used"] != first.json()["cache_used"]
+
+
+def test_same_version_with_other_content_gets_a_new_etag(client, monkeypatch):
+    etag = client.get("/compare").headers["etag"]
+    # Another worker (shared state off) numbered a different snapshot the same.
+    refresh.update_state({"content_hash": "elsewhere", "updated_at_epoch": time.time() + 1})
+    response = client.get("/compare", headers={"If-None-Match": etag})
+    assert response.status_code == 200
+    assert response.headers["etag"] != etag
@@ -0,0 +1,44 @@
+from fastapi.testclient import TestClient
+
+from backend import main, refresh
+
+FEES = {"fastestFee": 12, "halfHourFee": 8, "hourFee": 5, "economyFee": 3, "minimumFee": 1}
+
+
+def _publish(blocks: list, histogram: list) -> TestClient:
+    parts = {
+        "fee_data": FEES,
+        "mempool_data": {"count": 90000, "vsize": 50_000_000, "fee_histogram": histogram},
+        "mempool_blocks": blocks,
+        "tip_height": 850000,
+    }
+    refresh.publish(parts, [], {}, {name: repr(value) for name, value in parts.items()})
+    return TestClient(main.app)
+
+
+def _blocks(count: int) -> list[dict]:
+    return [
+        {"blockSize": 1_500_000, "blockVSize": 998_000, "nTx": 3000, "medianFee": 40 - i, "feeRange": [30 - i, 40 - i, 60]}
+        for i in range(count)
+    ]
+
+
+def test_projection_unavailable_notes():
+    client = _publish([], [])
+    body = client.get("/mining-target", params={"fee": 5, "target_blocks": 3}).json()
+    assert body["blocks"] == []
+    assert body["user_fee_eval"]["note"].startswith("Projection unavailable")
+    assert body["user_fee_eval"]["fits_in_block_index"] is None
+    assert body["target_note"].startswith("Projection unavailable")
+
+
+def test_listed_blocks_follow_the_target():
+    client = _publish(_blocks(8), [[1, 5_000_000]])
+    assert len(client.get("/mining-target").json()["blocks"]) == main.MINING_TARGET_LISTED_BLOCKS
+    body = client.get("/mining-target", params={"target_blocks": 8}).json()
+    assert [block["block_index"] for block in body["blocks"]] == list(range(1, 9))
+    assert body["target_median_fee"] == 33
+    deep = client.get("/mining-target", params={"target_blocks": 20}).json()
+    assert len(deep["blocks"]) == 8  # all upstream has
+    assert deep["target_median_fee"] is None
+    assert not deep["target_note"].startswith("Projection unavailable")
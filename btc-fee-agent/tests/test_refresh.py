@@ -0,0 +1,58 @@
+import threading
+
+from backend import refresh
+
+
+def _parts(n: int) -> dict:
+    return {
+        "fee_data": {"fastestFee": n, "hourFee": n},
+        "mempool_data": {"count": n},
+        "mempool_blocks": [],
+        "tip_height": n,
+    }
+
+
+def _publish(n: int) -> bool:
+    parts = _parts(n)
+    return refresh.publish(parts, [], {}, {name: repr(value) for name, value in parts.items()})
+
+
+def test_publish_replaces_the_state_dict():
+    _publish(1)
+    before = refresh.LATEST_STATE
+    frozen = dict(before)
+    assert _publish(2)
+    assert refresh.LATEST_STATE is not before
+    assert before == frozen  # a reader holding the old snapshot keeps it whole
+    assert refresh.LATEST_STATE["version"] == before["version"] + 1
+    assert not _publish(2)  # unchanged content: no new version
+    assert refresh.LATEST_STATE["version"] == before["version"] + 1
+
+
+def test_update_state_keeps_the_version():
+    _publish(3)
+    version = refresh.LATEST_STATE["version"]
+    refresh.update_state({"fresh_until_epoch": 123.0})
+    assert refresh.LATEST_STATE["fresh_until_epoch"] == 123.0
+    assert refresh.LATEST_STATE["version"] == version
+
+
+def test_readers_never_see_a_mixed_snapshot():
+    stop = threading.Event()
+    mixed = []
+
+    def read():
+        while not stop.is_set():
+            state = refresh.LATEST_STATE
+            if state["fee_data"] and state["fee_data"]["fastestFee"] != state["tip_height"]:
+                mixed.append(state)
+
+    readers = [threading.Thread(target=read) for _ in range(3)]
+    for reader in readers:
+        reader.start()
+    for n in range(100, 2100):
+        _publish(n)
+    stop.set()
+    for reader in readers:
+        reader.join()
+    assert not mixed
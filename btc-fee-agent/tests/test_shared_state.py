@@ -0,0 +1,96 @@
+import multiprocessing
+import sys
+
+import pytest
+
+from backend import refresh, shared_state
+
+
+@pytest.fixture
+def region(tmp_path, monkeypatch):
+    monkeypatch.setattr(shared_state, "REGION_PATH", tmp_path / "shared_state.mmap")
+    monkeypatch.setattr(shared_state, "REGION_BYTES", 256 * 1024)
+    monkeypatch.setattr(shared_state, "_region", None)
+    monkeypatch.setattr(shared_state, "_adopted_version", 0)
+    yield tmp_path / "shared_state.mmap"
+    if shared_state._region is not None:
+        shared_state._region.close()
+
+
+def _state(version: int, size: int = 100) -> dict:
+    # Every field derives from the version, so a torn read cannot look consistent.
+    return {"version": version, "fee_data": {"fastestFee": version}, "pad": str(version % 10) * (size + version % 977)}
+
+
+def test_empty_region_reads_nothing(region):
+    assert shared_state.version() == 0
+    assert shared_state.read() is None
+
+
+def test_write_then_read(region):
+    shared_state.write(_state(1))
+    shared_state.write(_state(2, size=10))  # shorter payload over a longer one
+    assert shared_state.version() == 2
+    assert shared_state.read() == _state(2, size=10)
+
+
+def test_reader_gives_up_while_a_write_is_in_progress(region):
+    shared_state.write(_state(1))
+    region_map = shared_state._open_region()
+    shared_state._SEQ.pack_into(region_map, shared_state._SEQ_OFFSET, 3)  # writer died mid-write
+    assert shared_state.read() is None
+    # The next leader skips past the odd sequence and leaves it even.
+    shared_state.write(_state(2))
+    seq = shared_state._SEQ.unpack_from(region_map, shared_state._SEQ_OFFSET)[0]
+    assert seq % 2 == 0 and seq > 3
+    assert shared_state.read() == _state(2)
+
+
+def test_oversize_state_is_not_written(region):
+    shared_state.write(_state(1))
+    shared_state.write(_state(2, size=shared_state.REGION_BYTES))
+    assert shared_state.read() == _state(1)
+
+
+def test_sync_adopts_each_newer_version_once(region, monkeypatch):
+    adopted = []
+    monkeypatch.setattr(shared_state, "adopt", adopted.append)
+    monkeypatch.setitem(refresh.LATEST_STATE, "version", 0)
+    assert not shared_state.sync()
+    shared_state.write(_state(5))
+    assert shared_state.sync()
+    assert not shared_state.sync()
+    shared_state.write(_state(6))
+    assert shared_state.sync()
+    assert [state["version"] for state in adopted] == [5, 6]
+
+
+def _writer(path: str, size: int, versions: int) -> None:
+    shared_state.REGION_PATH = shared_state.Path(path)
+    shared_state.REGION_BYTES = size
+    shared_state._region = None
+    for version in range(1, versions + 1):
+        shared_state.write(_state(version, size=20_000))
+
+
+@pytest.mark.skipif(sys.platform == "win32", reason="needs fork")
+def test_concurrent_reads_are_never_torn(region):
+    shared_state._open_region()  # create the file before the writer maps it
+    versions = 3000
+    writer = multiprocessing.get_context("fork").Process(
+        target=_writer, args=(str(region), shared_state.REGION_BYTES, versions)
+    )
+    writer.start()
+    seen = 0
+    try:
+        while seen < versions and (writer.is_alive() or shared_state.version() > seen):
+            state = shared_state.read()
+            if state is None:
+                continue  # the writer kept the sequence moving; read again
+            assert state == _state(state["version"], size=20_000)
+            assert state["version"] >= seen
+            seen = state["version"]
+    finally:
+        writer.join(10)
+    assert writer.exitcode == 0
+    assert seen == versions
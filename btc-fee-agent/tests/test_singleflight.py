@@ -0,0 +1,102 @@
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from backend.singleflight import Group
+
+
+class Work:
+    """Counts starts; every run waits until the test releases it."""
+
+    def __init__(self, result="done"):
+        self.calls = 0
+        self.result = result
+        self.release = threading.Event()
+
+    async def __call__(self):
+        self.calls += 1
+        while not self.release.is_set():
+            await asyncio.sleep(0.005)
+        if isinstance(self.result, Exception):
+            raise self.result
+        return self.result
+
+
+async def _settle():
+    await asyncio.sleep(0.05)  # let every caller join the flight
+
+
+def test_concurrent_calls_share_one_run():
+    group, work = Group(), Work()
+
+    async def main():
+        callers = [asyncio.create_task(group.do("fees", work)) for _ in range(20)]
+        await _settle()
+        work.release.set()
+        return await asyncio.gather(*callers)
+
+    assert asyncio.run(main()) == ["done"] * 20
+    assert work.calls == 1
+
+
+def test_keys_are_independent_and_forgotten_after_finishing():
+    group, fees, blocks = Group(), Work("fees"), Work("blocks")
+    fees.release.set()
+    blocks.release.set()
+
+    async def main():
+        first = await asyncio.gather(group.do("fees", fees), group.do("blocks", blocks))
+        second = await group.do("fees", fees)
+        return first, second
+
+    assert asyncio.run(main()) == (["fees", "blocks"], "fees")
+    assert (fees.calls, blocks.calls) == (2, 1)
+
+
+def test_errors_reach_every_caller():
+    group, work = Group(), Work(RuntimeError("upstream down"))
+
+    async def main():
+        callers = [asyncio.create_task(group.do("fees", work)) for _ in range(5)]
+        await _settle()
+        work.release.set()
+        return await asyncio.gather(*callers, return_exceptions=True)
+
+    results = asyncio.run(main())
+    assert all(isinstance(result, RuntimeError) for result in results)
+    assert work.calls == 1
+
+
+def test_cancelled_caller_does_not_cancel_the_others():
+    group, work = Group(), Work()
+
+    async def main():
+        leaving = asyncio.create_task(group.do("fees", work))
+        staying = asyncio.create_task(group.do("fees", work))
+        await _settle()
+        leaving.cancel()
+        await _settle()
+        work.release.set()
+        with pytest.raises(asyncio.CancelledError):
+            await leaving
+        return await staying
+
+    assert asyncio.run(main()) == "done"
+    assert work.calls == 1
+
+
+def test_threads_and_loops_share_one_run():
+    group, work = Group(), Work()
+
+    def from_loop():
+        return asyncio.run(group.do("refresh", work))
+
+    with ThreadPoolExecutor(8) as pool:
+        futures = [pool.submit(group.do_sync, "refresh", work) for _ in range(4)]
+        futures += [pool.submit(from_loop) for _ in range(4)]
+        threading.Event().wait(0.1)
+        work.release.set()
+        assert [future.result(5) for future in futures] == ["done"] * 8
+    assert work.calls == 1
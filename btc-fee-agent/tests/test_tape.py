@@ -0,0 +1,113 @@
+import random
+
+import pytest
+
+from backend import tape
+
+
+def _states(count: int, seed: int = 7) -> list[tuple]:
+    rng = random.Random(seed)
+    fees = {"fastestFee": 10, "halfHourFee": 8, "hourFee": 5, "economyFee": 3, "minimumFee": 1}
+    mempool = {"count": 90000, "vsize": 50_000_000}
+    blocks = [{"medianFee": 10 - i, "nTx": 3000} for i in range(8)]
+    history = []
+    items = []
+    for i in range(count):
+        roll = rng.random()
+        if roll < 0.3:
+            fees = dict(fees, fastestFee=rng.randint(1, 50))
+        elif roll < 0.4:
+            fees = {key: value for key, value in fees.items() if key != "minimumFee"}
+        elif roll < 0.5 and history:
+            fees = rng.choice(history)  # back to an earlier value: a reference
+        if rng.random() < 0.5:
+            mempool = dict(mempool, count=mempool["count"] + rng.randint(-500, 500))
+        if rng.random() < 0.3:
+            blocks = blocks[: rng.randint(5, 8)] + [{"medianFee": rng.randint(1, 9), "nTx": 1}] * rng.randint(0, 3)
+        history.append(fees)
+        parts = {"fee_data": fees, "mempool_data": mempool, "mempool_blocks": blocks}
+        items.append((1_800_000_000.0 + i * 10, i + 1, 850000 + i // 60, ["mempool_blocks"] if i % 17 == 0 else [], parts))
+    return items
+
+
+@pytest.mark.parametrize("keyframe", [1000, 7])
+def test_round_trip(tmp_path, monkeypatch, keyframe):
+    monkeypatch.setattr(tape, "KEYFRAME_RECORDS", keyframe)
+    items = _states(200)
+    writer = tape.TapeWriter(tmp_path)
+    for item in items:
+        writer.write(item)
+    writer.close()
+
+    snapshots = list(tape.iter_snapshots(directory=tmp_path))
+    assert len(snapshots) == len(items)
+    for snapshot, (epoch, version, tip, stale, parts) in zip(snapshots, items):
+        assert (snapshot["epoch"], snapshot["version"], snapshot["tip_height"]) == (epoch, version, tip)
+        assert snapshot["stale_parts"] == stale
+        for part in tape.PARTS:
+            assert snapshot[part] == parts[part]
+
+
+def test_range_reads_and_rotation(tmp_path, monkeypatch):
+    monkeypatch.setattr(tape, "ROTATE_SECONDS", 300)
+    items = _states(100)
+    writer = tape.TapeWriter(tmp_path)
+    for item in items:
+        writer.write(item)
+    writer.close()
+    assert len(tape.files(tmp_path)) > 1
+
+    since, until = items[25][0], items[75][0]
+    epochs = [snapshot["epoch"] for snapshot in tape.iter_snapshots(since, until, directory=tmp_path)]
+    assert epochs == [item[0] for item in items[25:75]]
+    # Files start from a keyframe of their own.
+    last = list(tape.iter_snapshots(items[-1][0], directory=tmp_path))
+    assert last[0]["fee_data"] == items[-1][4]["fee_data"]
+
+
+def test_reads_an_open_file_after_flush(tmp_path):
+    items = _states(10)
+    writer = tape.TapeWriter(tmp_path)
+    for item in items:
+        writer.write(item)
+    writer.flush()
+    assert [snapshot["version"] for snapshot in tape.iter_snapshots(directory=tmp_path)] == list(range(1, 11))
+    writer.close()
+
+
+def test_downsample_keeps_last_per_bucket():
+    snapshots = [{"epoch": epoch} for epoch in (0, 10, 59, 60, 61, 250)]
+    assert [s["epoch"] for s in tape.downsample(snapshots, 60)] == [59, 61, 250]
+
+
+def _write_chain(directory, items, pid: str) -> None:
+    writer = tape.TapeWriter(directory)
+    for item in items:
+        writer.write(item)
+    writer.close()
+    for path in directory.glob(f"tape-*-{tape.os.getpid()}.jsonl.gz"):
+        path.rename(path.with_name(path.name.replace(f"-{tape.os.getpid()}.", f"-{pid}.")))
+
+
+def test_overlapping_writers_are_merged(tmp_path, monkeypatch):
+    monkeypatch.setattr(tape, "ROTATE_SECONDS", 300)
+    items = _states(100)
+    # A second worker polls the same upstream 3 s later, and once sees data of its own.
+    other = [(epoch + 3, version, tip, stale, parts) for epoch, version, tip, stale, parts in items]
+    odd = dict(items[50][4], fee_data={"fastestFee": 99})
+    other[50] = (other[50][0], 51, items[50][2], [], odd)
+    _write_chain(tmp_path, items, "111")
+    _write_chain(tmp_path, other, "222")
+
+    snapshots = list(tape.iter_snapshots(directory=tmp_path))
+    epochs = [snapshot["epoch"] for snapshot in snapshots]
+    assert epochs == sorted(epochs)
+    assert [snapshot["fee_data"] for snapshot in snapshots if snapshot["fee_data"] == {"fastestFee": 99}] == [
+        {"fastestFee": 99}
+    ]
+    # Worker 2 only adds the snapshot worker 1 never saw.
+    assert epochs == [item[0] for item in items[:51]] + [other[50][0]] + [item[0] for item in items[51:]]
+
+    since, until = items[20][0], items[40][0]
+    ranged = [snapshot["epoch"] for snapshot in tape.iter_snapshots(since, until, directory=tmp_path)]
+    assert ranged == [item[0] for item in items[20:40]]
@@ -0,0 +1,89 @@
+import asyncio
+
+import httpx
+import pytest
+
+from backend import http_client, upstream
+from backend.ratelimit import RateLimiter
+from backend.upstream import CircuitBreaker, Source, Upstream, parse_sources
+
+
+def test_breaker_opens_after_consecutive_failures():
+    breaker = CircuitBreaker(failures=3, cooldown=60)
+    breaker.record_failure()
+    breaker.record_failure()
+    breaker.record_success()
+    breaker.record_failure()
+    breaker.record_failure()
+    assert breaker.state == "closed" and breaker.allow()
+    breaker.record_failure()
+    assert breaker.state == "open"
+    assert not breaker.allow()
+
+
+def test_breaker_half_open_allows_a_single_probe():
+    breaker = CircuitBreaker(failures=1, cooldown=0)
+    breaker.record_failure()
+    assert breaker.allow()
+    assert breaker.state == "half_open"
+    assert not breaker.allow()
+    breaker.record_success()
+    assert breaker.state == "closed" and breaker.allow()
+
+
+def test_failed_probe_reopens_and_cancelled_probe_is_released():
+    breaker = CircuitBreaker(failures=5, cooldown=0)
+    for _ in range(5):
+        breaker.record_failure()
+    assert breaker.allow()
+    breaker.record_failure()
+    assert breaker.state == "open"
+    assert breaker.allow()
+    breaker.release()
+    assert breaker.allow()
+
+
+def test_parse_sources_names():
+    sources = parse_sources("mempool=https://a/api,local:mempool=http://h:8999/api,https://c", "x")
+    assert [s.name for s in sources] == ["https://a/api", "local", "https://c"]
+    assert [s.host for s in sources] == ["a", "h:8999", "c"]
+    assert parse_sources("", "https://d/api")[0].name == "https://d/api"
+
+
+@pytest.fixture
+def responses(monkeypatch):
+    status: dict[str, int] = {}
+
+    async def fake_get(url, timeout, headers=None):
+        return httpx.Response(status[url], json={}, request=httpx.Request("GET", url))
+
+    monkeypatch.setattr(http_client, "get", fake_get)
+    return status
+
+
+def _upstream(*sources: Source) -> Upstream:
+    return Upstream(list(sources), RateLimiter(0, 1, 0, 1))
+
+
+@pytest.mark.parametrize("code, counted", [(404, False), (400, False), (429, True), (503, True)])
+def test_only_server_errors_count_toward_breaker(responses, code, counted):
+    source = Source("mempool", "https://a/api")
+    source.breaker = CircuitBreaker(failures=1, cooldown=60)
+    responses["https://a/api/blocks"] = code
+    with pytest.raises(httpx.HTTPStatusError):
+        asyncio.run(_upstream(source).get("/blocks", timeout=1))
+    assert (source.breaker.state == "open") is counted
+
+
+def test_client_error_falls_through_to_next_source(responses):
+    first, second = Source("mempool", "https://a/api"), Source("mempool", "https://b/api")
+    responses["https://a/api/blocks"] = 404
+    responses["https://b/api/blocks"] = 200
+    response, source = asyncio.run(_upstream(first, second).get("/blocks", timeout=1))
+    assert response.status_code == 200 and source is second
+    assert first.breaker.state == "closed"
+
+
+def test_unsupported_endpoint():
+    with pytest.raises(upstream.UpstreamUnavailable):
+        asyncio.run(_upstream(Source("esplora", "https://b/api")).get("/v1/fees/mempool-blocks", timeout=1))